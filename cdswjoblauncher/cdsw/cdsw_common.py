@@ -5,23 +5,12 @@ import os
 import pkgutil
 import site
 import sys
+import threading
 from enum import Enum
-from typing import Dict, List, Callable
+from typing import Dict, List, Callable, Tuple, Optional, TYPE_CHECKING
 
-# https://stackoverflow.com/a/50255019/1106893
-from googleapiwrapper.common import ServiceType
-from googleapiwrapper.google_auth import GoogleApiAuthorizer
-from googleapiwrapper.google_drive import (
-    DriveApiWrapper,
-    DriveApiWrapperSessionSettings,
-    FileFindMode,
-    DuplicateFileWriteResolutionMode,
-    DriveApiScope,
-    DriveApiFile,
-)
 from pythoncommons.constants import ExecutionMode
 from pythoncommons.file_utils import FileUtils
-from pythoncommons.logging_setup import SimpleLoggingSetup, SimpleLoggingSetupConfig
 from pythoncommons.object_utils import ObjUtils
 from pythoncommons.os_utils import OsUtils
 from pythoncommons.project_utils import (
@@ -32,8 +21,22 @@ from pythoncommons.project_utils import (
 )
 
 from cdswjoblauncher.cdsw.constants import CdswEnvVar, SECRET_PROJECTS_DIR, PROJECT_NAME
+from cdswjoblauncher.cdsw.drive_upload_settings import DriveUploadSettings
+from cdswjoblauncher.cdsw.lazy_import import lazy_import
 from cdswjoblauncher.cdsw.utils import MethodResolver
 
+if TYPE_CHECKING:
+    from googleapiwrapper.google_auth import GoogleApiAuthorizer
+    from googleapiwrapper.google_drive import DriveApiWrapper, DriveApiFile
+
+# Heavy modules, only imported when logging is set up or Google Drive is used
+# https://stackoverflow.com/a/50255019/1106893
+google_common = lazy_import("googleapiwrapper.common")
+google_auth = lazy_import("googleapiwrapper.google_auth")
+google_drive = lazy_import("googleapiwrapper.google_drive")
+drive_upload = lazy_import("cdswjoblauncher.cdsw.drive_upload")
+logging_setup = lazy_import("pythoncommons.logging_setup")
+
 
 class ReportFile(Enum):
     SHORT_TXT = "report-short.txt"
@@ -56,7 +59,6 @@ DEFAULT_TEST_EXECUTION_MODE = TestExecMode.CLOUDERA.value
 
 
 LOG = logging.getLogger(__name__)
-CMD_LOG = SimpleLoggingSetup.create_command_logger(__name__)
 BASEDIR = None
 PY3 = "python3"
 BASH = "bash"
@@ -64,6 +66,21 @@ BASHX = "bash -x"
 MAIL_ADDR_SNEMETH = "snemeth@cloudera.com"
 
 
+_CMD_LOG: Optional[logging.Logger] = None
+_CMD_LOG_LOCK = threading.Lock()
+
+
+def get_command_logger() -> logging.Logger:
+    """
+    :return: Logger of the output of executed commands, created on first use
+    """
+    global _CMD_LOG
+    with _CMD_LOG_LOCK:
+        if _CMD_LOG is None:
+            _CMD_LOG = logging_setup.SimpleLoggingSetup.create_command_logger(__name__)
+        return _CMD_LOG
+
+
 class CommonDirs:
     CDSW_BASEDIR = FileUtils.join_path("home", "cdsw")
     SCRIPTS_BASEDIR = FileUtils.join_path(CDSW_BASEDIR, "scripts")
@@ -88,6 +105,7 @@ class CdswSetupResult:
     env_vars: Dict[str, str]
     module_root: str
     job_preparation_callbacks: List[Callable] = dataclasses.field(default_factory=list)
+    log_dir: str = None
 
 
 class CdswSetup:
@@ -103,7 +121,7 @@ class CdswSetup:
         # TODO cdsw-separation: Check all usages of "ProjectUtils.", figure out directory structure
         ProjectUtils.set_root_determine_strategy(ProjectRootDeterminationStrategy.SYS_PATH, allow_overwrite=False)
         output_basedir = ProjectUtils.get_output_basedir(PROJECT_NAME, basedir=PROJECTS_BASEDIR, project_name_hint=PROJECT_NAME)
-        logging_config: SimpleLoggingSetupConfig = SimpleLoggingSetup.init_logger(
+        logging_config = logging_setup.SimpleLoggingSetup.init_logger(
             project_name=PROJECT_NAME,
             logger_name_prefix=module_name,
             execution_mode=ExecutionMode.PRODUCTION,
@@ -124,8 +142,9 @@ class CdswSetup:
         LOG.debug("Resolving job preparation callback functions")
         resolver = MethodResolver(module_name, job_prep_callback_names)
         callables = resolver.resolve()
-        return CdswSetupResult(basedir, output_basedir, env_vars, CommonDirs.MODULE_ROOT, callables)
-
+        log_file_paths = list(logging_config.log_file_paths.values()) if logging_config.log_file_paths else []
+        log_dir = os.path.dirname(log_file_paths[0]) if log_file_paths else None
+        return CdswSetupResult(basedir, output_basedir, env_vars, CommonDirs.MODULE_ROOT, callables, log_dir=log_dir)
 
     @staticmethod
     def _determine_basedir():
@@ -169,8 +188,10 @@ class CdswSetup:
 
 class CommonMailConfig:
     def __init__(self):
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 465
+        # SMTP server can be overridden, e.g. with a local SMTP server for testing
+        self.smtp_server = OsUtils.get_env_value(CdswEnvVar.MAIL_SMTP_SERVER.value, "smtp.gmail.com")
+        self.smtp_port = int(OsUtils.get_env_value(CdswEnvVar.MAIL_SMTP_PORT.value, 465))
+        self.smtp_ssl = OsUtils.is_env_var_true(CdswEnvVar.MAIL_SMTP_SSL.value, default_val=True)
         self.account_user = OsUtils.get_env_value(CdswEnvVar.MAIL_ACC_USER.value)
         self.account_password = OsUtils.get_env_value(CdswEnvVar.MAIL_ACC_PASSWORD.value)
 
@@ -184,26 +205,91 @@ class CommonMailConfig:
 
 
 class GoogleDriveCdswHelper:
-    def __init__(self, module_name: str):
-        self.authorizer = self.create_authorizer()
-        session_settings = DriveApiWrapperSessionSettings(
-            FileFindMode.JUST_UNTRASHED, DuplicateFileWriteResolutionMode.FAIL_FAST, enable_path_cache=True
-        )
-        self.drive_wrapper = DriveApiWrapper(self.authorizer, session_settings=session_settings)
+    # Drive API wrappers are shared by all helpers of the thread, keyed by token file and upload settings.
+    # Building the wrapper authorizes the account and builds the API service, which only needs to happen once.
+    # The HTTP client of the API service is not thread-safe, so every upload thread has its own wrappers,
+    # which are released with the thread.
+    _THREAD_DRIVE_WRAPPERS = threading.local()
+
+    def __init__(self, module_name: str, upload_settings: DriveUploadSettings = None):
+        # Authorizer and Drive API wrapper are initialized on the first upload
+        self._authorizer = None
+        # If set, this Drive API wrapper is used by all threads
+        self._drive_wrapper = None
+        self._thread_local = threading.local()
+        self._initialized = False
+        self._lock = threading.RLock()
+        self.upload_settings = upload_settings if upload_settings else DriveUploadSettings()
+        # Uploads run on the threads of the callers, e.g. of parallel runs, this limits the concurrent ones
+        self._upload_slots = threading.BoundedSemaphore(self.upload_settings.max_parallel_uploads)
         self.drive_command_data_basedir = FileUtils.join_path(
             PROJECTS_BASEDIR_NAME, module_name, CDSW_PROJECT, "command-data"
         )
 
-    def upload(self, cmd_type_real_name: str, local_file_path: str, drive_filename: str) -> DriveApiFile:
+    @property
+    def authorizer(self) -> "GoogleApiAuthorizer":
+        with self._lock:
+            if not self._authorizer:
+                self._authorizer = self.create_authorizer()
+            return self._authorizer
+
+    @property
+    def drive_wrapper(self) -> "DriveApiWrapper":
+        if self._drive_wrapper:
+            return self._drive_wrapper
+        drive_wrapper = getattr(self._thread_local, "drive_wrapper", None)
+        if not drive_wrapper:
+            drive_wrapper = self._get_or_create_drive_wrapper(self.authorizer, self.upload_settings)
+            self._thread_local.drive_wrapper = drive_wrapper
+            self._initialized = True
+        return drive_wrapper
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialized or self._drive_wrapper is not None
+
+    @classmethod
+    def _get_or_create_drive_wrapper(
+        cls, authorizer: "GoogleApiAuthorizer", upload_settings: DriveUploadSettings
+    ) -> "DriveApiWrapper":
+        # Only accessed by the current thread, no locking is needed
+        if not hasattr(cls._THREAD_DRIVE_WRAPPERS, "cache"):
+            cls._THREAD_DRIVE_WRAPPERS.cache = {}
+        cache: Dict[Tuple, "DriveApiWrapper"] = cls._THREAD_DRIVE_WRAPPERS.cache
+        key = (authorizer.token_full_path, upload_settings)
+        drive_wrapper = cache.get(key)
+        if drive_wrapper:
+            LOG.debug("Using cached Drive API wrapper for token file: %s", authorizer.token_full_path)
+            return drive_wrapper
+        LOG.info("Initializing Drive API wrapper with token file: %s", authorizer.token_full_path)
+        session_settings = google_drive.DriveApiWrapperSessionSettings(
+            google_drive.FileFindMode.JUST_UNTRASHED,
+            google_drive.DuplicateFileWriteResolutionMode.FAIL_FAST,
+            enable_path_cache=True,
+        )
+        if upload_settings.resumable:
+            drive_wrapper = drive_upload.ResumableDriveApiWrapper(
+                authorizer, upload_settings, session_settings=session_settings
+            )
+        else:
+            drive_wrapper = google_drive.DriveApiWrapper(authorizer, session_settings=session_settings)
+        cache[key] = drive_wrapper
+        return drive_wrapper
+
+    def upload(self, cmd_type_real_name: str, local_file_path: str, drive_filename: str) -> "DriveApiFile":
+        """
+        Uploads the file on the calling thread. Blocks while the max number of parallel uploads is in progress.
+        """
         drive_path = FileUtils.join_path(self.drive_command_data_basedir, cmd_type_real_name, drive_filename)
-        drive_api_file: DriveApiFile = self.drive_wrapper.upload_file(local_file_path, drive_path)
+        with self._upload_slots:
+            drive_api_file: "DriveApiFile" = self.drive_wrapper.upload_file(local_file_path, drive_path)
         return drive_api_file
 
     def create_authorizer(self):
-        return GoogleApiAuthorizer(
-            ServiceType.DRIVE,
+        return google_auth.GoogleApiAuthorizer(
+            google_common.ServiceType.DRIVE,
             project_name=CDSW_PROJECT,
             secret_basedir=SECRET_PROJECTS_DIR,
             account_email="snemeth@cloudera.com",
-            scopes=[DriveApiScope.DRIVE_PER_FILE_ACCESS.value],
+            scopes=[google_drive.DriveApiScope.DRIVE_PER_FILE_ACCESS.value],
         )
@@ -1,16 +1,18 @@
 import logging
 import os
 import re
+import resource
 from copy import copy
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Callable, Union
+from typing import List, Dict, Any, Callable, Union, Tuple, Optional, Iterator
 
-from dacite import from_dict
 from pythoncommons.date_utils import DateUtils
 from pythoncommons.string_utils import auto_str
 
 from cdswjoblauncher.cdsw.cdsw_common import CdswSetupResult
+from cdswjoblauncher.cdsw.config_cache import CdswJobConfigCache, ConfigSource
 from cdswjoblauncher.cdsw.constants import CdswEnvVar
+from cdswjoblauncher.cdsw.dataclass_utils import from_dict, with_slots
 
 MAIN_SCRIPT_ARGUMENTS_VAR_OVERRIDE_TEMPLATE = "Found argument in main_script_arguments and runconfig.main_script_arguments: '%s'. The latter will take predence."
 JOB_START_DATE_KEY = "JOB_START_DATE"
@@ -23,11 +25,36 @@ class Include(object):
         return if_block if expression else else_block
 
 
+@dataclass(frozen=True)
+class FieldSpecNode:
+    name: str
+    # Index of a list item, e.g. runs[0]
+    index: int = None
+    # List fan-out marker, e.g. runs[]: The rest of the path is applied to each item of the list
+    fan_out: bool = False
+
+    def get(self, obj):
+        value = getattr(obj, self.name)
+        if self.index is not None:
+            return value[self.index]
+        return value
+
+    def __str__(self):
+        if self.fan_out:
+            return f"{self.name}{FieldSpec.MARKER}"
+        if self.index is not None:
+            return f"{self.name}[{self.index}]"
+        return self.name
+
+
 @dataclass
 class FieldSpec:
     MARKER = "[]"
+    INDEXED_FIELD_PATTERN = re.compile("([a-zA-Z_]+)\\[(\\d+)]")
     val: str
     fields: List[str] = field(default_factory=list)
+    nodes: List[FieldSpecNode] = field(default_factory=list)
+    fan_out_idx: int = None
 
     def __post_init__(self):
         split = self.val.split(".")
@@ -41,45 +68,73 @@ class FieldSpec:
             )
 
         self.fields = split
+        self.nodes = [FieldSpec._compile_node(f) for f in split]
+        fan_out_indices = [i for i, node in enumerate(self.nodes) if node.fan_out]
+        if len(fan_out_indices) > 1:
+            raise ValueError(
+                "Invalid field spec: {}. Field specs should only have one list definition with marker '{}'".format(
+                    self.val, FieldSpec.MARKER
+                )
+            )
+        self.fan_out_idx = fan_out_indices[0] if fan_out_indices else None
+
+    @staticmethod
+    def _compile_node(f: str) -> FieldSpecNode:
+        if f.endswith(FieldSpec.MARKER):
+            return FieldSpecNode(f[: -len(FieldSpec.MARKER)], fan_out=True)
+        match = FieldSpec.INDEXED_FIELD_PATTERN.fullmatch(f)
+        if match:
+            return FieldSpecNode(match.group(1), index=int(match.group(2)))
+        return FieldSpecNode(f)
+
+    @property
+    def has_fan_out(self):
+        return self.fan_out_idx is not None
+
+    @property
+    def fan_out_prefix(self) -> List[FieldSpecNode]:
+        """
+        Path to the list of the fan-out, including the fan-out node itself.
+        """
+        return self.nodes[: self.fan_out_idx + 1]
+
+    @property
+    def fan_out_suffix(self) -> List[FieldSpecNode]:
+        """
+        Path to the field from an item of the fan-out list.
+        """
+        return self.nodes[self.fan_out_idx + 1:]
 
 
 @dataclass
 class FieldSpecInstance:
     _based_on: FieldSpec
-    _field_spec: FieldSpec = None
     index: int = None
+    nodes: List[FieldSpecNode] = field(default_factory=list)
 
     @staticmethod
     def create_from(field_spec: FieldSpec, index: int = None):
         return FieldSpecInstance(field_spec, index=index)
 
     def __post_init__(self):
-        if self.index and self._based_on.val.count(FieldSpec.MARKER) == 0:
+        if self.index is not None and not self._based_on.has_fan_out:
             raise ValueError(
                 "Invalid field spec instance: {}. Index should be specified only if there is a list marker '{}'".format(
-                    self.val, FieldSpec.MARKER
+                    self._based_on.val, FieldSpec.MARKER
                 )
             )
-        self._field_spec = copy(self._based_on)
+        self.nodes = list(self._based_on.nodes)
         if self.index is not None:
-            self._field_spec.val = self._replace_index(self._field_spec.val)
-            new_fields = []
-            for f in self._field_spec.fields:
-                new_fields.append(self._replace_index(f))
-            self._field_spec.fields = new_fields
-
-    def _replace_index(self, s):
-        c1 = FieldSpec.MARKER[0]
-        c2 = FieldSpec.MARKER[1]
-        return re.sub(r"\[(.*)\]", f"{c1}{self.index}{c2}", s)
+            fan_out_node = self.nodes[self._based_on.fan_out_idx]
+            self.nodes[self._based_on.fan_out_idx] = FieldSpecNode(fan_out_node.name, index=self.index)
 
     @property
     def fields(self):
-        return self._field_spec.fields
+        return [str(node) for node in self.nodes]
 
     @property
     def val(self):
-        return self._field_spec.val
+        return ".".join(self.fields)
 
 
 @dataclass
@@ -97,29 +152,19 @@ class FieldSpecResolver:
         obj = self.main_obj
         parent_obj = None
         attr = None
-        for i, attr in enumerate(fsi.fields):
+        for node in fsi.nodes:
+            attr = node.name
             if isinstance(obj, list):
-                list_of_lists = []
-                for item in obj:
-                    list_of_lists.append(getattr(item, attr))
                 parent_obj = obj
-                obj = list_of_lists
-            elif attr.endswith(FieldSpec.MARKER):
-                attr = attr[:-2]
+                obj = [getattr(item, attr) for item in obj]
+            elif node.index is not None:
+                parent_obj = getattr(obj, attr)
+                obj = parent_obj[node.index]
+            elif node.fan_out or hasattr(obj, attr):
                 parent_obj = obj
                 obj = getattr(obj, attr)
             else:
-                match = re.search("([a-zA-Z_]+)\\[(\\d+)]", attr)
-                if match:
-                    field_name = match.group(1)
-                    index = int(match.group(2))
-                    parent_obj = getattr(obj, field_name)
-                    obj = parent_obj[index]
-                elif hasattr(obj, attr):
-                    parent_obj = obj
-                    obj = getattr(obj, attr)
-                else:
-                    raise ValueError("Config object has no field with field spec '{}'!", fsi)
+                raise ValueError("Config object has no field with field spec '{}'!".format(fsi.val))
         if attr:
             rfs = ResolvedFieldSpec(name=attr, value=obj, parent=parent_obj)
             value_list = isinstance(rfs.value, list)
@@ -137,43 +182,91 @@ class FieldSpecResolver:
             return rfs
         return None
 
+    def find_fan_out_items(self, field_spec: FieldSpec) -> List[Any]:
+        obj = self.main_obj
+        for node in field_spec.fan_out_prefix:
+            if not hasattr(obj, node.name):
+                raise ValueError("Config object has no field with field spec '{}'!".format(field_spec.val))
+            obj = node.get(obj)
+        return obj if obj else []
+
+    @staticmethod
+    def find_attribute_of_item(item, field_spec: FieldSpec) -> Optional[ResolvedFieldSpec]:
+        """
+        Resolves the field of the field spec on an item of the fan-out list.
+        :return: None if the path goes through an unset (None) field, as there is nothing to substitute
+        """
+        obj = item
+        parent_obj = None
+        for node in field_spec.fan_out_suffix:
+            if obj is None:
+                return None
+            if not hasattr(obj, node.name):
+                raise ValueError("Config object has no field with field spec '{}'!".format(field_spec.val))
+            parent_obj = obj
+            obj = node.get(obj)
+        return ResolvedFieldSpec(name=field_spec.fan_out_suffix[-1].name, value=obj, parent=parent_obj)
+
 
 class FieldSpecReplacer:
     @staticmethod
     def substitute_regular_variables_in_fields(
         cdsw_config, fieldspec_resolver: FieldSpecResolver, field_specs: List[FieldSpec]
     ):
+        # Field specs having the same list fan-out (e.g. runs[]) are resolved with a single pass over the list
+        fan_out_groups: Dict[Tuple[FieldSpecNode, ...], List[FieldSpec]] = {}
         for field_spec in field_specs:
-            fsi = FieldSpecInstance.create_from(field_spec)
-            rfs = fieldspec_resolver.find_attribute_by_field_spec(fsi)
-            field_value = rfs.value
+            if field_spec.has_fan_out and field_spec.fan_out_suffix:
+                fan_out_groups.setdefault(tuple(field_spec.fan_out_prefix), []).append(field_spec)
+            else:
+                FieldSpecReplacer._substitute_field(cdsw_config, fieldspec_resolver, field_spec)
+
+        for specs in fan_out_groups.values():
+            items = fieldspec_resolver.find_fan_out_items(specs[0])
+            for item in items:
+                FieldSpecReplacer.substitute_regular_variables_in_item(cdsw_config, item, specs)
+
+    @staticmethod
+    def substitute_regular_variables_in_item(cdsw_config, item, field_specs: List[FieldSpec]):
+        """
+        Substitutes the fields of a single item of a fan-out list, e.g. a run of runs[].
+        """
+        for field_spec in field_specs:
+            rfs = FieldSpecResolver.find_attribute_of_item(item, field_spec)
+            if rfs is None:
+                continue
             LOG.debug("Field spec: %s, Resolved field spec:%s", field_spec, rfs)
+            FieldSpecReplacer._substitute_value(cdsw_config, field_spec, rfs)
 
-            if isinstance(field_value, list):
-                if field_value and isinstance(field_value[0], list):
-                    # List of lists
-                    for idx, lst in enumerate(field_value):
-                        indexed_fsi = FieldSpecInstance.create_from(field_spec, index=idx)
-                        rfs: ResolvedFieldSpec = fieldspec_resolver.find_attribute_by_field_spec(indexed_fsi)
-                        FieldSpecReplacer._set_value_to_list_field_spec(indexed_fsi, rfs, lst, cdsw_config)
-                else:
-                    FieldSpecReplacer._set_value_to_list_field_spec(fsi, rfs, field_value, cdsw_config)
-            elif isinstance(field_value, dict):
-                for k, v in field_value.items():
-                    field_value[k] = cdsw_config.resolve_lambda(v, rfs)
-            elif isinstance(field_value, Callable):
-                FieldSpecReplacer.set_config_attribute_by_field_spec(
-                    fsi, rfs, cdsw_config.resolve_lambda(field_value, rfs)
-                )
-            else:
-                raise ValueError(
-                    "Unexpected configuration field_value '{}', object: {}. Expected type of these: {}!".format(
-                        field_spec, field_value, [list, str, dict]
-                    )
+    @staticmethod
+    def _substitute_field(cdsw_config, fieldspec_resolver: FieldSpecResolver, field_spec: FieldSpec):
+        fsi = FieldSpecInstance.create_from(field_spec)
+        rfs = fieldspec_resolver.find_attribute_by_field_spec(fsi)
+        field_value = rfs.value
+        LOG.debug("Field spec: %s, Resolved field spec:%s", field_spec, rfs)
+        if not isinstance(field_value, (list, dict, Callable)):
+            raise ValueError(
+                "Unexpected configuration field_value '{}', object: {}. Expected type of these: {}!".format(
+                    field_spec, field_value, [list, str, dict]
                 )
+            )
+        FieldSpecReplacer._substitute_value(cdsw_config, fsi, rfs)
+
+    @staticmethod
+    def _substitute_value(cdsw_config, fsi, rfs: ResolvedFieldSpec):
+        field_value = rfs.value
+        if isinstance(field_value, list):
+            FieldSpecReplacer._set_value_to_list_field_spec(fsi, rfs, field_value, cdsw_config)
+        elif isinstance(field_value, dict):
+            for k, v in field_value.items():
+                field_value[k] = cdsw_config.resolve_lambda(v, rfs)
+        elif isinstance(field_value, Callable):
+            FieldSpecReplacer.set_config_attribute_by_field_spec(
+                fsi, rfs, cdsw_config.resolve_lambda(field_value, rfs)
+            )
 
     @staticmethod
-    def set_config_attribute_by_field_spec(fsi: FieldSpecInstance, rfs: ResolvedFieldSpec, value: Any):
+    def set_config_attribute_by_field_spec(fsi, rfs: ResolvedFieldSpec, value: Any):
         if not value:
             LOG.warning("Tried to set None value to field spec: %s", fsi)
             return
@@ -207,13 +300,14 @@ class FieldSpecReplacer:
             setattr(rfs.parent, rfs.name, value)
 
     @staticmethod
-    def _set_value_to_list_field_spec(fsi: FieldSpecInstance, rfs: ResolvedFieldSpec, lst, cdsw_config):
+    def _set_value_to_list_field_spec(fsi, rfs: ResolvedFieldSpec, lst, cdsw_config):
         mod_list = []
         for value in lst:
             mod_list.append(cdsw_config.resolve_lambda(value, rfs))
         FieldSpecReplacer.set_config_attribute_by_field_spec(fsi, rfs, mod_list)
 
 
+@with_slots
 @dataclass
 class EmailSettings:
     enabled: bool
@@ -224,12 +318,63 @@ class EmailSettings:
     sender: Union[str, Callable]
 
 
+@with_slots
 @dataclass
 class DriveApiUploadSettings:
     enabled: bool
     file_name: Union[str, Callable]
 
 
+@with_slots
+@dataclass
+class ResourceLimits:
+    """
+    Limits of the main script process of a run, unlimited if not specified.
+    """
+
+    # Soft limit of the CPU time, the process gets SIGXCPU when reaching it and is killed after the grace period
+    cpu_seconds: Optional[int] = None
+    address_space_mb: Optional[int] = None
+    open_files: Optional[int] = None
+    wall_timeout_seconds: Optional[Union[int, float]] = None
+
+    CPU_LIMIT_GRACE_SECONDS = 5
+
+    def __post_init__(self):
+        for name in ("cpu_seconds", "address_space_mb", "open_files", "wall_timeout_seconds"):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError("Resource limit '{}' must be a positive number! Actual: {}".format(name, value))
+
+    def merge(self, overrides: Optional["ResourceLimits"]) -> "ResourceLimits":
+        """
+        :return: Limits of this object overridden by the specified limits of the other one
+        """
+        if not overrides:
+            return self
+        return ResourceLimits(
+            *(
+                getattr(overrides, name) if getattr(overrides, name) is not None else getattr(self, name)
+                for name in ("cpu_seconds", "address_space_mb", "open_files", "wall_timeout_seconds")
+            )
+        )
+
+    def to_rlimits(self) -> Dict[int, Tuple[int, int]]:
+        """
+        :return: Soft and hard limits per resource for resource.setrlimit, the wall timeout is not included
+        """
+        rlimits = {}
+        if self.cpu_seconds is not None:
+            rlimits[resource.RLIMIT_CPU] = (self.cpu_seconds, self.cpu_seconds + self.CPU_LIMIT_GRACE_SECONDS)
+        if self.address_space_mb is not None:
+            address_space = self.address_space_mb * 1024 * 1024
+            rlimits[resource.RLIMIT_AS] = (address_space, address_space)
+        if self.open_files is not None:
+            rlimits[resource.RLIMIT_NOFILE] = (self.open_files, self.open_files)
+        return rlimits
+
+
+@with_slots
 @dataclass
 class CdswRun:
     name: str
@@ -237,6 +382,8 @@ class CdswRun:
     drive_api_upload_settings: Union[DriveApiUploadSettings, None]
     main_script_arguments: List[Union[str, Callable]] = field(default_factory=list)
     variables: Dict[str, Union[str, Callable]] = field(default_factory=dict)
+    # Overrides the resource limits of the job config
+    resource_limits: Optional[ResourceLimits] = None
 
 
 @dataclass
@@ -249,6 +396,12 @@ class CdswJobConfig:
     main_script_arguments: List[Union[str, Callable]] = field(default_factory=list)
     global_variables: Dict[str, Union[str, bool, int, Callable]] = field(default_factory=dict)
     env_sanitize_exceptions: List[str] = field(default_factory=list)
+    max_parallel_runs: int = 1
+    pipeline_post_processing: bool = False
+    # Generate, resolve and execute runs defined as callable one at a time
+    stream_runs: bool = False
+    # Resource limits of the main script process of every run
+    resource_limits: Optional[ResourceLimits] = None
 
     # Dynamic
     runs_defined_as_callable: bool = False
@@ -277,59 +430,137 @@ class CdswJobConfig:
         return self.setup_result.module_root
 
 
+class CdswRunStream:
+    """
+    Runs of a job config generated by its 'runs' callable, converted, validated and resolved one at a time
+    while they are iterated. Can only be iterated once.
+    """
+
+    def __init__(self, config: CdswJobConfig, runs_callable: Callable, config_reader: "CdswJobConfigReader"):
+        self.config = config
+        self.runs_callable = runs_callable
+        self.config_reader = config_reader
+        self._iterated = False
+
+    def __iter__(self) -> Iterator[CdswRun]:
+        if self._iterated:
+            raise ValueError("Runs of job config '{}' can only be iterated once!".format(self.config.job_name))
+        self._iterated = True
+        return self._generate()
+
+    def _generate(self) -> Iterator[CdswRun]:
+        names = set()
+        for run_dict in self.runs_callable(self.config):
+            run = from_dict(data_class=CdswRun, data=run_dict)
+            CdswJobConfigReader._add_run_name(names, run)
+            self.config.resolver.resolve_run(run)
+            self.config_reader._finalize_main_script_arguments_of_run(self.config, run)
+            yield run
+
+    def __repr__(self):
+        return "{}(job_name={})".format(type(self).__name__, self.config.job_name)
+
+
 @auto_str
 class CdswJobConfigReader:
     def __init__(self, valid_env_vars):
         self.valid_env_vars = valid_env_vars
 
     @staticmethod
-    def read_from_file(file, command_type_valid_env_vars: List[str], setup_result: CdswSetupResult):
+    def read_from_file(file,
+                       command_type_valid_env_vars: List[str],
+                       setup_result: CdswSetupResult,
+                       config_cache: CdswJobConfigCache = None):
         if not file:
             raise ValueError("Config file must be specified!")
         config_reader = CdswJobConfigReader(command_type_valid_env_vars)
-        conf_dict = config_reader._read_from_python_conf(file)
+        if not config_cache:
+            conf_dict = config_reader._read_from_python_conf(file)
+            config = from_dict(data_class=CdswJobConfig, data=conf_dict)
+            config.setup_result = setup_result
+            config_reader.process_config(config)
+            return config
+
+        source = ConfigSource.read(file)
+        cache_entry = config_cache.lookup(source, command_type_valid_env_vars)
+        code = cache_entry.load_code() if cache_entry else compile(source.content, source.file, "exec")
+        conf_dict = config_reader._read_from_python_conf(file, code=code)
         config = from_dict(data_class=CdswJobConfig, data=conf_dict)
         config.setup_result = setup_result
-        config_reader.process_config(config)
+
+        static_fields = CdswJobConfigReader._get_static_fields(config)
+        validated = cache_entry is not None and cache_entry.static_fields == static_fields
+        if cache_entry and not validated:
+            LOG.info("Static fields of job config differ from the cached ones, validating config again")
+        config_reader.process_config(config, validate=not validated)
+        if not validated:
+            config_cache.store(source, code, command_type_valid_env_vars, static_fields)
         return config
 
-    def _read_from_python_conf(self, file):
-        cdswconfig_module = self._load_module(file)
+    def _read_from_python_conf(self, file, code=None):
+        cdswconfig_module = self._load_module(file, code=code)
         job_config: Dict[Any, Any] = cdswconfig_module.config
         LOG.info("Job config: %s", job_config)
         return job_config
 
     @staticmethod
-    def _load_module(file):
+    def _load_module(file, code=None):
         import importlib.util
 
         spec = importlib.util.spec_from_file_location("cdswconfig", file)
         cdswconfig_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(cdswconfig_module)
+        if code:
+            # Already compiled, no need to parse the source file again
+            exec(code, cdswconfig_module.__dict__)
+        else:
+            spec.loader.exec_module(cdswconfig_module)
         return cdswconfig_module
 
-    def process_config(self, config: CdswJobConfig):
+    @staticmethod
+    def _get_static_fields(config: CdswJobConfig):
+        static_fields = {
+            "job_name": config.job_name,
+            "command_type": config.command_type,
+            "mandatory_env_vars": list(config.mandatory_env_vars),
+            "optional_env_vars": list(config.optional_env_vars),
+            "env_sanitize_exceptions": list(config.env_sanitize_exceptions),
+            "max_parallel_runs": config.max_parallel_runs,
+            "pipeline_post_processing": config.pipeline_post_processing,
+            "stream_runs": config.stream_runs,
+            "run_names": None,
+        }
+        if not isinstance(config.runs, Callable):
+            static_fields["run_names"] = [run.name for run in config.runs]
+        return static_fields
+
+    def process_config(self, config: CdswJobConfig, validate: bool = True):
         # Pre-initialize
         config.runs_defined_as_callable = isinstance(config.runs, Callable)
         config.resolver = Resolver(config)
 
-        # Validation
+        if validate:
+            self._validate_config(config)
+        else:
+            LOG.info("Skipping validation of config as it was validated before: %s", config)
+
+        config.resolver.resolve_vars()
+        self._generate_runs_if_required(config)
+        self._finalize_main_script_arguments(config)
+
+    def _validate_config(self, config: CdswJobConfig):
         LOG.info("Validating config: %s", config)
         if not config.runs:
             raise ValueError("Section 'runs' must be defined and cannot be empty!")
+        if config.max_parallel_runs < 1:
+            raise ValueError("Value of 'max_parallel_runs' must be at least 1! Actual: {}".format(config.max_parallel_runs))
         self._validate_run_names(config)
 
-        # Post-initialize
-
         EnvironmentVariables(
             config.mandatory_env_vars,
             config.optional_env_vars,
             config.command_type,
             self.valid_env_vars
         )
-        config.resolver.resolve_vars()
-        self._generate_runs_if_required(config)
-        self._finalize_main_script_arguments(config)
 
     @staticmethod
     def _validate_run_names(config, force_validate=False):
@@ -337,32 +568,40 @@ class CdswJobConfigReader:
         if config.runs_defined_as_callable and not force_validate:
             return
         for run in config.runs:
-            if run.name in names:
-                raise ValueError("Duplicate job name not allowed! Job name: {}".format(run.name))
-            names.add(run.name)
+            CdswJobConfigReader._add_run_name(names, run)
+
+    @staticmethod
+    def _add_run_name(names, run: CdswRun):
+        if run.name in names:
+            raise ValueError("Duplicate job name not allowed! Job name: {}".format(run.name))
+        names.add(run.name)
 
     def _generate_runs_if_required(self, config):
-        if config.runs_defined_as_callable:
+        if config.runs_defined_as_callable and config.stream_runs:
+            LOG.info("Runs of job config will be generated while they are executed")
+            config.runs = CdswRunStream(config, config.runs, self)
+        elif config.runs_defined_as_callable:
             run_dicts = config.runs(config)
             runs = []
             for run_dict in run_dicts:
                 runs.append(from_dict(data_class=CdswRun, data=run_dict))
             config.runs = runs
             self._validate_run_names(config, force_validate=True)
-
-            FieldSpecReplacer.substitute_regular_variables_in_fields(
-                config,
-                config.resolver._field_spec_resolver,
-                Resolver.FIELD_SUBSTITUTION_PHASE2_DYNAMIC_RUN_CONFIG,
-            )
+            config.resolver.resolve_run_vars()
 
     def _finalize_main_script_arguments(self, config):
+        if isinstance(config.runs, CdswRunStream):
+            # Finalized one by one while the runs are generated
+            return
         for run in config.runs:
-            final_args_with_params: Dict[str, List[str]] = {}
-            self._fill_args_from(final_args_with_params, config.main_script_arguments, warn_when_overrides=False)
-            # Add main_script_arguments for a specific run
-            self._fill_args_from(final_args_with_params, run.main_script_arguments, warn_when_overrides=True)
-            run.main_script_arguments = [" ".join([arg, *params]) for arg, params in final_args_with_params.items()]
+            self._finalize_main_script_arguments_of_run(config, run)
+
+    def _finalize_main_script_arguments_of_run(self, config, run: CdswRun):
+        final_args_with_params: Dict[str, List[str]] = {}
+        self._fill_args_from(final_args_with_params, config.main_script_arguments, warn_when_overrides=False)
+        # Add main_script_arguments for a specific run
+        self._fill_args_from(final_args_with_params, run.main_script_arguments, warn_when_overrides=True)
+        run.main_script_arguments = [" ".join([arg, *params]) for arg, params in final_args_with_params.items()]
 
     @staticmethod
     def _fill_args_from(result: Dict[str, List[str]], arguments: List[str], warn_when_overrides=False):
@@ -387,30 +626,40 @@ class CdswJobConfigReader:
         return self.__str__()
 
 
+class VariableScope:
+    def __init__(self, name: str, variables: Dict[str, Any], parent: "VariableScope" = None):
+        self.name = name
+        self.variables = variables
+        self.parent = parent
+        self.resolved: Dict[str, Any] = {}
+        # Dependency graph: variable name -> variables it refers to, as (scope name, variable name) tuples
+        self.dependencies: Dict[str, List[Tuple[str, str]]] = {}
+        # Topological order: every variable comes after the variables it depends on
+        self.evaluation_order: List[str] = []
+
+    def find_defining_scope(self, var_name):
+        scope = self
+        while scope:
+            if var_name in scope.variables:
+                return scope
+            scope = scope.parent
+        return None
+
+
 class Resolver:
-    _FIELD_SUBSTITIONS_RUN_FIELDS = [
+    FIELD_SUBSTITUTION_RUN_FIELDS = [
         FieldSpec("runs[].email_settings.subject"),
         FieldSpec("runs[].email_settings.sender"),
         FieldSpec("runs[].email_settings.attachment_file_name"),
         FieldSpec("runs[].email_settings.email_body_file_from_command_data"),
         FieldSpec("runs[].drive_api_upload_settings.file_name"),
         FieldSpec("runs[].main_script_arguments"),
-        FieldSpec("runs[].variables"),
-    ]
-
-    _DEFAULT_VARIABLE_SUBSTITUTION_FIELDS = [
-        FieldSpec("global_variables"),
-        *_FIELD_SUBSTITIONS_RUN_FIELDS,
-        FieldSpec("main_script_arguments"),
     ]
 
-    _FIELD_SUBSTITUTION_PHASE1_DYNAMIC_RUN_CONFIG = [
-        FieldSpec("global_variables"),
+    _FIELD_SUBSTITUTION_GLOBAL_FIELDS = [
         FieldSpec("main_script_arguments"),
     ]
 
-    FIELD_SUBSTITUTION_PHASE2_DYNAMIC_RUN_CONFIG = [*_FIELD_SUBSTITIONS_RUN_FIELDS]
-
     def __init__(self, config):
         self._current_rfs = None
         self.config = config
@@ -419,51 +668,113 @@ class Resolver:
 
         # Dynamic
         self._field_spec_resolver = FieldSpecResolver(config)
+        self.global_scope = VariableScope("global_variables", self.global_variables.vars)
+        self._run_scopes: Dict[int, VariableScope] = {}
+        # Stack of variables being evaluated, as (scope, variable name) tuples
+        self._evaluation_stack: List[Tuple[VariableScope, str]] = []
 
     def resolve_vars(self):
-        fields_to_resolve = self._DEFAULT_VARIABLE_SUBSTITUTION_FIELDS
-        if self.config.runs_defined_as_callable:
-            fields_to_resolve = self._FIELD_SUBSTITUTION_PHASE1_DYNAMIC_RUN_CONFIG
+        self._resolve_scope(self.global_scope)
+        if not self.config.runs_defined_as_callable:
+            self.resolve_run_vars()
         FieldSpecReplacer.substitute_regular_variables_in_fields(
             self.config,
             self._field_spec_resolver,
-            fields_to_resolve,
+            self._FIELD_SUBSTITUTION_GLOBAL_FIELDS,
         )
 
+    def resolve_run_vars(self):
+        for run in self.config.runs:
+            self._resolve_scope(self._get_run_scope(run))
+        FieldSpecReplacer.substitute_regular_variables_in_fields(
+            self.config,
+            self._field_spec_resolver,
+            self.FIELD_SUBSTITUTION_RUN_FIELDS,
+        )
+
+    def resolve_run(self, run: CdswRun):
+        """
+        Resolves the variables and substitutes the fields of a single run that is not part of the runs list.
+        """
+        try:
+            self._resolve_scope(self._get_run_scope(run))
+            FieldSpecReplacer.substitute_regular_variables_in_item(
+                self.config, run, self.FIELD_SUBSTITUTION_RUN_FIELDS
+            )
+        finally:
+            # Resolved values are written back to the run, the scope is not needed anymore
+            self._run_scopes.pop(id(run), None)
+
+    def _get_run_scope(self, run) -> VariableScope:
+        key = id(run)
+        if key not in self._run_scopes:
+            variables = run.variables if run.variables is not None else {}
+            self._run_scopes[key] = VariableScope(f"runs[{run.name}].variables", variables, parent=self.global_scope)
+        return self._run_scopes[key]
+
+    def _resolve_scope(self, scope: VariableScope):
+        self._current_rfs = None
+        for var_name in list(scope.variables.keys()):
+            self._resolve_in_scope(scope, var_name)
+        # Write back the resolved values so the config only holds final values
+        for var_name, value in scope.resolved.items():
+            scope.variables[var_name] = value
+        LOG.debug("Variable evaluation order of scope '%s': %s", scope.name, scope.evaluation_order)
+        LOG.debug("Variable dependencies of scope '%s': %s", scope.name, scope.dependencies)
+
+    def _resolve_in_scope(self, scope: VariableScope, var_name: str):
+        if var_name in scope.resolved:
+            return scope.resolved[var_name]
+
+        current = (scope, var_name)
+        if current in self._evaluation_stack:
+            cycle_start = self._evaluation_stack.index(current)
+            cycle = [name for _, name in self._evaluation_stack[cycle_start:]] + [var_name]
+            raise ValueError(
+                "Cycle detected while resolving variables of '{}': {}".format(scope.name, " -> ".join(cycle))
+            )
+
+        value = scope.variables[var_name]
+        scope.dependencies.setdefault(var_name, [])
+        if isinstance(value, Callable):
+            LOG.debug("Evaluating variable '%s' of '%s'", var_name, scope.name)
+            self._evaluation_stack.append(current)
+            try:
+                value = value(self.config)
+            finally:
+                self._evaluation_stack.pop()
+        scope.resolved[var_name] = value
+        scope.evaluation_order.append(var_name)
+        return value
+
     def var(self, var_name):
-        resolution_context = self._current_rfs.name
-        if resolution_context == "global_variables":
-            val = self._resolve_from_global(var_name, resolution_context)
-            if isinstance(val, Callable):
-                return self.resolve_lambda(val, self._current_rfs)
-            if val is not None:
-                return val
-        elif resolution_context == "variables" and type(self._current_rfs.parent == CdswRun):
-            return self._resolve_from_global(var_name, resolution_context)
-        elif resolution_context == "main_script_arguments" and type(self._current_rfs.parent == CdswRun):
-            cdsw_run = self._current_rfs.parent
-            val = self._resolve_from_variables(cdsw_run, var_name, resolution_context)
-            if isinstance(val, Callable):
-                return self.resolve_lambda(val, self._current_rfs)
-            if val:
-                return val
-            return self._resolve_from_global(var_name, resolution_context)
+        if self._evaluation_stack:
+            # Referenced from another variable: look up from the scope of the referring variable
+            referring_scope, referring_var = self._evaluation_stack[-1]
+            lookup_scope = referring_scope
+            if var_name == referring_var and referring_scope.parent:
+                # A run variable can refer to the global variable with the same name
+                lookup_scope = referring_scope.parent
+            resolution_context = referring_scope.name
         else:
-            return self._resolve_from_global(var_name, resolution_context)
-
-    def _resolve_from_global(self, var_name, resolution_context: str):
-        LOG.debug("Resolving variable '%s' from '%s'", var_name, resolution_context)
-        if var_name in self.global_variables.vars:
-            return self.global_variables.vars[var_name]
-        raise ValueError("Cannot resolve variable '{}' in: {}".format(var_name, resolution_context))
+            lookup_scope = self._determine_scope_of_field()
+            resolution_context = self._current_rfs.name if self._current_rfs else lookup_scope.name
 
-    def _resolve_from_variables(self, cdsw_run, var_name, resolution_context: str):
         LOG.debug("Resolving variable '%s' from '%s'", var_name, resolution_context)
-        if not hasattr(cdsw_run, "variables"):
-            return None
-        if var_name in cdsw_run.variables:
-            return cdsw_run.variables[var_name]
-        # TODO raise exception if not found?
+        defining_scope = lookup_scope.find_defining_scope(var_name)
+        if not defining_scope:
+            raise ValueError("Cannot resolve variable '{}' in: {}".format(var_name, resolution_context))
+        if self._evaluation_stack:
+            referring_scope, referring_var = self._evaluation_stack[-1]
+            referring_scope.dependencies[referring_var].append((defining_scope.name, var_name))
+        return self._resolve_in_scope(defining_scope, var_name)
+
+    def _determine_scope_of_field(self) -> VariableScope:
+        # Only the main script arguments of a run can refer to the variables of the run
+        rfs = self._current_rfs
+        if rfs and rfs.name == "main_script_arguments" and isinstance(rfs.parent, CdswRun):
+            return self._get_run_scope(rfs.parent)
+        return self.global_scope
 
     def resolve_lambda(self, callable, rfs):
         self._current_rfs = rfs
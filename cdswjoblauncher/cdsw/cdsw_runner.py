@@ -1,24 +1,47 @@
 import logging
 import os
+import resource
+import threading
 import time
 from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, Future
+from dataclasses import dataclass, field, asdict
 from enum import Enum
-from typing import List, Tuple, Dict, Callable, Optional
+from typing import List, Tuple, Dict, Callable, Optional, Iterable, Union, TYPE_CHECKING
 
-from googleapiwrapper.google_drive import DriveApiFile
-from pythoncommons.file_utils import FileUtils, FindResultType
+from pythoncommons.file_utils import FileUtils
 from pythoncommons.os_utils import OsUtils
-from pythoncommons.process import SubprocessCommandRunner
 
-from cdswjoblauncher.cdsw.cdsw_common import CdswSetupResult, CdswSetup, CMD_LOG, GoogleDriveCdswHelper, BASHX, PY3, \
-    CommonFiles, CommonMailConfig
-from cdswjoblauncher.cdsw.cdsw_config import CdswJobConfig, CdswRun, CdswJobConfigReader
+from cdswjoblauncher.cdsw.cdsw_common import CdswSetupResult, CdswSetup, GoogleDriveCdswHelper, BASHX, PY3, \
+    CommonFiles, CommonMailConfig, get_command_logger, CommonDirs
+from cdswjoblauncher.cdsw.cdsw_config import CdswJobConfig, CdswRun, CdswJobConfigReader, ResourceLimits
+from cdswjoblauncher.cdsw.config_cache import CdswJobConfigCache
 from cdswjoblauncher.cdsw.constants import CdswEnvVar
-from cdswjoblauncher.commands.send_latest_command_data_in_mail import SendLatestCommandDataInEmailConfig, \
-    FullEmailConfig, SendLatestCommandDataInEmail
+from cdswjoblauncher.cdsw.drive_upload_settings import DriveUploadSettings, UploadMetrics
+from cdswjoblauncher.cdsw.lazy_import import lazy_import
+from cdswjoblauncher.cdsw.pipeline import Pipeline
+from cdswjoblauncher.cdsw.process_resources import ResourceUsage
+from cdswjoblauncher.cdsw.timing import Tracer, Phase
 from cdswjoblauncher.commands.zip_latest_command_data import CommandDataZipperConfig, ZipLatestCommandData
+from cdswjoblauncher.core.error import CommandExecutionException, CommandTimedOutException
+
+if TYPE_CHECKING:
+    from googleapiwrapper.google_drive import DriveApiFile
+    from cdswjoblauncher.commands.mail_transport import MailTransport
+    from cdswjoblauncher.cdsw.command_engine import AsyncCommandEngine, CommandResult
+    from cdswjoblauncher.cdsw.warm_interpreter import WarmInterpreter
+
+# Only imported when emails are sent or commands are executed
+pythoncommons_email = lazy_import("pythoncommons.email")
+process = lazy_import("pythoncommons.process")
+mail_transport = lazy_import("cdswjoblauncher.commands.mail_transport")
+send_mail = lazy_import("cdswjoblauncher.commands.send_latest_command_data_in_mail")
+command_engine = lazy_import("cdswjoblauncher.cdsw.command_engine")
+warm_interpreter = lazy_import("cdswjoblauncher.cdsw.warm_interpreter")
 
 LOG = logging.getLogger(__name__)
+JOB_CONFIG_FILE_SUFFIX = "_job_config.py"
 
 
 class ConfigMode(Enum):
@@ -97,6 +120,77 @@ class ArgParser:
         parser.add_argument("--main-script-name", type=str, help="Name of the main script from the module to execute on CDSW")
 
         parser.add_argument("--job-preparation-callback", action="append", required=False)
+        parser.add_argument(
+            "--max-parallel-runs",
+            type=int,
+            default=None,
+            required=False,
+            help="Maximum number of runs to execute concurrently. Overrides 'max_parallel_runs' of the job config. "
+            "For session based command types, only the post-processing of the runs overlaps with other runs",
+        )
+        parser.add_argument(
+            "--pipeline-post-processing",
+            dest="pipeline_post_processing",
+            action="store_true",
+            default=False,
+            required=False,
+            help="Zip, upload and send command data of a run in the background while the next run's main script runs",
+        )
+        parser.add_argument(
+            "--invalidate-config-cache",
+            dest="invalidate_config_cache",
+            action="store_true",
+            default=False,
+            required=False,
+            help="Remove the cached job config of the config file before reading it",
+        )
+        parser.add_argument(
+            "--incremental-command-data",
+            dest="incremental_command_data",
+            action="store_true",
+            default=False,
+            required=False,
+            help="Reuse the previous command data zip if no files changed since it was written",
+        )
+        parser.add_argument(
+            "--drive-upload-chunk-size",
+            type=int,
+            default=None,
+            required=False,
+            help="Upload command data to Google Drive with a resumable upload in chunks of the specified size in MiB",
+        )
+        parser.add_argument(
+            "--max-parallel-uploads",
+            type=int,
+            default=1,
+            required=False,
+            help="Maximum number of concurrent Google Drive uploads, shared by all runs",
+        )
+        parser.add_argument(
+            "--async-command-engine",
+            dest="async_command_engine",
+            action="store_true",
+            default=False,
+            required=False,
+            help="Run the main script without a shell and stream its output to the log and a log file per run",
+        )
+        parser.add_argument(
+            "--command-timeout",
+            dest="command_timeout",
+            type=float,
+            default=None,
+            required=False,
+            help="Timeout of the main script in seconds, only used with --async-command-engine or --warm-interpreter",
+        )
+        parser.add_argument(
+            "--warm-interpreter",
+            dest="warm_interpreter",
+            action="store_true",
+            default=False,
+            required=False,
+            help="Run the main script in a process forked from a fork server that imported the main script once, "
+            "instead of starting a new Python interpreter for each run",
+        )
 
         args = parser.parse_args()
         if args.verbose:
@@ -105,8 +199,18 @@ class ArgParser:
 
 
 class CdswConfigReaderAdapter:
-    def read_from_file(self, file: str, command_type_valid_env_vars: List[str], setup_result: CdswSetupResult):
-        return CdswJobConfigReader.read_from_file(file, command_type_valid_env_vars, setup_result)
+    def read_from_file(self,
+                       file: str,
+                       command_type_valid_env_vars: List[str],
+                       setup_result: CdswSetupResult,
+                       invalidate_cache: bool = False):
+        config_cache = CdswJobConfigCache()
+        if invalidate_cache:
+            config_cache.invalidate(file)
+        if not OsUtils.is_env_var_true(CdswEnvVar.ENABLE_JOB_CONFIG_CACHE.value, default_val=False):
+            config_cache = None
+        return CdswJobConfigReader.read_from_file(file, command_type_valid_env_vars, setup_result,
+                                                  config_cache=config_cache)
 
 
 class CdswRunnerConfig:
@@ -131,6 +235,14 @@ class CdswRunnerConfig:
         self.job_preparation_callback_names: List[str] = self._parse_job_preparation_callbacks(args)
         self.module_name = args.module_name
         self.main_script_name = args.main_script_name
+        self.max_parallel_runs: Optional[int] = self._parse_max_parallel_runs(parser, args)
+        self.pipeline_post_processing: bool = getattr(args, "pipeline_post_processing", False)
+        self.invalidate_config_cache: bool = getattr(args, "invalidate_config_cache", False)
+        self.incremental_command_data: bool = getattr(args, "incremental_command_data", False)
+        self.drive_upload_settings: DriveUploadSettings = self._parse_drive_upload_settings(parser, args)
+        self.async_command_engine: bool = getattr(args, "async_command_engine", False)
+        self.warm_interpreter: bool = getattr(args, "warm_interpreter", False)
+        self.command_timeout: Optional[float] = self._parse_command_timeout(parser, args)
 
     def _determine_job_config_file_location(self, args):
         if self.execution_mode == ConfigMode.SPECIFIED_CONFIG_FILE:
@@ -140,22 +252,20 @@ class CdswRunnerConfig:
             return self._discover_config_file()
 
     def _discover_config_file(self):
-        file_paths = FileUtils.find_files(
-            self.config_dir,
-            find_type=FindResultType.FILES,
-            regex=".*\\.py",
-            single_level=True,
-            full_path_result=True,
-        )
-        expected_filename = f"{self.command_type_name}_job_config.py"
-        file_names = [os.path.basename(f) for f in file_paths]
-        if expected_filename not in file_names:
-            raise ValueError(
-                "Auto-discovery failed for command '{}'. Expected file path: {}, Actual files found: {}".format(
-                    self.command_type_name, expected_filename, file_paths
-                )
+        expected_filename = f"{self.command_type_name}{JOB_CONFIG_FILE_SUFFIX}"
+        file_path = FileUtils.join_path(self.config_dir, expected_filename)
+        if os.path.isfile(file_path):
+            return file_path
+        raise ValueError(
+            "Auto-discovery failed for command '{}'. Expected file path: {}, Actual files found: {}".format(
+                self.command_type_name, expected_filename, self._list_job_config_files(self.config_dir)
             )
-        return FileUtils.join_path(self.config_dir, expected_filename)
+        )
+
+    @staticmethod
+    def _list_job_config_files(config_dir: str) -> List[str]:
+        with os.scandir(config_dir) as it:
+            return sorted(entry.path for entry in it if entry.name.endswith(JOB_CONFIG_FILE_SUFFIX) and entry.is_file())
 
     def _validate_args(self, parser, args):
         self.config_file = self.config_dir = None
@@ -189,6 +299,32 @@ class CdswRunnerConfig:
                 d[split[0]] = split[1]
         return {}
 
+    @staticmethod
+    def _parse_max_parallel_runs(parser, args):
+        if not hasattr(args, "max_parallel_runs") or args.max_parallel_runs is None:
+            return None
+        if args.max_parallel_runs < 1:
+            parser.error("Value of --max-parallel-runs must be at least 1!")
+        return args.max_parallel_runs
+
+    @staticmethod
+    def _parse_command_timeout(parser, args):
+        command_timeout = getattr(args, "command_timeout", None)
+        if command_timeout is not None and command_timeout <= 0:
+            parser.error("--command-timeout should be a positive number. Given value: {}".format(command_timeout))
+        return command_timeout
+
+    @staticmethod
+    def _parse_drive_upload_settings(parser, args):
+        chunk_size_mib = getattr(args, "drive_upload_chunk_size", None)
+        max_parallel_uploads = getattr(args, "max_parallel_uploads", 1)
+        if chunk_size_mib is not None and chunk_size_mib < 1:
+            parser.error("Value of --drive-upload-chunk-size must be at least 1!")
+        if max_parallel_uploads < 1:
+            parser.error("Value of --max-parallel-uploads must be at least 1!")
+        chunk_size = chunk_size_mib * 1024 * 1024 if chunk_size_mib is not None else None
+        return DriveUploadSettings(chunk_size=chunk_size, max_parallel_uploads=max_parallel_uploads)
+
     @staticmethod
     def _parse_job_preparation_callbacks(args):
         if not hasattr(args, "job_preparation_callback") or not args.job_preparation_callback:
@@ -202,20 +338,75 @@ class CdswRunnerConfig:
         return result
 
 
+@dataclass
+class CdswRunResult:
+    run_name: str
+    # Output dir of the main script
+    output_dir: str
+    # Dir of the command data zip and its links, defaults to the output dir of the main script
+    command_data_dir: str = None
+    executed_commands: List[str] = field(default_factory=list)
+    google_drive_uploads: List[Tuple[str, str, "DriveApiFile"]] = field(default_factory=list)
+    upload_metrics: List[UploadMetrics] = field(default_factory=list)
+    # Only filled if the commands are run by the async command engine
+    command_results: List["CommandResult"] = field(default_factory=list)
+    # Resource usage of the main script. Without the command engine, it is the usage of the children of the runner
+    # finished while the main script was running, which includes other runs finished in the meantime
+    resource_usage: Optional[ResourceUsage] = None
+
+    def __post_init__(self):
+        if not self.command_data_dir:
+            self.command_data_dir = self.output_dir
+
+
+@dataclass
+class PostProcessingTask:
+    run: CdswRun
+    run_result: CdswRunResult
+    command_data_zipper: ZipLatestCommandData
+    # Filled by the zip stage
+    command_data_zip: Optional[str] = None
+    # Filled by the submit upload stage, the result is the HTML link of the uploaded file
+    drive_upload: Optional[Future] = None
+    drive_link_html_text: Optional[str] = None
+
+
 class CdswRunner:
+    RUNS_OUTPUT_DIR_NAME = "runs"
+    POST_PROCESSING_QUEUE_SIZE = 2
+
     def __init__(self, config: CdswRunnerConfig, google_drive_cdsw_helper=None):
         self.executed_commands = []
         self.google_drive_uploads: List[
-            Tuple[str, str, DriveApiFile]
+            Tuple[str, str, "DriveApiFile"]
         ] = []  # Tuple of: (command_type_name, drive_filename, drive_api_file)
+        self.upload_metrics: List[UploadMetrics] = []
+        self.tracer = Tracer()
         self.common_mail_config = CommonMailConfig()
-        self._setup_google_drive(config.module_name, google_drive_cdsw_helper=google_drive_cdsw_helper)
+        # The SMTP session is shared by all runs of the job
+        self.mail_transport: Optional["MailTransport"] = None
+        self._mail_transport_lock = threading.Lock()
+        self._setup_google_drive(
+            config.module_name, config.drive_upload_settings, google_drive_cdsw_helper=google_drive_cdsw_helper
+        )
         self.cdsw_runner_config = config
         self.dry_run = config.dry_run
+        self.command_engine: Optional["AsyncCommandEngine"] = None
+        self._command_engine_lock = threading.Lock()
+        # Serializes the main scripts of session based runs with the snapshot of their session data
+        self._session_data_lock = threading.Lock()
+        # Children of concurrent runs are reaped in the same process, so the usage of the children reaped while
+        # a command is run by the shell is not the usage of that command
+        self._runs_execute_concurrently = False
+        if config.async_command_engine:
+            self._get_command_engine()
+        # Created on first use, as the main script is only known after the setup
+        self.warm_interpreter: Optional["WarmInterpreter"] = None
 
         # Dynamic fields
         self.job_config = None
         self.output_basedir = None
+        self.run_results: List[CdswRunResult] = []
 
     def _check_command_type(self):
         if self.cdsw_runner_config.command_type_name != self.job_config.command_type:
@@ -228,33 +419,212 @@ class CdswRunner:
 
     def start(self):
         LOG.info("Starting CDSW runner...")
-        self.setup_result: CdswSetupResult = CdswSetup.initial_setup(self.cdsw_runner_config.module_name,
-                                                                     self.cdsw_runner_config.main_script_name,
-                                                                     self.cdsw_runner_config.job_preparation_callback_names,
-                                                                     self.cdsw_runner_config.envs,
-                                                                     )
-        LOG.info("Setup result: %s", self.setup_result)
-        self.job_config: CdswJobConfig = self.cdsw_runner_config.config_reader.read_from_file(
-            self.cdsw_runner_config.job_config_file,
-            self.cdsw_runner_config.command_type_valid_env_vars,
-            self.setup_result
+        try:
+            with self.tracer.span("initial_setup", Phase.SETUP):
+                self.setup_result: CdswSetupResult = CdswSetup.initial_setup(
+                    self.cdsw_runner_config.module_name,
+                    self.cdsw_runner_config.main_script_name,
+                    self.cdsw_runner_config.job_preparation_callback_names,
+                    self.cdsw_runner_config.envs,
+                )
+            LOG.info("Setup result: %s", self.setup_result)
+            with self.tracer.span("read_job_config", Phase.CONFIG, file=self.cdsw_runner_config.job_config_file):
+                self.job_config: CdswJobConfig = self.cdsw_runner_config.config_reader.read_from_file(
+                    self.cdsw_runner_config.job_config_file,
+                    self.cdsw_runner_config.command_type_valid_env_vars,
+                    self.setup_result,
+                    invalidate_cache=self.cdsw_runner_config.invalidate_config_cache,
+                )
+            self._check_command_type()
+            self.output_basedir = self.setup_result.output_basedir
+            LOG.info("Setup result: %s", self.setup_result)
+
+            for callback in self.setup_result.job_preparation_callbacks:
+                LOG.info("Calling job preparation callback: %s", callback)
+                with self.tracer.span(getattr(callback, "__name__", str(callback)), Phase.CALLBACK):
+                    callback(self, self.job_config, self.setup_result)
+
+            max_parallel_runs = self._determine_max_parallel_runs()
+            if self.command_engine:
+                # Only the main scripts of the runs are run by the command engine
+                self.command_engine.max_concurrent_commands = max_parallel_runs
+            if max_parallel_runs > 1:
+                self._execute_runs_in_parallel(self.job_config.runs, max_parallel_runs)
+            elif self._is_post_processing_pipelined():
+                self._execute_runs_with_post_processing_pipeline(self.job_config.runs)
+            else:
+                for run in self.job_config.runs:
+                    self._record_run_result(self._execute_run(run, self.output_basedir))
+        finally:
+            if self.command_engine:
+                self.command_engine.close()
+            with self.tracer.span("close_mail_transport", Phase.EMAIL):
+                self._close_mail_transport()
+            self._report_timing()
+
+    def _report_timing(self):
+        LOG.info("Timing summary:\n%s", self.tracer.format_summary_table())
+        if self.dry_run:
+            LOG.info("[DRY-RUN] Would write timing report")
+            return
+        report_dir = self._determine_timing_report_dir()
+        if not report_dir:
+            LOG.warning("Cannot write timing report as neither the log dir nor the output dir is known")
+            return
+        timestamp = self.tracer.started_at.strftime("%Y%m%d_%H%M%S")
+        file_name = f"timing-report-{self.cdsw_runner_config.command_type_name}-{timestamp}.json"
+        try:
+            FileUtils.ensure_dir_created(report_dir)
+            self.tracer.write_report(FileUtils.join_path(report_dir, file_name))
+        except OSError:
+            LOG.exception("Failed to write timing report to dir: %s", report_dir)
+
+    def _determine_timing_report_dir(self) -> Optional[str]:
+        setup_result = getattr(self, "setup_result", None)
+        if setup_result and setup_result.log_dir:
+            return setup_result.log_dir
+        return self.output_basedir
+
+    def _determine_max_parallel_runs(self) -> int:
+        if self.cdsw_runner_config.max_parallel_runs is not None:
+            return self.cdsw_runner_config.max_parallel_runs
+        return self.job_config.max_parallel_runs
+
+    def _is_post_processing_pipelined(self) -> bool:
+        if not self.cdsw_runner_config.command_type_session_based:
+            return False
+        return self.cdsw_runner_config.pipeline_post_processing or self.job_config.pipeline_post_processing
+
+    def _execute_runs_in_parallel(self, runs: Iterable[CdswRun], max_parallel_runs: int):
+        LOG.info("Executing runs with max parallelism of %d", max_parallel_runs)
+        self._runs_execute_concurrently = True
+        try:
+            with ThreadPoolExecutor(max_workers=max_parallel_runs, thread_name_prefix="cdsw-run") as executor:
+                # Runs are only taken from the iterable when a worker is free, so generated runs are not materialized
+                futures = deque()
+                for run in runs:
+                    running = [f for f in futures if not f.done()]
+                    if len(running) >= max_parallel_runs:
+                        wait(running, return_when=FIRST_COMPLETED)
+                    command_data_dir = None
+                    if self.cdsw_runner_config.command_type_session_based:
+                        command_data_dir = self._create_run_output_dir(run)
+                    futures.append(executor.submit(self._execute_run, run, self.output_basedir, command_data_dir))
+                    # Results are collected in the order of runs, regardless of the order of completion
+                    while futures and futures[0].done():
+                        self._record_run_result(futures.popleft().result())
+                for future in futures:
+                    self._record_run_result(future.result())
+        finally:
+            self._runs_execute_concurrently = False
+
+    def _execute_runs_with_post_processing_pipeline(self, runs: Iterable[CdswRun]):
+        LOG.info("Executing runs with pipelined post-processing")
+        # Uploads of the runs can overlap with each other, the upload stage only waits for them in the order of runs
+        upload_executor = ThreadPoolExecutor(
+            max_workers=self.cdsw_runner_config.drive_upload_settings.max_parallel_uploads,
+            thread_name_prefix="drive-upload",
         )
-        self._check_command_type()
-        self.output_basedir = self.setup_result.output_basedir
-        LOG.info("Setup result: %s", self.setup_result)
-
-        for callback in self.setup_result.job_preparation_callbacks:
-            LOG.info("Calling job preparation callback: %s", callback)
-            callback(self, self.job_config, self.setup_result)
-
-        for run in self.job_config.runs:
-            self.execute_main_script(" ".join(run.main_script_arguments))
-            if self.cdsw_runner_config.command_type_session_based:
-                self.execute_command_data_zipper(self.cdsw_runner_config.command_type_name)
-                drive_link_html_text = self._upload_command_data_to_google_drive_if_required(run)
-                self._send_email_if_required(run, drive_link_html_text)
-
-    def _upload_command_data_to_google_drive_if_required(self, run: CdswRun):
+        pipeline = Pipeline("post-processing", queue_size=self.POST_PROCESSING_QUEUE_SIZE)
+        pipeline.add_stage("zip", self._zip_stage)
+        pipeline.add_stage("submit_upload", lambda task: self._submit_upload_stage(task, upload_executor))
+        pipeline.add_stage("upload", self._upload_stage)
+        pipeline.add_stage(
+            "email", lambda task: self._send_email_if_required(task.run, task.drive_link_html_text, task.command_data_zip)
+        )
+        pipeline.start()
+
+        results = []
+        try:
+            for run in runs:
+                # Main scripts are writing to the common output dir,
+                # zip files are kept separate as the post-processing of multiple runs can overlap
+                result = CdswRunResult(run.name, self.output_basedir, command_data_dir=self._create_run_output_dir(run))
+                results.append(result)
+                # Post-processing of the run is traced separately, on the threads of the pipeline
+                with self.tracer.span(run.name, Phase.RUN):
+                    self._execute_main_script_of_run(run, result)
+                command_data_zipper = self._create_command_data_zipper(
+                    self.cdsw_runner_config.command_type_name, run_result=result
+                )
+                pipeline.submit(run.name, PostProcessingTask(run, result, command_data_zipper))
+        finally:
+            LOG.info("Waiting for post-processing pipeline to finish...")
+            try:
+                failures = pipeline.drain()
+            finally:
+                upload_executor.shutdown(wait=True)
+                for result in results:
+                    self._record_run_result(result)
+
+        if failures:
+            for failure in failures:
+                LOG.error("Post-processing failure: %s", failure)
+            raise ValueError(
+                "Post-processing failed for {} run(s). Failures: {}".format(
+                    len(failures), [str(f) for f in failures]
+                )
+            )
+
+    def _zip_stage(self, task: PostProcessingTask):
+        self._run_command_data_zipper(task.command_data_zipper)
+        task.command_data_zip = self._determine_command_data_zip(task.run_result.command_data_dir)
+
+    def _submit_upload_stage(self, task: PostProcessingTask, upload_executor: ThreadPoolExecutor):
+        task.drive_upload = upload_executor.submit(
+            self._upload_command_data_to_google_drive_if_required, task.run, run_result=task.run_result
+        )
+
+    def _upload_stage(self, task: PostProcessingTask):
+        task.drive_link_html_text = task.drive_upload.result()
+
+    def _create_run_output_dir(self, run: CdswRun):
+        run_output_dir = FileUtils.join_path(self.output_basedir, self.RUNS_OUTPUT_DIR_NAME, run.name)
+        if not self.dry_run:
+            FileUtils.ensure_dir_created(run_output_dir)
+        return run_output_dir
+
+    def _execute_run(self, run: CdswRun, output_dir: str, command_data_dir: str = None) -> CdswRunResult:
+        with self.tracer.span(run.name, Phase.RUN):
+            result = CdswRunResult(run.name, output_dir, command_data_dir=command_data_dir)
+            if not self.cdsw_runner_config.command_type_session_based:
+                self._execute_main_script_of_run(run, result)
+                return result
+
+            # Main scripts write their session data to the common output dir and point the common latest-* links to it.
+            # A main script must not run until the session data of the previous one is snapshotted,
+            # so only the zip, upload and email steps of concurrent runs overlap
+            with self._session_data_lock:
+                self._execute_main_script_of_run(run, result)
+                command_data_zipper = self._create_command_data_zipper(
+                    self.cdsw_runner_config.command_type_name, run_result=result
+                )
+            self._run_command_data_zipper(command_data_zipper)
+            drive_link_html_text = self._upload_command_data_to_google_drive_if_required(run, run_result=result)
+            self._send_email_if_required(
+                run, drive_link_html_text, self._determine_command_data_zip(result.command_data_dir)
+            )
+            return result
+
+    def _execute_main_script_of_run(self, run: CdswRun, result: CdswRunResult):
+        self.execute_main_script(
+            run.main_script_arguments,
+            run_result=result,
+            resource_limits=self._determine_resource_limits(run),
+        )
+
+    def _determine_resource_limits(self, run: CdswRun) -> Optional[ResourceLimits]:
+        if self.job_config.resource_limits:
+            return self.job_config.resource_limits.merge(run.resource_limits)
+        return run.resource_limits
+
+    def _record_run_result(self, result: CdswRunResult):
+        self.run_results.append(result)
+        self.executed_commands.extend(result.executed_commands)
+        self.google_drive_uploads.extend(result.google_drive_uploads)
+        self.upload_metrics.extend(result.upload_metrics)
+
+    def _upload_command_data_to_google_drive_if_required(self, run: CdswRun, run_result: CdswRunResult = None):
         if not self.is_drive_integration_enabled:
             LOG.info(
                 "Google Drive integration is disabled with env var '%s'!",
@@ -270,8 +640,14 @@ class CdswRunner:
 
         drive_filename = run.drive_api_upload_settings.file_name
         if not self.dry_run:
-            drive_api_file: DriveApiFile = self.upload_command_data_to_drive(drive_filename)
-            self.google_drive_uploads.append((self.cdsw_runner_config.command_type_name, drive_filename, drive_api_file))
+            command_data_dir = run_result.command_data_dir if run_result else None
+            start_time = time.perf_counter()
+            drive_api_file: "DriveApiFile" = self.upload_command_data_to_drive(drive_filename, command_data_dir)
+            metrics = self._create_upload_metrics(drive_filename, command_data_dir, time.perf_counter() - start_time)
+            uploads = run_result.google_drive_uploads if run_result else self.google_drive_uploads
+            uploads.append((self.cdsw_runner_config.command_type_name, drive_filename, drive_api_file))
+            upload_metrics = run_result.upload_metrics if run_result else self.upload_metrics
+            upload_metrics.append(metrics)
             return f'<a href="{drive_api_file.link}">Command data file: {drive_filename}</a>'
         else:
             LOG.info(
@@ -281,7 +657,23 @@ class CdswRunner:
             )
             return f'<a href="dummy_link">Command data file: {drive_filename}</a>'
 
-    def _send_email_if_required(self, run: CdswRun, drive_link_html_text: Optional[str]):
+    def _create_upload_metrics(self, drive_filename: str, command_data_dir: Optional[str], duration: float):
+        local_file = self._determine_command_data_zip(command_data_dir)
+        size = os.path.getsize(local_file) if os.path.exists(local_file) else None
+        metrics = UploadMetrics(drive_filename, local_file, size, duration)
+        LOG.info(
+            "Uploaded file '%s' to Google Drive as '%s'. Size: %s bytes, duration: %.2f s, throughput: %.2f KiB/s",
+            local_file,
+            drive_filename,
+            size,
+            duration,
+            metrics.throughput / 1024,
+        )
+        return metrics
+
+    def _send_email_if_required(
+        self, run: CdswRun, drive_link_html_text: Optional[str], command_data_zip: Optional[str] = None
+    ):
         if not run.email_settings:
             LOG.info("Email settings is not defined for run: %s", run.name)
             return
@@ -295,15 +687,18 @@ class CdswRunner:
             attachment_filename=run.email_settings.attachment_file_name,
             email_body_file=run.email_settings.email_body_file_from_command_data,
             send_attachment=True,
-            prepend_text_to_email_body=drive_link_html_text
+            prepend_text_to_email_body=drive_link_html_text,
+            command_data_zip=command_data_zip,
         )
 
-    def _setup_google_drive(self, module_name: str, google_drive_cdsw_helper=None):
+    def _setup_google_drive(
+        self, module_name: str, upload_settings: DriveUploadSettings, google_drive_cdsw_helper=None
+    ):
         if google_drive_cdsw_helper:
             self.drive_cdsw_helper = google_drive_cdsw_helper
             return
         if OsUtils.is_env_var_true(CdswEnvVar.ENABLE_GOOGLE_DRIVE_INTEGRATION.value, default_val=True):
-            self.drive_cdsw_helper = GoogleDriveCdswHelper(module_name)
+            self.drive_cdsw_helper = GoogleDriveCdswHelper(module_name, upload_settings=upload_settings)
         else:
             self.drive_cdsw_helper = None
 
@@ -312,20 +707,144 @@ class CdswRunner:
         cmd = f"{BASHX} {script}"
         self._execute_command(cmd)
 
-    def execute_main_script(self, script_args):
-        cmd = f"{PY3} {CommonFiles.MAIN_SCRIPT} {script_args}"
-        self._execute_command(cmd)
-
-    def _execute_command(self, cmd):
-        self.executed_commands.append(cmd)
+    def execute_main_script(
+        self,
+        main_script_arguments: Union[str, List[str]],
+        run_result: CdswRunResult = None,
+        resource_limits: ResourceLimits = None,
+    ):
+        """
+        :param main_script_arguments: Final main script arguments of the run: an argument and its parameters per item.
+        A string is accepted as well, it is the whole argument string of the main script
+        :param resource_limits: Limits of the main script process, the main script is run by the command engine
+        if it is specified, as the limits are set in the child process
+        """
+        if isinstance(main_script_arguments, str):
+            main_script_arguments = [main_script_arguments]
+        cmd = f"{PY3} {CommonFiles.MAIN_SCRIPT} {' '.join(main_script_arguments)}"
+        argv = None
+        if self._is_main_script_run_without_shell(resource_limits):
+            argv = [PY3, CommonFiles.MAIN_SCRIPT] + self._to_argv(main_script_arguments)
+        run_name = run_result.run_name if run_result else None
+        with self.tracer.span("main_script", Phase.MAIN_SCRIPT, run=run_name) as span:
+            try:
+                self._execute_command(cmd, run_result=run_result, argv=argv, resource_limits=resource_limits)
+            finally:
+                if run_result and run_result.resource_usage:
+                    LOG.info("Resource usage of main script of run '%s': %s", run_name, run_result.resource_usage)
+                    span.attributes["resource_usage"] = asdict(run_result.resource_usage)
+
+    def _execute_command(
+        self,
+        cmd,
+        run_result: CdswRunResult = None,
+        argv: List[str] = None,
+        resource_limits: ResourceLimits = None,
+    ):
+        """
+        :param argv: Arguments of the command without a shell. If argv is specified, the command is run by the warm
+        interpreter if it is enabled, otherwise by the async command engine
+        """
+        executed_commands = run_result.executed_commands if run_result else self.executed_commands
+        executed_commands.append(cmd)
         if self.dry_run:
             LOG.info("[DRY-RUN] Would run command: %s", cmd)
+        elif argv:
+            self._execute_command_with_engine(cmd, argv, run_result, resource_limits)
         else:
-            SubprocessCommandRunner.run_and_follow_stdout_stderr(
-                cmd, stdout_logger=CMD_LOG, exit_on_nonzero_exitcode=True
+            usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+            process.SubprocessCommandRunner.run_and_follow_stdout_stderr(
+                cmd, stdout_logger=get_command_logger(), exit_on_nonzero_exitcode=True
             )
+            if run_result and not self._runs_execute_concurrently:
+                run_result.resource_usage = ResourceUsage.of_children_between(
+                    usage_before, resource.getrusage(resource.RUSAGE_CHILDREN)
+                )
+            elif run_result:
+                LOG.debug(
+                    "Resource usage of run '%s' is not recorded as runs execute concurrently", run_result.run_name
+                )
+
+    def _is_main_script_run_without_shell(self, resource_limits: Optional[ResourceLimits]) -> bool:
+        if self.dry_run:
+            return False
+        return bool(self.cdsw_runner_config.warm_interpreter or self.command_engine or resource_limits)
+
+    @staticmethod
+    def _to_argv(main_script_arguments: List[str]) -> List[str]:
+        # Same split as CdswJobConfigReader._fill_args_from: an argument is followed by its parameters,
+        # quotes are not interpreted
+        return [token for arg in main_script_arguments for token in arg.split(" ") if token]
+
+    def _execute_command_with_engine(
+        self,
+        cmd,
+        argv: List[str],
+        run_result: CdswRunResult,
+        resource_limits: ResourceLimits = None,
+    ):
+        if self.cdsw_runner_config.warm_interpreter:
+            engine = self._get_warm_interpreter()
+        else:
+            engine = self._get_command_engine()
+        log_file = None
+        if run_result:
+            log_dir = self._determine_command_log_dir(run_result)
+            FileUtils.ensure_dir_created(log_dir)
+            log_file = FileUtils.join_path(log_dir, f"command-{run_result.run_name}.log")
+        timeout = engine.timeout
+        rlimits = None
+        if resource_limits:
+            if resource_limits.wall_timeout_seconds is not None:
+                timeout = resource_limits.wall_timeout_seconds
+            rlimits = resource_limits.to_rlimits()
+        result = engine.run(argv, log_file=log_file, timeout=timeout, rlimits=rlimits)
+        LOG.info("Command finished: %s, %s", cmd, result)
+        if run_result:
+            run_result.command_results.append(result)
+            run_result.resource_usage = result.resource_usage
+        if result.timed_out:
+            raise CommandTimedOutException("Command timed out after {} seconds".format(timeout), cmd=cmd)
+        if not result.succeeded:
+            raise CommandExecutionException("Command failed. {}".format(result), cmd=cmd)
+
+    def _get_command_engine(self) -> "AsyncCommandEngine":
+        with self._command_engine_lock:
+            if not self.command_engine:
+                self.command_engine = command_engine.AsyncCommandEngine(
+                    output_logger=get_command_logger(), timeout=self.cdsw_runner_config.command_timeout
+                )
+                # The engine can be created before the job config is read, then it is sized when the runs are started
+                if getattr(self, "job_config", None):
+                    self.command_engine.max_concurrent_commands = self._determine_max_parallel_runs()
+            return self.command_engine
+
+    def _get_warm_interpreter(self) -> "WarmInterpreter":
+        with self._command_engine_lock:
+            if not self.warm_interpreter:
+                self.warm_interpreter = warm_interpreter.WarmInterpreter(
+                    [self._determine_main_module_name()],
+                    output_logger=get_command_logger(),
+                    timeout=self.cdsw_runner_config.command_timeout,
+                )
+            return self.warm_interpreter
 
-    def execute_command_data_zipper(self, command_type_name: str):
+    def _determine_main_module_name(self) -> str:
+        main_script = os.path.splitext(CommonFiles.MAIN_SCRIPT)[0]
+        module_path = os.path.relpath(main_script, CommonDirs.MODULE_ROOT).split(os.sep)
+        return ".".join([self.cdsw_runner_config.module_name] + module_path)
+
+    def _determine_command_log_dir(self, run_result: CdswRunResult) -> str:
+        setup_result = getattr(self, "setup_result", None)
+        if setup_result and setup_result.log_dir:
+            return setup_result.log_dir
+        return run_result.output_dir
+
+    def execute_command_data_zipper(self, command_type_name: str, run_result: CdswRunResult = None):
+        command_data_zipper = self._create_command_data_zipper(command_type_name, run_result=run_result)
+        self._run_command_data_zipper(command_data_zipper)
+
+    def _create_command_data_zipper(self, command_type_name: str, run_result: CdswRunResult = None):
         # TODO cdsw-separation Migrate ZIP_LATEST_COMMAND_DATA to this project from yarndevtools
         # TODO cdsw-separation All files to be zipped should be explicitly declared based on CommandType from yarndevtools
         #   ALL FILES SHOULD BE SPECIFIED VIA CLI
@@ -340,23 +859,40 @@ class CdswRunner:
         session_link_name = f"latest-session-{command_type_name}"
 
         input_files = [log_link_name + "*", session_link_name]
+        if not run_result:
+            run_result = CdswRunResult(None, self.output_basedir)
+        # Runs with their own command data dir keep their zip file there so that other runs won't overwrite it
+        isolated_command_data = run_result.command_data_dir != self.output_basedir
         # TODO cdsw-separation Check old code, when 'dest_filename' was overridden?
-        config = CommandDataZipperConfig(dest_dir="/tmp",
+        config = CommandDataZipperConfig(dest_dir=run_result.command_data_dir if isolated_command_data else "/tmp",
                                          ignore_filetypes=["java js"],
                                          input_files=input_files,
-                                         project_basedir=self.output_basedir,
+                                         project_basedir=run_result.command_data_dir,
                                          cmd_type_real_name=command_type_name,
-                                         dest_filename=None)
+                                         dest_filename=None,
+                                         incremental=self.cdsw_runner_config.incremental_command_data)
         command_data_zipper = ZipLatestCommandData(config)
+        if run_result.output_dir != run_result.command_data_dir and not self.dry_run:
+            # The output of the main script can be overwritten by the next run until the zipper runs
+            command_data_zipper.snapshot_input_files(run_result.output_dir)
+        return command_data_zipper
 
+    def _run_command_data_zipper(self, command_data_zipper: ZipLatestCommandData):
         if self.dry_run:
-            LOG.info("[DRY-RUN] Would run ZipLatestCommandData with config: %s", config)
+            LOG.info("[DRY-RUN] Would run ZipLatestCommandData with config: %s", command_data_zipper.config)
             return
-        command_data_zipper.run()
+        with self.tracer.span("zip_command_data", Phase.ZIP, project_dir=command_data_zipper.config.project_out_root):
+            command_data_zipper.run()
+
+    def _determine_command_data_zip(self, command_data_dir: Optional[str]) -> str:
+        if not command_data_dir:
+            command_data_dir = self.output_basedir
+        return FileUtils.join_path(command_data_dir, self.cdsw_runner_config.command_type_zip_name)
 
-    def upload_command_data_to_drive(self, drive_filename: str) -> DriveApiFile:
-        full_file_path_of_cmd_data = FileUtils.join_path(self.output_basedir, self.cdsw_runner_config.command_type_zip_name)
-        return self.drive_cdsw_helper.upload(self.cdsw_runner_config.command_type_name, full_file_path_of_cmd_data, drive_filename)
+    def upload_command_data_to_drive(self, drive_filename: str, command_data_dir: str = None) -> "DriveApiFile":
+        full_file_path_of_cmd_data = self._determine_command_data_zip(command_data_dir)
+        with self.tracer.span("upload_command_data", Phase.UPLOAD, drive_filename=drive_filename):
+            return self.drive_cdsw_helper.upload(self.cdsw_runner_config.command_type_name, full_file_path_of_cmd_data, drive_filename)
 
     def send_latest_command_data_in_email(
         self,
@@ -367,13 +903,20 @@ class CdswRunner:
         email_body_file: Optional[str] = None,
         prepend_text_to_email_body: Optional[str] = None,
         send_attachment: bool = True,
+        command_data_zip: Optional[str] = None,
     ):
+        """
+        :param command_data_zip: The command data zip of the run, defaults to the latest command data zip of the
+        output basedir
+        """
         LOG.debug("Arguments for send_latest_command_data_in_email: %s", locals().keys())
 
         if not recipients:
             recipients = self.determine_recipients()
+        if not command_data_zip:
+            command_data_zip = self._determine_command_data_zip(None)
 
-        email_conf: FullEmailConfig = FullEmailConfig(
+        email_conf = send_mail.FullEmailConfig(
             account_user=self.common_mail_config.account_user,
             account_password=self.common_mail_config.account_password,
             smtp_server=self.common_mail_config.smtp_server,
@@ -381,19 +924,52 @@ class CdswRunner:
             sender=sender,
             recipients=recipients,
             subject=subject,
-            attachment_filename=attachment_filename
+            # The zip file is not created in dry-run mode
+            attachment_file=None if self.dry_run else command_data_zip,
+            attachment_filename=attachment_filename,
+            smtp_ssl=self.common_mail_config.smtp_ssl,
+        )
+        conf = send_mail.SendLatestCommandDataInEmailConfig(
+            email_conf,
+            send_attachment=send_attachment,
+            email_body_file=email_body_file,
+            prepend_email_body_with_text=prepend_text_to_email_body,
         )
-        conf = SendLatestCommandDataInEmailConfig(email_conf,
-                                                  send_attachment=send_attachment,
-                                                  email_body_file=email_body_file,
-                                                  prepend_email_body_with_text=prepend_text_to_email_body)
 
         if self.dry_run:
-            LOG.info("[DRY-RUN] Would run SendLatestCommandDataInEmail with config: %s", conf)
+            LOG.info(
+                "[DRY-RUN] Would run SendLatestCommandDataInEmail with config: %s, command data zip: %s",
+                conf,
+                command_data_zip,
+            )
             return
 
-        send_email_cmd = SendLatestCommandDataInEmail(conf)
-        send_email_cmd.run()
+        send_email_cmd = send_mail.SendLatestCommandDataInEmail(conf, transport=self._get_mail_transport())
+        with self.tracer.span("send_email", Phase.EMAIL, subject=subject):
+            send_email_cmd.run()
+
+    def _get_mail_transport(self) -> "MailTransport":
+        with self._mail_transport_lock:
+            if not self.mail_transport:
+                account = pythoncommons_email.EmailAccount(
+                    self.common_mail_config.account_user, self.common_mail_config.account_password
+                )
+                email_conf = pythoncommons_email.EmailConfig(
+                    self.common_mail_config.smtp_server, self.common_mail_config.smtp_port, account
+                )
+                self.mail_transport = mail_transport.MailTransport(email_conf, use_ssl=self.common_mail_config.smtp_ssl)
+            return self.mail_transport
+
+    def _close_mail_transport(self):
+        if not self.mail_transport:
+            return
+        try:
+            self.mail_transport.close()
+        except Exception:
+            # Called when the job ends, an error here must not replace the error of the job
+            LOG.exception("Failed to close SMTP session")
+        finally:
+            self.mail_transport = None
 
     def determine_recipients(self):
         def as_list(r):
@@ -411,8 +987,6 @@ class CdswRunner:
             return as_list(recipients_env)
         return as_list(self.cdsw_runner_config.default_email_recipients)
 
-
-
     @property
     def is_drive_integration_enabled(self):
         return self.drive_cdsw_helper is not None
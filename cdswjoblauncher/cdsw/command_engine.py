@@ -0,0 +1,255 @@
+import asyncio
+import functools
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Set, Tuple
+
+from cdswjoblauncher.cdsw.process_resources import ResourceUsage, set_rlimits
+
+LOG = logging.getLogger(__name__)
+# Time to wait for a process to exit after SIGTERM before it is killed
+TERMINATE_GRACE_PERIOD_SECONDS = 5
+DEFAULT_MAX_CONCURRENT_COMMANDS = 32
+
+
+@dataclass
+class CommandResult:
+    argv: List[str]
+    exit_code: Optional[int] = None
+    wall_time: float = 0.0
+    resource_usage: ResourceUsage = field(default_factory=ResourceUsage)
+    timed_out: bool = False
+    cancelled: bool = False
+    log_file: Optional[str] = None
+
+    @property
+    def cpu_time(self) -> float:
+        return self.resource_usage.cpu_time
+
+    @property
+    def max_rss_kb(self) -> int:
+        return self.resource_usage.max_rss_kb
+
+    @property
+    def succeeded(self) -> bool:
+        return self.exit_code == 0 and not self.timed_out and not self.cancelled
+
+    def __str__(self):
+        return "exit code: {}, wall time: {:.2f} s, {}{}{}".format(
+            self.exit_code,
+            self.wall_time,
+            self.resource_usage,
+            ", timed out" if self.timed_out else "",
+            ", cancelled" if self.cancelled else "",
+        )
+
+
+class AsyncCommandEngine:
+    """
+    Runs commands as subprocesses without a shell, on an asyncio event loop of a background thread.
+    The stdout and stderr of the commands are streamed line by line to the output logger and to the log file
+    of the command while the commands are running.
+    Commands can be run from multiple threads concurrently, the calling thread waits for the result of its command.
+    The process is reaped with wait4, so the resource usage of the process itself is captured.
+    Each running command blocks a thread of the engine's own executor with wait4, so at most max_concurrent_commands
+    commands are run at a time, further commands wait for a free thread before they are started.
+    """
+
+    def __init__(
+        self,
+        output_logger: logging.Logger = None,
+        timeout: float = None,
+        max_concurrent_commands: int = DEFAULT_MAX_CONCURRENT_COMMANDS,
+    ):
+        """
+        :param max_concurrent_commands: Takes effect when the engine is started by its first command
+        """
+        self.output_logger = output_logger if output_logger else LOG
+        self.timeout = timeout
+        self.max_concurrent_commands = max_concurrent_commands
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._reaper_executor: Optional[ThreadPoolExecutor] = None
+        # Created on the loop, as asyncio primitives are bound to the loop of their creation on Python 3.8 and 3.9
+        self._command_slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def run(
+        self,
+        argv: List[str],
+        env: Dict[str, str] = None,
+        log_file: str = None,
+        timeout: float = None,
+        rlimits: Dict[int, Tuple[int, int]] = None,
+    ) -> CommandResult:
+        """
+        :param env: Env vars of the command, in addition to the env vars of the current process
+        :param timeout: Timeout of the command in seconds, overrides the timeout of the engine
+        :param rlimits: Soft and hard resource limits of the command process, see resource.setrlimit
+        """
+        loop = self._ensure_loop_started()
+        timeout = timeout if timeout is not None else self.timeout
+        future = asyncio.run_coroutine_threadsafe(self._run_as_task(argv, env, log_file, timeout, rlimits), loop)
+        return future.result()
+
+    def cancel_all(self):
+        """
+        Cancels the running commands, their processes are terminated.
+        """
+        with self._lock:
+            if not self._loop:
+                return
+            for task in list(self._tasks):
+                self._loop.call_soon_threadsafe(task.cancel)
+
+    def close(self):
+        with self._lock:
+            if not self._loop:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._reaper_executor.shutdown(wait=False)
+            self._loop = None
+            self._thread = None
+            self._reaper_executor = None
+            self._command_slots = None
+
+    def _ensure_loop_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if not self._loop:
+                self._reaper_executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrent_commands, thread_name_prefix="command-reaper"
+                )
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="async-command-engine", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    async def _run_as_task(self, argv, env, log_file, timeout, rlimits) -> CommandResult:
+        if not self._command_slots:
+            self._command_slots = asyncio.Semaphore(self.max_concurrent_commands)
+        task = asyncio.ensure_future(self._run_in_slot(argv, env, log_file, timeout, rlimits))
+        self._tasks.add(task)
+        try:
+            # The command handles the cancellation itself and still returns its result
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.cancel()
+            return await task
+        finally:
+            self._tasks.discard(task)
+
+    async def _run_in_slot(self, argv, env, log_file, timeout, rlimits) -> CommandResult:
+        # The command is only started when a reaper thread is free, so its timeout is not spent waiting for one
+        try:
+            await self._command_slots.acquire()
+        except asyncio.CancelledError:
+            LOG.warning("Command cancelled before it was started: %s", argv)
+            return CommandResult(list(argv), log_file=log_file, cancelled=True)
+        try:
+            return await self._run(argv, env, log_file, timeout, rlimits)
+        finally:
+            self._command_slots.release()
+
+    async def _run(
+        self, argv: List[str], env: Dict[str, str], log_file: str, timeout: float, rlimits: Dict[int, Tuple[int, int]]
+    ) -> CommandResult:
+        result = CommandResult(list(argv), log_file=log_file)
+        LOG.info("Running command: %s", argv)
+        if rlimits:
+            LOG.info("Resource limits of command: %s", rlimits)
+        loop = asyncio.get_running_loop()
+        proc_env = dict(os.environ, **env) if env else None
+        # Only resource calls are made in the forked child, so it does not depend on locks held by other threads
+        preexec_fn = functools.partial(set_rlimits, rlimits) if rlimits else None
+        log_file_obj = open(log_file, "w", buffering=1) if log_file else None
+        try:
+            start_time = time.perf_counter()
+            proc = subprocess.Popen(
+                argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=proc_env, preexec_fn=preexec_fn
+            )
+            # Reaping the process with wait4 instead of asyncio's child watcher gives the resource usage of the process
+            wait_future = loop.run_in_executor(self._reaper_executor, os.wait4, proc.pid, 0)
+            output_future = asyncio.gather(
+                self._stream_lines(proc.stdout, log_file_obj), self._stream_lines(proc.stderr, log_file_obj)
+            )
+            try:
+                _, status, rusage = await asyncio.wait_for(asyncio.shield(wait_future), timeout)
+            except asyncio.TimeoutError:
+                LOG.error("Command timed out after %s seconds, terminating it: %s", timeout, argv)
+                result.timed_out = True
+                _, status, rusage = await self._terminate(proc, wait_future)
+            except asyncio.CancelledError:
+                LOG.warning("Command cancelled, terminating it: %s", argv)
+                result.cancelled = True
+                _, status, rusage = await self._terminate(proc, wait_future)
+            # Output of processes started by the command can keep the pipes open, so the output is not awaited
+            # longer than the grace period
+            try:
+                await asyncio.wait_for(output_future, TERMINATE_GRACE_PERIOD_SECONDS)
+            except asyncio.TimeoutError:
+                LOG.warning("Output of command is still open after the command exited: %s", argv)
+            except asyncio.CancelledError:
+                # The process has already exited
+                result.cancelled = True
+        finally:
+            if log_file_obj:
+                log_file_obj.close()
+        result.wall_time = time.perf_counter() - start_time
+        proc.returncode = result.exit_code = AsyncCommandEngine._to_exit_code(status)
+        result.resource_usage = ResourceUsage.from_rusage(rusage)
+        LOG.info("Finished command: %s, %s", argv, result)
+        return result
+
+    async def _stream_lines(self, pipe, log_file_obj):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                self.output_logger.info(line)
+                if log_file_obj:
+                    log_file_obj.write(line + os.linesep)
+        finally:
+            transport.close()
+
+    @staticmethod
+    async def _terminate(proc: subprocess.Popen, wait_future):
+        AsyncCommandEngine._send_signal(proc, wait_future, signal.SIGTERM)
+        try:
+            return await asyncio.wait_for(asyncio.shield(wait_future), TERMINATE_GRACE_PERIOD_SECONDS)
+        except asyncio.TimeoutError:
+            LOG.warning("Process %d did not exit after SIGTERM, killing it", proc.pid)
+            AsyncCommandEngine._send_signal(proc, wait_future, signal.SIGKILL)
+            return await wait_future
+
+    @staticmethod
+    def _send_signal(proc: subprocess.Popen, wait_future, sig: int):
+        # Popen.terminate and Popen.kill poll the process first, which could reap it before wait4 does
+        if wait_future.done():
+            return
+        try:
+            os.kill(proc.pid, sig)
+        except ProcessLookupError:
+            LOG.debug("Process %d has already exited", proc.pid)
+
+    @staticmethod
+    def _to_exit_code(status: int) -> int:
+        # Same as the return code of subprocess: negative signal number if the process was killed by a signal
+        if os.WIFSIGNALED(status):
+            return -os.WTERMSIG(status)
+        return os.WEXITSTATUS(status)
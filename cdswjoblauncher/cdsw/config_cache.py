@@ -0,0 +1,180 @@
+import hashlib
+import importlib.util
+import logging
+import marshal
+import os
+import pickle
+from dataclasses import dataclass, field
+from functools import lru_cache
+from os.path import expanduser
+from typing import Dict, List, Optional, Any
+
+from pythoncommons.file_utils import FileUtils
+
+from cdswjoblauncher.cdsw.constants import PROJECT_NAME
+from cdswjoblauncher.cdsw.lazy_import import lazy_import
+
+# Only needed to store and look up cache entries
+importlib_metadata = lazy_import("importlib.metadata")
+
+LOG = logging.getLogger(__name__)
+DEFAULT_CONFIG_CACHE_DIR = FileUtils.join_path(expanduser("~"), ".cache", PROJECT_NAME, "job-configs")
+CACHE_FORMAT_VERSION = 2
+# The module that validates the job configs, its modification time is part of the launcher version
+_CONFIG_MODULE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cdsw_config.py")
+
+
+@dataclass
+class CachedJobConfig:
+    file: str
+    mtime_ns: int
+    content_hash: str
+    python_magic: bytes
+    launcher_version: str
+    valid_env_vars: List[str]
+    # Values of the mandatory and optional env vars of the job config at the time of the validation
+    env_snapshot: Dict[str, Optional[str]]
+    # Non-callable fields of the validated job config
+    static_fields: Dict[str, Any]
+    code: bytes
+    format_version: int = CACHE_FORMAT_VERSION
+
+    def load_code(self):
+        return marshal.loads(self.code)
+
+
+@dataclass
+class ConfigSource:
+    file: str
+    mtime_ns: int
+    content: bytes
+    content_hash: str = field(init=False)
+
+    def __post_init__(self):
+        self.content_hash = hashlib.sha256(self.content).hexdigest()
+
+    @staticmethod
+    def read(file: str):
+        with open(file, "rb") as f:
+            content = f.read()
+        return ConfigSource(os.path.abspath(file), os.stat(file).st_mtime_ns, content)
+
+
+class CdswJobConfigCache:
+    """
+    Persistent cache of job config files.
+    Stores the bytecode of the config module and the static (non-callable) fields of the validated job config.
+    Callables of the config (e.g. lambdas of variables) are never cached as they need to be evaluated for every job.
+    For the same reason, the config module is still executed and converted to a job config on a cache hit.
+    A hit saves compiling the source of the config and validating the config, see the read_from_file_cached phase
+    of the config benchmark (cdswjoblauncher.cdsw.testutils.config_benchmark) for the difference.
+    Entries are only valid for the same version of the launcher, as it determines how the configs are validated.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CONFIG_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def lookup(self, source: ConfigSource, valid_env_vars: List[str]) -> Optional[CachedJobConfig]:
+        cache_file = self._get_cache_file(source.file)
+        entry = self._load_entry(cache_file)
+        miss_reason = self._check_entry(entry, source, valid_env_vars)
+        if miss_reason:
+            LOG.info("Job config cache miss for file '%s'. Reason: %s", source.file, miss_reason)
+            return None
+        LOG.info("Job config cache hit for file '%s'. Cache file: %s", source.file, cache_file)
+        return entry
+
+    def store(self, source: ConfigSource, code, valid_env_vars: List[str], static_fields: Dict[str, Any]):
+        env_var_names = static_fields.get("mandatory_env_vars", []) + static_fields.get("optional_env_vars", [])
+        entry = CachedJobConfig(
+            file=source.file,
+            mtime_ns=source.mtime_ns,
+            content_hash=source.content_hash,
+            python_magic=importlib.util.MAGIC_NUMBER,
+            launcher_version=get_launcher_version(),
+            valid_env_vars=list(valid_env_vars),
+            env_snapshot=self._create_env_snapshot(env_var_names),
+            static_fields=static_fields,
+            code=marshal.dumps(code),
+        )
+        cache_file = self._get_cache_file(source.file)
+        FileUtils.ensure_dir_created(self.cache_dir)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(tmp_file, cache_file)
+        except (OSError, pickle.PicklingError):
+            LOG.warning("Failed to store job config cache file: %s", cache_file, exc_info=True)
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return
+        LOG.info("Stored job config of file '%s' to cache file: %s", source.file, cache_file)
+
+    def invalidate(self, file: str = None):
+        """
+        Removes the cache entry of the specified config file. Removes all entries if no file is specified.
+        :param file: The config file
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        if file:
+            cache_files = [self._get_cache_file(os.path.abspath(file))]
+        else:
+            cache_files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith(".pickle")]
+        for cache_file in cache_files:
+            if os.path.exists(cache_file):
+                LOG.info("Invalidating job config cache file: %s", cache_file)
+                os.remove(cache_file)
+
+    def _get_cache_file(self, file: str):
+        path_hash = hashlib.sha256(file.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{path_hash}.pickle")
+
+    @staticmethod
+    def _load_entry(cache_file: str) -> Optional[CachedJobConfig]:
+        if not os.path.exists(cache_file):
+            return None
+        try:
+            with open(cache_file, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            LOG.warning("Failed to load job config cache file: %s", cache_file, exc_info=True)
+            return None
+
+    @staticmethod
+    def _check_entry(entry: Optional[CachedJobConfig], source: ConfigSource, valid_env_vars: List[str]):
+        if not entry:
+            return "no cache entry"
+        if not isinstance(entry, CachedJobConfig) or entry.format_version != CACHE_FORMAT_VERSION:
+            return "cache format changed"
+        if entry.python_magic != importlib.util.MAGIC_NUMBER:
+            return "Python version changed"
+        if entry.launcher_version != get_launcher_version():
+            return "launcher version changed"
+        if entry.file != source.file or entry.mtime_ns != source.mtime_ns:
+            return "modification time changed"
+        if entry.content_hash != source.content_hash:
+            return "content changed"
+        if entry.valid_env_vars != list(valid_env_vars):
+            return "valid env vars changed"
+        if entry.env_snapshot != CdswJobConfigCache._create_env_snapshot(entry.env_snapshot.keys()):
+            return "values of env vars changed"
+        return None
+
+    @staticmethod
+    def _create_env_snapshot(env_var_names):
+        return {name: os.environ.get(name) for name in env_var_names}
+
+
+@lru_cache(maxsize=None)
+def get_launcher_version() -> str:
+    """
+    :return: Version of the installed launcher distribution and the modification time of the config module.
+    The modification time covers source checkouts and editable installs, where the code changes without a new version.
+    """
+    try:
+        version = importlib_metadata.version(PROJECT_NAME)
+    except importlib_metadata.PackageNotFoundError:
+        version = "unknown"
+    return f"{version} {os.stat(_CONFIG_MODULE_FILE).st_mtime_ns}"
@@ -25,6 +25,9 @@ class CdswEnvVar(Enum):
     MAIL_ACC_PASSWORD = "MAIL_ACC_PASSWORD"
     MAIL_ACC_USER = "MAIL_ACC_USER"
     MAIL_RECIPIENTS = "MAIL_RECIPIENTS"
+    MAIL_SMTP_SERVER = "MAIL_SMTP_SERVER"
+    MAIL_SMTP_PORT = "MAIL_SMTP_PORT"
+    MAIL_SMTP_SSL = "MAIL_SMTP_SSL"
     # TODO Consider moving these to UnitTestResultFetcherEnvVar
     JENKINS_USER = "JENKINS_USER"
     JENKINS_PASSWORD = "JENKINS_PASSWORD"
@@ -35,7 +38,12 @@ class CdswEnvVar(Enum):
     PYTHON_MODULE_MODE = "PYTHON_MODULE_MODE"
     ENABLE_GOOGLE_DRIVE_INTEGRATION = "ENABLE_GOOGLE_DRIVE_INTEGRATION"
     INSTALL_REQUIREMENTS = "INSTALL_REQUIREMENTS"
+    FORCE_INSTALL_REQUIREMENTS = "FORCE_INSTALL_REQUIREMENTS"
+    REQUIREMENTS_FINGERPRINT_TTL_SECONDS = "REQUIREMENTS_FINGERPRINT_TTL_SECONDS"
     RESTART_PROCESS_WHEN_REQUIREMENTS_INSTALLED = "RESTART_PROCESS_WHEN_REQUIREMENTS_INSTALLED"
     DEBUG_ENABLED = "DEBUG_ENABLED"
     OVERRIDE_SCRIPT_BASEDIR = "OVERRIDE_SCRIPT_BASEDIR"
     ENABLE_LOGGER_HANDLER_SANITY_CHECK = "ENABLE_LOGGER_HANDLER_SANITY_CHECK"
+    ENABLE_JOB_CONFIG_CACHE = "ENABLE_JOB_CONFIG_CACHE"
+    ENABLE_MODULE_INDEX_CACHE = "ENABLE_MODULE_INDEX_CACHE"
+    MODULE_DISCOVERY_MODE = "MODULE_DISCOVERY_MODE"
@@ -0,0 +1,200 @@
+import dataclasses
+import logging
+import threading
+from collections.abc import Callable as CallableABC
+from typing import Any, Callable, Dict, List, Type, TypeVar, Union, get_type_hints, get_origin, get_args
+
+from dacite import WrongTypeError, MissingValueError, UnionMatchError
+from dacite.exceptions import DaciteFieldError
+
+LOG = logging.getLogger(__name__)
+T = TypeVar("T")
+NONE_TYPE = type(None)
+
+
+def with_slots(cls):
+    """
+    Recreates a dataclass with __slots__ for its fields, so its instances have no __dict__.
+    Needed as dataclass(slots=True) is only available from Python 3.10.
+    """
+    if not dataclasses.is_dataclass(cls):
+        raise ValueError("Expected a dataclass: {}".format(cls))
+    field_names = tuple(f.name for f in dataclasses.fields(cls))
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = field_names
+    for name in field_names:
+        # Default values are kept by the generated __init__, the class attributes would conflict with the slots
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted_cls.__qualname__ = cls.__qualname__
+    return slotted_cls
+
+
+class DataclassConverter:
+    """
+    Creates dataclass instances from dicts, like dacite.from_dict.
+    The converter of a dataclass is built once from its fields and type hints instead of introspecting the types
+    on every call. Supported types: nested dataclasses, Union / Optional, List, Dict, Callable, Any and classes.
+    Keys of the dict that are not fields are ignored. Raises the same errors as dacite.
+    """
+
+    _CONVERTERS: Dict[type, "DataclassConverter"] = {}
+    _LOCK = threading.Lock()
+
+    def __init__(self, data_class: type):
+        self.data_class = data_class
+        type_hints = get_type_hints(data_class)
+        # Tuples of: (field name, converter, has default value, is optional)
+        self._fields = [
+            (f.name, _create_converter(hint), DataclassConverter._has_default(f), _is_optional(hint))
+            for f, hint in ((f, type_hints[f.name]) for f in dataclasses.fields(data_class) if f.init)
+        ]
+
+    @classmethod
+    def get(cls, data_class: type) -> "DataclassConverter":
+        converter = cls._CONVERTERS.get(data_class)
+        if converter is None:
+            with cls._LOCK:
+                converter = cls._CONVERTERS.get(data_class)
+                if converter is None:
+                    LOG.debug("Creating converter for dataclass: %s", data_class.__name__)
+                    converter = DataclassConverter(data_class)
+                    cls._CONVERTERS[data_class] = converter
+        return converter
+
+    @staticmethod
+    def _has_default(f: dataclasses.Field):
+        return f.default is not dataclasses.MISSING or f.default_factory is not dataclasses.MISSING
+
+    def convert(self, data: Dict[str, Any]):
+        kwargs = {}
+        for name, converter, has_default, optional in self._fields:
+            if name in data:
+                try:
+                    kwargs[name] = converter(data[name])
+                except DaciteFieldError as e:
+                    e.update_path(name)
+                    raise
+            elif optional and not has_default:
+                # Like dacite, missing optional fields are None
+                kwargs[name] = None
+            elif not has_default:
+                raise MissingValueError(name)
+        return self.data_class(**kwargs)
+
+
+def from_dict(data_class: Type[T], data: Dict[str, Any]) -> T:
+    return DataclassConverter.get(data_class).convert(data)
+
+
+def _create_converter(type_) -> Callable[[Any], Any]:
+    if type_ is Any:
+        return _identity
+    origin = get_origin(type_)
+    if origin is Union:
+        return _create_union_converter(type_)
+    if origin in (list, List):
+        return _create_list_converter(type_)
+    if origin in (dict, Dict):
+        return _create_dict_converter(type_)
+    if type_ is Callable or origin is CallableABC:
+        return _create_callable_converter(type_)
+    if dataclasses.is_dataclass(type_):
+        return _create_dataclass_converter(type_)
+    if isinstance(type_, type):
+        return _create_instance_converter(type_)
+    LOG.debug("Values of type '%s' are not validated", type_)
+    return _identity
+
+
+def _is_optional(type_):
+    return get_origin(type_) is Union and NONE_TYPE in get_args(type_)
+
+
+def _identity(value):
+    return value
+
+
+def _create_instance_converter(type_):
+    def convert(value):
+        if not isinstance(value, type_):
+            raise WrongTypeError(type_, value)
+        return value
+
+    return convert
+
+
+def _create_callable_converter(type_):
+    def convert(value):
+        if not callable(value):
+            raise WrongTypeError(type_, value)
+        return value
+
+    return convert
+
+
+def _create_dataclass_converter(type_):
+    def convert(value):
+        if isinstance(value, type_):
+            return value
+        if not isinstance(value, dict):
+            raise WrongTypeError(type_, value)
+        # Looked up on conversion, so dataclasses referring to each other are supported
+        return DataclassConverter.get(type_).convert(value)
+
+    return convert
+
+
+def _create_list_converter(type_):
+    args = get_args(type_)
+    item_converter = _create_converter(args[0]) if args else _identity
+
+    def convert(value):
+        if not isinstance(value, list):
+            raise WrongTypeError(type_, value)
+        return [item_converter(item) for item in value]
+
+    return convert
+
+
+def _create_dict_converter(type_):
+    args = get_args(type_)
+    value_converter = _create_converter(args[1]) if args else _identity
+
+    def convert(value):
+        if not isinstance(value, dict):
+            raise WrongTypeError(type_, value)
+        return {k: value_converter(v) for k, v in value.items()}
+
+    return convert
+
+
+def _create_union_converter(type_):
+    args = get_args(type_)
+    optional = NONE_TYPE in args
+    converters = [_create_converter(arg) for arg in args if arg is not NONE_TYPE]
+
+    if len(converters) == 1:
+        # Optional: the error of the only type is more helpful than a union match error
+        converter = converters[0]
+
+        def convert_optional(value):
+            if value is None and optional:
+                return None
+            return converter(value)
+
+        return convert_optional
+
+    def convert(value):
+        if value is None and optional:
+            return None
+        for converter in converters:
+            try:
+                return converter(value)
+            except DaciteFieldError:
+                continue
+        raise UnionMatchError(type_, value)
+
+    return convert
@@ -0,0 +1,80 @@
+import logging
+import random
+import time
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
+from googleapiwrapper.google_auth import GoogleApiAuthorizer
+from googleapiwrapper.google_drive import (
+    DriveApiWrapper,
+    DriveApiWrapperSessionSettings,
+    DriveApiFile,
+    DriveApiMimeTypes,
+    FileField,
+)
+
+# Imported from here as well for backward compatibility
+from cdswjoblauncher.cdsw.drive_upload_settings import CHUNK_SIZE_UNIT, DriveUploadSettings, UploadMetrics  # noqa: F401
+
+LOG = logging.getLogger(__name__)
+RETRIABLE_HTTP_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE_SECONDS = 1
+BACKOFF_MAX_SECONDS = 64
+
+
+class ResumableDriveApiWrapper(DriveApiWrapper):
+    """
+    DriveApiWrapper that uploads new files in chunks with a resumable upload session.
+    A failed chunk is retried with exponential backoff and the upload continues from the last uploaded chunk.
+    """
+
+    def __init__(
+        self,
+        authorizer: GoogleApiAuthorizer,
+        upload_settings: DriveUploadSettings,
+        session_settings: DriveApiWrapperSessionSettings = None,
+    ):
+        super().__init__(authorizer, session_settings=session_settings)
+        self.upload_settings = upload_settings
+
+    def _upload_and_create_new_file(self, filename, file_metadata, path_to_file, fields: str) -> DriveApiFile:
+        media_file = MediaFileUpload(
+            path_to_file,
+            mimetype=DriveApiMimeTypes.get_mime_type_by_filename(filename).value,
+            chunksize=self.upload_settings.chunk_size,
+            resumable=True,
+        )
+        request = self.files_service.create(body=file_metadata, media_body=media_file, fields=fields)
+        response = None
+        while response is None:
+            status, response = self._next_chunk_with_retries(request, filename)
+            if status:
+                LOG.info("Uploaded %d%% of file: %s", int(status.progress() * 100), filename)
+        LOG.info("File ID: %s", response.get(FileField.ID))
+        return self._convert_to_drive_file_object(response)
+
+    def _next_chunk_with_retries(self, request, filename):
+        attempts_count = self.upload_settings.max_retries + 1
+        for attempt in range(1, attempts_count + 1):
+            try:
+                return request.next_chunk()
+            except (HttpError, OSError) as e:
+                if attempt == attempts_count or not self._is_retriable(e):
+                    raise
+                wait = min(BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), BACKOFF_MAX_SECONDS) + random.uniform(0, 1)
+                LOG.warning(
+                    "[Attempt: %d / %d] Failed to upload chunk of file '%s', retrying in %.1f seconds. Error: %s",
+                    attempt,
+                    attempts_count,
+                    filename,
+                    wait,
+                    e,
+                )
+                time.sleep(wait)
+
+    @staticmethod
+    def _is_retriable(e: Exception):
+        if isinstance(e, HttpError):
+            return e.resp.status in RETRIABLE_HTTP_STATUSES
+        # Connection errors, timeouts
+        return True
@@ -0,0 +1,52 @@
+import logging
+from dataclasses import dataclass
+
+LOG = logging.getLogger(__name__)
+# Chunk size of resumable uploads should be a multiple of 256 KiB
+# See: https://developers.google.com/drive/api/guides/manage-uploads#resumable
+CHUNK_SIZE_UNIT = 256 * 1024
+
+
+@dataclass(frozen=True)
+class DriveUploadSettings:
+    # Size of chunks of resumable uploads in bytes, files are uploaded with a single request if not specified
+    chunk_size: int = None
+    # Number of retries of a chunk if it failed with a transient error
+    max_retries: int = 5
+    # Uploads that can proceed concurrently, shared by all runs of the job
+    max_parallel_uploads: int = 1
+
+    def __post_init__(self):
+        if self.chunk_size is not None and (self.chunk_size <= 0 or self.chunk_size % CHUNK_SIZE_UNIT != 0):
+            raise ValueError(
+                "Chunk size of Drive uploads should be a positive multiple of {} bytes! Actual: {}".format(
+                    CHUNK_SIZE_UNIT, self.chunk_size
+                )
+            )
+        if self.max_retries < 0:
+            raise ValueError("Max retries of Drive uploads should not be negative! Actual: {}".format(self.max_retries))
+        if self.max_parallel_uploads < 1:
+            raise ValueError(
+                "Max parallel uploads should be at least 1! Actual: {}".format(self.max_parallel_uploads)
+            )
+
+    @property
+    def resumable(self):
+        return self.chunk_size is not None
+
+
+@dataclass
+class UploadMetrics:
+    drive_filename: str
+    local_file: str
+    size: int
+    duration: float
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: Throughput in bytes / second
+        """
+        if not self.size or not self.duration:
+            return 0.0
+        return self.size / self.duration
@@ -0,0 +1,51 @@
+import importlib
+import logging
+import sys
+import threading
+import types
+
+LOG = logging.getLogger(__name__)
+
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder of a module that imports the module on the first attribute access.
+    Heavy dependencies (e.g. the Google API client) are only imported if the feature using them is used.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    LOG.debug("Importing lazy module: %s", self.__name__)
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name):
+        # Only called if the attribute is not found in the placeholder itself
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "imported" if self.__dict__["_lazy_module"] is not None else "not imported"
+        return "<lazy module '{}' ({})>".format(self.__name__, state)
+
+
+def lazy_import(module_name: str) -> types.ModuleType:
+    """
+    :return: The module if it is already imported, otherwise a placeholder that imports it on first use
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    return LazyModule(module_name)
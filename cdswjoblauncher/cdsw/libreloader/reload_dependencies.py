@@ -1,11 +1,16 @@
 #!/usr/bin/python3
+import glob
+import hashlib
+import json
 import logging
 import os
 import shutil
 import site
 import subprocess
 import sys
-from typing import List
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict
 
 from cdswjoblauncher.cdsw.cdsw_common import CommonDirs
 
@@ -17,14 +22,44 @@ MODULE_MODE_USER = "user"
 ACCEPTED_PYTHON_MODULE_MODES = [MODULE_MODE_USER, MODULE_MODE_GLOBAL]  # Same as values of PythonModuleMode
 PYTHON_MODULE_MODE_ENV_VAR = "PYTHON_MODULE_MODE"  # Same as CdswEnvVar.PYTHON_MODULE_MODE
 INSTALL_REQUIREMENTS_ENV_VAR = "INSTALL_REQUIREMENTS"  # Same as CdswEnvVar.INSTALL_REQUIREMENTS
+FORCE_INSTALL_REQUIREMENTS_ENV_VAR = "FORCE_INSTALL_REQUIREMENTS"  # Same as CdswEnvVar.FORCE_INSTALL_REQUIREMENTS
+# Same as CdswEnvVar.REQUIREMENTS_FINGERPRINT_TTL_SECONDS
+REQUIREMENTS_FINGERPRINT_TTL_ENV_VAR = "REQUIREMENTS_FINGERPRINT_TTL_SECONDS"
 TEST_EXECUTION_MODE_ENV_VAR = "TEST_EXEC_MODE"  # Same as CdswEnvVar.TEST_EXECUTION_MODE
 DEFAULT_TEST_EXECUTION_MODE = "cloudera"  # Same as TestExecMode.CLOUDERA.value
+REQUIREMENTS_FINGERPRINT_FILE_NAME = ".requirements-fingerprint"
+# The install script installs the latest release of the module from PyPI, which is not part of the fingerprint.
+# Requirements are installed again after the TTL so that new releases are picked up
+DEFAULT_REQUIREMENTS_FINGERPRINT_TTL_SECONDS = 6 * 60 * 60
+REQUIREMENTS_FILE_PATTERNS = ["requirements*.txt", "pyproject.toml", "poetry.lock", "setup.py", "setup.cfg"]
+# Names of the job configs copied by the last sync, only these are removed from the jobs dir if they become stale
+JOB_CONFIGS_MANIFEST_FILE_NAME = ".job-configs-manifest.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class JobConfigSyncResult:
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.updated or self.removed)
+
+    def __str__(self):
+        return "added: {}, updated: {}, removed: {}, unchanged: {} file(s)".format(
+            self.added, self.updated, self.removed, len(self.unchanged)
+        )
 
 
 class Reloader:
+    MODULE_NAME = None
     MODULE_ROOT = None
     CONFIGS_ROOT_DIR = None
     INSTALL_REQUIREMENTS_SCRIPT = None
+    REQUIREMENTS_FINGERPRINT_FILE = None
 
     @classmethod
     def start(cls, module_name):
@@ -36,12 +71,14 @@ class Reloader:
     @classmethod
     def _setup_paths(cls, module_name):
         module_root = cls.get_python_module_root()
+        cls.MODULE_NAME = module_name
         cls.MODULE_ROOT = os.path.join(module_root, module_name)
         cls.CONFIGS_ROOT_DIR = os.path.join(cls.MODULE_ROOT, "cdsw", "job_configs")
         # TODO cdsw-separation should be a param
         cls.INSTALL_REQUIREMENTS_SCRIPT = os.path.join(
             cls.MODULE_ROOT, "cdsw", "scripts", "install-requirements.sh"
         )
+        cls.REQUIREMENTS_FINGERPRINT_FILE = os.path.join(cls.MODULE_ROOT, REQUIREMENTS_FINGERPRINT_FILE_NAME)
         LOG.info("Python module root is: %s", cls.MODULE_ROOT)
         cls._check_mandatory_scripts()
 
@@ -65,10 +102,112 @@ class Reloader:
                 install_requirements = True
             else:
                 install_requirements = False
-        if install_requirements:
-            cls._run_install_requirements_script()
-        else:
+        if not install_requirements:
             LOG.warning("Skipping installation of Python requirements as per configuration!")
+            return
+
+        force_install = os.environ.get(FORCE_INSTALL_REQUIREMENTS_ENV_VAR) == "True"
+        exec_mode = cls._get_execution_mode()
+        if not force_install and cls._read_stored_fingerprint() == cls._compute_requirements_fingerprint(exec_mode):
+            LOG.info(
+                "Skipping installation of Python requirements as they have not changed since the last installation, "
+                "which is not older than %d seconds. Set env var '%s' to 'True' to force the installation.",
+                cls._get_fingerprint_ttl(),
+                FORCE_INSTALL_REQUIREMENTS_ENV_VAR,
+            )
+            cls._copy_job_configs_to_cdsw_jobs_root()
+            return
+        if force_install:
+            LOG.info("Forced installation of Python requirements as per configuration")
+        cls._run_install_requirements_script()
+
+    @classmethod
+    def _get_execution_mode(cls):
+        exec_mode = DEFAULT_TEST_EXECUTION_MODE
+        if TEST_EXECUTION_MODE_ENV_VAR in os.environ:
+            exec_mode = os.environ[TEST_EXECUTION_MODE_ENV_VAR]
+        return exec_mode
+
+    @classmethod
+    def _compute_requirements_fingerprint(cls, exec_mode: str) -> str:
+        """
+        Fingerprint of everything that determines the result of the installation of the requirements:
+        The install script and the requirements files of the module, the execution mode,
+        the installed version of the module and the Python interpreter.
+        The latest release of the module on PyPI is not known locally, the fingerprint expires after a TTL instead.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"interpreter={sys.executable} {sys.version}\n".encode("utf-8"))
+        digest.update(f"exec_mode={exec_mode}\n".encode("utf-8"))
+        digest.update(f"installed_version={cls._get_installed_distribution()}\n".encode("utf-8"))
+        for file in cls._get_requirements_input_files():
+            digest.update(f"file={file}\n".encode("utf-8"))
+            with open(file, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    @classmethod
+    def _get_requirements_input_files(cls) -> List[str]:
+        files = [cls.INSTALL_REQUIREMENTS_SCRIPT]
+        for directory in [os.path.dirname(cls.INSTALL_REQUIREMENTS_SCRIPT), cls.MODULE_ROOT]:
+            for pattern in REQUIREMENTS_FILE_PATTERNS:
+                files.extend(sorted(glob.glob(os.path.join(directory, pattern))))
+        return files
+
+    @classmethod
+    def _get_installed_distribution(cls) -> Optional[str]:
+        """
+        :return: Name of the dist-info directory of the installed distribution of the module, e.g. mymodule-1.0.dist-info
+        """
+        site_dir = os.path.dirname(cls.MODULE_ROOT)
+        for dist_info in sorted(glob.glob(os.path.join(site_dir, "*.dist-info"))):
+            top_level_file = os.path.join(dist_info, "top_level.txt")
+            if os.path.isfile(top_level_file):
+                with open(top_level_file) as f:
+                    if cls.MODULE_NAME in f.read().split():
+                        return os.path.basename(dist_info)
+            record_file = os.path.join(dist_info, "RECORD")
+            if os.path.isfile(record_file):
+                with open(record_file) as f:
+                    if any(line.startswith(f"{cls.MODULE_NAME}/") for line in f):
+                        return os.path.basename(dist_info)
+        return None
+
+    @classmethod
+    def _get_fingerprint_ttl(cls) -> int:
+        if REQUIREMENTS_FINGERPRINT_TTL_ENV_VAR not in os.environ:
+            return DEFAULT_REQUIREMENTS_FINGERPRINT_TTL_SECONDS
+        try:
+            return int(os.environ[REQUIREMENTS_FINGERPRINT_TTL_ENV_VAR])
+        except ValueError:
+            raise ValueError(
+                "Invalid value of env var '{}': {}".format(
+                    REQUIREMENTS_FINGERPRINT_TTL_ENV_VAR, os.environ[REQUIREMENTS_FINGERPRINT_TTL_ENV_VAR]
+                )
+            )
+
+    @classmethod
+    def _read_stored_fingerprint(cls) -> Optional[str]:
+        """
+        :return: The fingerprint of the last installation, or None if it is missing or older than the TTL
+        """
+        if not os.path.isfile(cls.REQUIREMENTS_FINGERPRINT_FILE):
+            return None
+        age = time.time() - os.path.getmtime(cls.REQUIREMENTS_FINGERPRINT_FILE)
+        ttl = cls._get_fingerprint_ttl()
+        if age >= ttl:
+            LOG.info("Fingerprint of Python requirements expired. Age: %d seconds, TTL: %d seconds", age, ttl)
+            return None
+        with open(cls.REQUIREMENTS_FINGERPRINT_FILE) as f:
+            return f.read().strip()
+
+    @classmethod
+    def _store_fingerprint(cls, fingerprint: str):
+        tmp_file = f"{cls.REQUIREMENTS_FINGERPRINT_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(fingerprint)
+        os.replace(tmp_file, cls.REQUIREMENTS_FINGERPRINT_FILE)
+        LOG.info("Stored fingerprint of Python requirements to file: %s", cls.REQUIREMENTS_FINGERPRINT_FILE)
 
     @classmethod
     def get_python_module_root(cls):
@@ -106,24 +245,129 @@ class Reloader:
         :param exit_on_nonzero_exitcode:
         :return:
         """
-        exec_mode = DEFAULT_TEST_EXECUTION_MODE
-        if TEST_EXECUTION_MODE_ENV_VAR in os.environ:
-            exec_mode = os.environ[TEST_EXECUTION_MODE_ENV_VAR]
-        cls._run_script(
+        exec_mode = cls._get_execution_mode()
+        returncode = cls._run_script(
             cls.INSTALL_REQUIREMENTS_SCRIPT, args=[exec_mode], exit_on_nonzero_exitcode=exit_on_nonzero_exitcode
         )
+        if returncode == 0:
+            # The installed version of the module is part of the fingerprint, so it is computed after the installation
+            cls._store_fingerprint(cls._compute_requirements_fingerprint(exec_mode))
+        else:
+            LOG.warning(
+                "Script %s exited with code %d, requirements will be installed again on the next run",
+                cls.INSTALL_REQUIREMENTS_SCRIPT,
+                returncode,
+            )
         cls._copy_job_configs_to_cdsw_jobs_root()
 
     @classmethod
-    def _copy_job_configs_to_cdsw_jobs_root(cls):
+    def _copy_job_configs_to_cdsw_jobs_root(cls) -> JobConfigSyncResult:
         # IMPORTANT: CDSW is able to launch linked scripts, but cannot modify and save the job's form because it thinks
         # the linked script is not there.
-        LOG.info("Copying jobs to place...")
-        for subdir, dirs, files in os.walk(cls.CONFIGS_ROOT_DIR):
-            for file in files:
-                filepath = subdir + os.sep + file
-                if filepath.endswith(".py"):
-                    cls.copy_file(filepath, os.path.join(CommonDirs.JOBS_BASEDIR, file))
+        LOG.info("Syncing jobs to place...")
+        result = cls.sync_job_configs(cls.CONFIGS_ROOT_DIR, CommonDirs.JOBS_BASEDIR)
+        LOG.info("Synced job configs from %s to %s. %s", cls.CONFIGS_ROOT_DIR, CommonDirs.JOBS_BASEDIR, result)
+        return result
+
+    @classmethod
+    def sync_job_configs(cls, src_dir: str, dest_dir: str) -> JobConfigSyncResult:
+        """
+        Copies the job configs (.py files) of the source dir and its subdirs to the flat destination dir.
+        Files are only copied if their size, modification time or content differs, and are replaced atomically.
+        Job configs copied by a previous sync that are no longer in the source dir are removed,
+        other files of the destination dir are kept.
+        """
+        result = JobConfigSyncResult()
+        sources = cls._list_job_configs(src_dir)
+        for name, (src, src_stat) in sorted(sources.items()):
+            dest = os.path.join(dest_dir, name)
+            try:
+                dest_stat = os.stat(dest)
+            except FileNotFoundError:
+                cls._copy_file_atomically(src, dest)
+                result.added.append(name)
+                continue
+            if dest_stat.st_size == src_stat.st_size and dest_stat.st_mtime_ns == src_stat.st_mtime_ns:
+                result.unchanged.append(name)
+            elif dest_stat.st_size == src_stat.st_size and cls._hash_file(src) == cls._hash_file(dest):
+                # Only the modification time differs, sync it so the next run does not need to hash the file
+                shutil.copystat(src, dest)
+                result.unchanged.append(name)
+            else:
+                cls._copy_file_atomically(src, dest)
+                result.updated.append(name)
+
+        manifest_file = os.path.join(dest_dir, JOB_CONFIGS_MANIFEST_FILE_NAME)
+        for name in sorted(set(cls._read_job_configs_manifest(manifest_file)) - sources.keys()):
+            stale_file = os.path.join(dest_dir, name)
+            if os.path.exists(stale_file):
+                LOG.info("Removing stale job config: %s", stale_file)
+                os.remove(stale_file)
+                result.removed.append(name)
+        if result.has_changes or not os.path.exists(manifest_file):
+            cls._write_job_configs_manifest(manifest_file, sorted(sources.keys()))
+        return result
+
+    @classmethod
+    def _list_job_configs(cls, src_dir: str) -> Dict[str, tuple]:
+        """
+        :return: File names mapped to the (path, stat result) tuples of the job configs
+        """
+        result = {}
+        dirs = [src_dir]
+        while dirs:
+            with os.scandir(dirs.pop()) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        dirs.append(entry.path)
+                    elif entry.name.endswith(".py"):
+                        if entry.name in result:
+                            LOG.warning(
+                                "Job config with name '%s' found multiple times: %s, %s",
+                                entry.name,
+                                result[entry.name][0],
+                                entry.path,
+                            )
+                        result[entry.name] = (entry.path, entry.stat())
+        return result
+
+    @classmethod
+    def _copy_file_atomically(cls, src, dest):
+        LOG.info(f"Copying file: {src} -> {dest}")
+        tmp_file = f"{dest}.{os.getpid()}.tmp"
+        try:
+            # Keeps the modification time so unchanged files can be detected without reading them
+            shutil.copy2(src, tmp_file)
+            os.replace(tmp_file, dest)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    @staticmethod
+    def _hash_file(file):
+        digest = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _read_job_configs_manifest(manifest_file) -> List[str]:
+        if not os.path.isfile(manifest_file):
+            return []
+        try:
+            with open(manifest_file) as f:
+                return json.load(f)
+        except ValueError:
+            LOG.warning("Invalid job configs manifest file: %s", manifest_file, exc_info=True)
+            return []
+
+    @staticmethod
+    def _write_job_configs_manifest(manifest_file, names: List[str]):
+        tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(names, f, indent=2)
+        os.replace(tmp_file, manifest_file)
 
     @classmethod
     def remove_dir(cls, dir, force=False):
@@ -151,3 +395,4 @@ class Reloader:
         _ = proc.communicate()
         if proc.returncode != 0 and exit_on_nonzero_exitcode:
             raise ValueError(f"Failed to execute {script}")
+        return proc.returncode
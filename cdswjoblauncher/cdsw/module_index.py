@@ -0,0 +1,371 @@
+import ast
+import hashlib
+import importlib
+import importlib.util
+import logging
+import os
+import pickle
+import pkgutil
+import threading
+from dataclasses import dataclass, field
+from enum import Enum
+from inspect import isclass
+from os.path import expanduser
+from typing import Dict, List, Type, Tuple, Optional
+
+from pythoncommons.file_utils import FileUtils
+from pythoncommons.os_utils import OsUtils
+
+from cdswjoblauncher.cdsw.constants import PROJECT_NAME, CdswEnvVar
+
+LOG = logging.getLogger(__name__)
+DEFAULT_MODULE_INDEX_CACHE_DIR = FileUtils.join_path(expanduser("~"), ".cache", PROJECT_NAME, "module-index")
+MODULE_INDEX_FORMAT_VERSION = 2
+INDEXED_SOURCE_FILE_SUFFIXES = (".py", ".pyc", ".so", ".pyd")
+
+
+class DiscoveryMode(Enum):
+    # Modules are imported and their attributes are inspected
+    IMPORT = "import"
+    # Source files are parsed, only the modules that define a matching class are imported.
+    # Opt-in, as classes that are re-exported, created dynamically or shipped without sources are not found.
+    STATIC = "static"
+
+
+def is_module_index_cache_enabled():
+    return OsUtils.is_env_var_true(CdswEnvVar.ENABLE_MODULE_INDEX_CACHE.value, default_val=False)
+
+
+def get_module_discovery_mode() -> DiscoveryMode:
+    value = OsUtils.get_env_value(CdswEnvVar.MODULE_DISCOVERY_MODE.value, DiscoveryMode.IMPORT.value)
+    try:
+        return DiscoveryMode(value.lower())
+    except ValueError:
+        raise ValueError(
+            "Invalid module discovery mode: {}. Valid values: {}".format(value, [m.value for m in DiscoveryMode])
+        )
+
+
+def get_full_class_name(cls: Type):
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+@dataclass
+class IndexedClass:
+    # Module where the class is defined, can be different from the module where the class was found
+    module: str
+    qualname: str
+    # Import mode: Full names of the class and all of its base classes
+    # Static mode: Names of the direct base classes as written in the source, e.g. 'contract.CdswApp'
+    bases: List[str]
+    # Import mode: Non-dunder attributes of the class, including inherited ones
+    # Static mode: Methods and class attributes defined in the class body
+    attributes: List[str]
+
+    @staticmethod
+    def of(cls: Type):
+        return IndexedClass(
+            cls.__module__,
+            cls.__qualname__,
+            [get_full_class_name(c) for c in cls.__mro__],
+            [a for a in dir(cls) if not a.startswith("__")],
+        )
+
+
+@dataclass
+class ModuleIndex:
+    """
+    Classes of all modules of a package, found by a single traversal of the package.
+    Modules are listed in the order of the traversal: The package itself comes first, then its submodules recursively.
+    """
+
+    root_module: str
+    fingerprint: str
+    mode: DiscoveryMode = DiscoveryMode.IMPORT
+    # Module path -> Name of the module attribute -> Class
+    modules: Dict[str, Dict[str, IndexedClass]] = field(default_factory=dict)
+    format_version: int = MODULE_INDEX_FORMAT_VERSION
+
+    def find_class_attribute(self, class_name: str, attribute: str) -> List[str]:
+        """
+        :return: Paths of the modules having a class with the specified name and attribute, e.g. a method.
+        In static mode, these are candidates: A class that does not define the attribute but has base classes
+        is also returned as the attribute can be inherited. Candidates should be checked after importing the module.
+        """
+        result = []
+        for module_path, classes in self.modules.items():
+            indexed_class = classes.get(class_name)
+            if not indexed_class:
+                continue
+            if attribute in indexed_class.attributes:
+                result.append(module_path)
+            elif self.mode == DiscoveryMode.STATIC and indexed_class.bases:
+                result.append(module_path)
+        return result
+
+    def find_subclasses(self, cls: Type) -> Dict[str, List[Tuple[str, IndexedClass]]]:
+        """
+        :return: Module paths mapped to the (attribute name, class) tuples of the subclasses of the specified class.
+        In import mode, the class itself is also returned if a module refers to it.
+        In static mode, these are candidates: Classes that have a base class with the name of the specified class
+        or of another candidate. Candidates should be checked after importing the module.
+        """
+        if self.mode == DiscoveryMode.STATIC:
+            class_names = self._find_subclass_names_by_source(cls)
+        else:
+            full_name = get_full_class_name(cls)
+
+        result = {}
+        for module_path, classes in self.modules.items():
+            if self.mode == DiscoveryMode.STATIC:
+                found = [(name, c) for name, c in classes.items() if c.qualname in class_names]
+            else:
+                found = [(name, c) for name, c in classes.items() if full_name in c.bases]
+            if found:
+                result[module_path] = found
+        return result
+
+    def _find_subclass_names_by_source(self, cls: Type):
+        base_names = {cls.__name__}
+        subclass_names = set()
+        changed = True
+        # Subclasses of subclasses are found by repeating until no new subclass is found
+        while changed:
+            changed = False
+            for classes in self.modules.values():
+                for c in classes.values():
+                    if c.qualname in subclass_names:
+                        continue
+                    if any(base.split(".")[-1] in base_names for base in c.bases):
+                        subclass_names.add(c.qualname)
+                        base_names.add(c.qualname)
+                        changed = True
+        return subclass_names
+
+
+class ModuleIndexer:
+    @staticmethod
+    def build(root_module: str, fingerprint: str, mode: DiscoveryMode = DiscoveryMode.IMPORT) -> ModuleIndex:
+        LOG.debug("Building module index of module: %s, discovery mode: %s", root_module, mode.value)
+        index = ModuleIndex(root_module, fingerprint, mode)
+        if mode == DiscoveryMode.STATIC:
+            StaticModuleScanner.scan(index, root_module)
+        else:
+            ModuleIndexer._traverse_modules(index, root_module, importlib.import_module(root_module))
+        LOG.debug("Indexed %d modules of module: %s", len(index.modules), root_module)
+        return index
+
+    @staticmethod
+    def _traverse_modules(index: ModuleIndex, module_path: str, curr_module):
+        LOG.debug("Processing module: %s", curr_module.__name__)
+        classes = {}
+        for attribute_name in dir(curr_module):
+            attribute = getattr(curr_module, attribute_name)
+            if isclass(attribute):
+                classes[attribute_name] = IndexedClass.of(attribute)
+        index.modules[module_path] = classes
+
+        # https://docs.python.org/3/reference/import.html#:~:text=By%20definition%2C%20if%20a%20module,search%20for%20modules%20during%20import.
+        is_package = hasattr(curr_module, "__path__")
+        if is_package:
+            for mod_info in pkgutil.iter_modules(curr_module.__path__):
+                new_module_path = f"{module_path}.{mod_info.name}"
+                new_module = importlib.import_module(new_module_path)
+                ModuleIndexer._traverse_modules(index, new_module_path, new_module)
+
+    @staticmethod
+    def compute_fingerprint(root_module: str) -> str:
+        """
+        Fingerprint of the source files of a module: Changes if any file of the package is added, removed or modified.
+        """
+        spec = importlib.util.find_spec(root_module)
+        if not spec:
+            raise ModuleNotFoundError(f"No module named '{root_module}'", name=root_module)
+        files = []
+        if spec.submodule_search_locations:
+            for location in spec.submodule_search_locations:
+                files.extend(ModuleIndexer._list_source_files(location))
+        elif spec.origin and os.path.isfile(spec.origin):
+            files.append(spec.origin)
+
+        digest = hashlib.sha256()
+        digest.update(importlib.util.MAGIC_NUMBER)
+        digest.update(root_module.encode("utf-8"))
+        for file in sorted(files):
+            stat = os.stat(file)
+            digest.update(f"{file}\0{stat.st_mtime_ns}\0{stat.st_size}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _list_source_files(location: str):
+        for dirpath, dirnames, filenames in os.walk(location):
+            dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+            for filename in filenames:
+                if filename.endswith(INDEXED_SOURCE_FILE_SUFFIXES):
+                    yield os.path.join(dirpath, filename)
+
+
+class StaticModuleScanner:
+    """
+    Indexes the classes of a package by parsing the source files of its modules, without importing them.
+    Modules are visited in the same order as the modules are traversed in import mode.
+    Only the classes defined at the top level of a module are indexed, classes imported from other modules are not.
+    """
+
+    @staticmethod
+    def scan(index: ModuleIndex, root_module: str):
+        spec = importlib.util.find_spec(root_module)
+        if not spec:
+            raise ModuleNotFoundError(f"No module named '{root_module}'", name=root_module)
+        StaticModuleScanner._scan_file(index, root_module, spec.origin)
+        if spec.submodule_search_locations:
+            StaticModuleScanner._scan_package(index, root_module, list(spec.submodule_search_locations))
+
+    @staticmethod
+    def _scan_package(index: ModuleIndex, module_path: str, locations: List[str]):
+        for mod_info in pkgutil.iter_modules(locations):
+            new_module_path = f"{module_path}.{mod_info.name}"
+            location = mod_info.module_finder.path
+            if mod_info.ispkg:
+                package_dir = os.path.join(location, mod_info.name)
+                StaticModuleScanner._scan_file(index, new_module_path, os.path.join(package_dir, "__init__.py"))
+                StaticModuleScanner._scan_package(index, new_module_path, [package_dir])
+            else:
+                StaticModuleScanner._scan_file(index, new_module_path, os.path.join(location, f"{mod_info.name}.py"))
+
+    @staticmethod
+    def _scan_file(index: ModuleIndex, module_path: str, file: Optional[str]):
+        LOG.debug("Processing module: %s", module_path)
+        index.modules[module_path] = {}
+        if not file or not os.path.isfile(file):
+            LOG.debug("No source file found for module '%s', its classes are not indexed", module_path)
+            return
+        with open(file, "rb") as f:
+            source = f.read()
+        try:
+            tree = ast.parse(source, filename=file)
+        except SyntaxError:
+            LOG.warning("Failed to parse source file of module '%s': %s", module_path, file, exc_info=True)
+            return
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                index.modules[module_path][node.name] = IndexedClass(
+                    module_path,
+                    node.name,
+                    [name for name in map(StaticModuleScanner._get_dotted_name, node.bases) if name],
+                    StaticModuleScanner._get_defined_attributes(node),
+                )
+
+    @staticmethod
+    def _get_dotted_name(node: ast.expr) -> Optional[str]:
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            value = StaticModuleScanner._get_dotted_name(node.value)
+            return f"{value}.{node.attr}" if value else None
+        # e.g. Generic[T]
+        if isinstance(node, ast.Subscript):
+            return StaticModuleScanner._get_dotted_name(node.value)
+        return None
+
+    @staticmethod
+    def _get_defined_attributes(class_node: ast.ClassDef) -> List[str]:
+        attributes = []
+        for node in class_node.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                attributes.append(node.name)
+            elif isinstance(node, ast.Assign):
+                attributes.extend(t.id for t in node.targets if isinstance(t, ast.Name))
+            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                attributes.append(node.target.id)
+        return [a for a in attributes if not a.startswith("__")]
+
+
+class ModuleIndexCache:
+    """
+    Module indexes are built once per process, module and discovery mode.
+    If persistent, indexes are also stored on disk and reused by later processes until a source file of the module changes.
+    """
+
+    _INDEXES: Dict[Tuple[str, DiscoveryMode], ModuleIndex] = {}
+    _LOCK = threading.Lock()
+
+    def __init__(
+        self,
+        persistent: bool = False,
+        cache_dir: str = DEFAULT_MODULE_INDEX_CACHE_DIR,
+        mode: DiscoveryMode = DiscoveryMode.IMPORT,
+    ):
+        self.persistent = persistent
+        self.cache_dir = cache_dir
+        self.mode = mode
+
+    @staticmethod
+    def create_default():
+        """
+        :return: Module index cache configured by env vars
+        """
+        return ModuleIndexCache(persistent=is_module_index_cache_enabled(), mode=get_module_discovery_mode())
+
+    def get(self, root_module: str) -> ModuleIndex:
+        fingerprint = ModuleIndexer.compute_fingerprint(root_module)
+        key = (root_module, self.mode)
+        with ModuleIndexCache._LOCK:
+            index = ModuleIndexCache._INDEXES.get(key)
+            if index and index.fingerprint == fingerprint:
+                return index
+
+            index = self._load(root_module, fingerprint) if self.persistent else None
+            if not index:
+                index = ModuleIndexer.build(root_module, fingerprint, self.mode)
+                if self.persistent:
+                    self._store(index)
+            ModuleIndexCache._INDEXES[key] = index
+            return index
+
+    @staticmethod
+    def clear():
+        with ModuleIndexCache._LOCK:
+            ModuleIndexCache._INDEXES.clear()
+
+    def _load(self, root_module: str, fingerprint: str) -> Optional[ModuleIndex]:
+        cache_file = self._get_cache_file(root_module)
+        if not os.path.exists(cache_file):
+            LOG.info("Module index cache miss for module '%s'. Reason: no cache entry", root_module)
+            return None
+        try:
+            with open(cache_file, "rb") as f:
+                index = pickle.load(f)
+        except Exception:
+            LOG.warning("Failed to load module index cache file: %s", cache_file, exc_info=True)
+            return None
+        if (
+            not isinstance(index, ModuleIndex)
+            or index.format_version != MODULE_INDEX_FORMAT_VERSION
+            or index.mode != self.mode
+        ):
+            LOG.info("Module index cache miss for module '%s'. Reason: cache format changed", root_module)
+            return None
+        if index.fingerprint != fingerprint:
+            LOG.info("Module index cache miss for module '%s'. Reason: source files changed", root_module)
+            return None
+        LOG.info("Module index cache hit for module '%s'. Cache file: %s", root_module, cache_file)
+        return index
+
+    def _store(self, index: ModuleIndex):
+        cache_file = self._get_cache_file(index.root_module)
+        FileUtils.ensure_dir_created(self.cache_dir)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "wb") as f:
+                pickle.dump(index, f)
+            os.replace(tmp_file, cache_file)
+        except (OSError, pickle.PicklingError):
+            LOG.warning("Failed to store module index cache file: %s", cache_file, exc_info=True)
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return
+        LOG.info("Stored module index of module '%s' to cache file: %s", index.root_module, cache_file)
+
+    def _get_cache_file(self, root_module: str):
+        return os.path.join(self.cache_dir, f"{root_module}-{self.mode.value}.pickle")
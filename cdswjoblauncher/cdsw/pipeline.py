@@ -0,0 +1,132 @@
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass
+class StageFailure:
+    stage_name: str
+    item_name: str
+    exception: Exception
+
+    def __str__(self):
+        return f"Stage '{self.stage_name}' failed for '{self.item_name}': {self.exception!r}"
+
+
+@dataclass
+class _PipelineItem:
+    name: str
+    payload: Any
+
+
+class PipelineStage:
+    def __init__(self, name: str, func: Callable[[Any], None], queue_size: int):
+        self.name = name
+        self.func = func
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.thread: threading.Thread = None
+
+
+class Pipeline:
+    """
+    Chain of stages where every stage runs on its own worker thread.
+    Stages are connected with bounded queues, so submitting an item blocks once the first stage is saturated.
+    If a stage fails for an item, the remaining stages are skipped for that item and the failure is recorded.
+    If a worker thread dies, e.g. on a BaseException, the items of its stage are discarded and the error is re-raised
+    by drain().
+    """
+
+    _SENTINEL = object()
+
+    def __init__(self, name: str, queue_size: int = 1):
+        if queue_size < 1:
+            raise ValueError("Queue size of pipeline must be at least 1! Actual: {}".format(queue_size))
+        self.name = name
+        self.queue_size = queue_size
+        self.stages: List[PipelineStage] = []
+        self.failures: List[StageFailure] = []
+        self._failures_lock = threading.Lock()
+        self._fatal_error: Optional[BaseException] = None
+        self._started = False
+
+    def add_stage(self, name: str, func: Callable[[Any], None]):
+        if self._started:
+            raise ValueError("Cannot add stage '{}' to pipeline '{}' as it is already started!".format(name, self.name))
+        self.stages.append(PipelineStage(name, func, self.queue_size))
+        return self
+
+    def start(self):
+        if not self.stages:
+            raise ValueError("Pipeline '{}' has no stages!".format(self.name))
+        for idx, stage in enumerate(self.stages):
+            next_stage = self.stages[idx + 1] if idx + 1 < len(self.stages) else None
+            stage.thread = threading.Thread(
+                target=self._work, args=(stage, next_stage), name=f"{self.name}-{stage.name}", daemon=True
+            )
+            stage.thread.start()
+        self._started = True
+        return self
+
+    def submit(self, item_name: str, payload: Any):
+        if not self._started:
+            raise ValueError("Pipeline '{}' is not started!".format(self.name))
+        LOG.debug("Submitting item '%s' to pipeline '%s'", item_name, self.name)
+        self.stages[0].queue.put(_PipelineItem(item_name, payload))
+
+    def drain(self) -> List[StageFailure]:
+        """
+        Waits until all submitted items went through all stages and stops the worker threads.
+        :return: The failures of all stages, in the order they happened.
+        :raises BaseException: The error that killed a worker thread of the pipeline
+        """
+        if not self._started:
+            return self.failures
+        self.stages[0].queue.put(self._SENTINEL)
+        for stage in self.stages:
+            stage.thread.join()
+        self._started = False
+        if self._fatal_error:
+            raise self._fatal_error
+        return self.failures
+
+    def _work(self, stage: PipelineStage, next_stage: PipelineStage):
+        try:
+            self._process_items(stage, next_stage)
+        except BaseException as e:
+            LOG.exception("Worker of stage '%s' of pipeline '%s' died", stage.name, self.name)
+            with self._failures_lock:
+                if not self._fatal_error:
+                    self._fatal_error = e
+            # Previous stages and the submitter are not blocked by the full queue of the stage
+            self._discard_items(stage)
+        finally:
+            # The next stage is stopped even if this stage died, otherwise drain() would never return
+            if next_stage:
+                next_stage.queue.put(self._SENTINEL)
+
+    def _discard_items(self, stage: PipelineStage):
+        while True:
+            item = stage.queue.get()
+            if item is self._SENTINEL:
+                return
+            LOG.error("Skipping stage '%s' of pipeline '%s' for item '%s'", stage.name, self.name, item.name)
+
+    def _process_items(self, stage: PipelineStage, next_stage: PipelineStage):
+        while True:
+            item = stage.queue.get()
+            if item is self._SENTINEL:
+                return
+            try:
+                LOG.debug("Executing stage '%s' of pipeline '%s' for item '%s'", stage.name, self.name, item.name)
+                stage.func(item.payload)
+            except Exception as e:
+                LOG.exception("Stage '%s' of pipeline '%s' failed for item '%s'", stage.name, self.name, item.name)
+                with self._failures_lock:
+                    self.failures.append(StageFailure(stage.name, item.name, e))
+                continue
+            if next_stage:
+                next_stage.queue.put(item)
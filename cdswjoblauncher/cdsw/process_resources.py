@@ -0,0 +1,85 @@
+import logging
+import resource
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass
+class ResourceUsage:
+    user_cpu_time: float = 0.0
+    system_cpu_time: float = 0.0
+    # Peak resident set size in KiB
+    max_rss_kb: int = 0
+    # Number of block input / output operations
+    block_input_ops: int = 0
+    block_output_ops: int = 0
+
+    @staticmethod
+    def from_rusage(rusage) -> "ResourceUsage":
+        return ResourceUsage(
+            user_cpu_time=rusage.ru_utime,
+            system_cpu_time=rusage.ru_stime,
+            max_rss_kb=rusage.ru_maxrss,
+            block_input_ops=rusage.ru_inblock,
+            block_output_ops=rusage.ru_oublock,
+        )
+
+    @staticmethod
+    def of_children_between(before, after) -> "ResourceUsage":
+        """
+        Usage of the children reaped between two getrusage(RUSAGE_CHILDREN) calls.
+        The peak RSS is the maximum of all children reaped so far, so the peak RSS of the new children is only known
+        if it raised the maximum. Otherwise it is 0.
+        """
+        return ResourceUsage(
+            user_cpu_time=after.ru_utime - before.ru_utime,
+            system_cpu_time=after.ru_stime - before.ru_stime,
+            max_rss_kb=after.ru_maxrss if after.ru_maxrss > before.ru_maxrss else 0,
+            block_input_ops=after.ru_inblock - before.ru_inblock,
+            block_output_ops=after.ru_oublock - before.ru_oublock,
+        )
+
+    @staticmethod
+    def of_current_process() -> "ResourceUsage":
+        """
+        Usage of the current process and its reaped children. The peak RSS is the maximum of them.
+        """
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return ResourceUsage(
+            user_cpu_time=own.ru_utime + children.ru_utime,
+            system_cpu_time=own.ru_stime + children.ru_stime,
+            max_rss_kb=max(own.ru_maxrss, children.ru_maxrss),
+            block_input_ops=own.ru_inblock + children.ru_inblock,
+            block_output_ops=own.ru_oublock + children.ru_oublock,
+        )
+
+    @property
+    def cpu_time(self) -> float:
+        return self.user_cpu_time + self.system_cpu_time
+
+    def __str__(self):
+        return "CPU time: {:.2f} s (user: {:.2f} s, sys: {:.2f} s), max RSS: {} KiB, block I/O: {} in / {} out".format(
+            self.cpu_time,
+            self.user_cpu_time,
+            self.system_cpu_time,
+            self.max_rss_kb,
+            self.block_input_ops,
+            self.block_output_ops,
+        )
+
+
+def set_rlimits(rlimits: Dict[int, Tuple[int, int]]):
+    """
+    Sets resource limits of the current process, called in the child process before the command is executed.
+    Limits are lowered to the hard limits of the parent, as unprivileged processes cannot raise them.
+    :param rlimits: Soft and hard limits per resource, e.g. resource.RLIMIT_AS
+    """
+    for res, (soft, hard) in rlimits.items():
+        _, current_hard = resource.getrlimit(res)
+        if current_hard != resource.RLIM_INFINITY:
+            hard = current_hard if hard == resource.RLIM_INFINITY else min(hard, current_hard)
+            soft = hard if soft == resource.RLIM_INFINITY else min(soft, hard)
+        resource.setrlimit(res, (soft, hard))
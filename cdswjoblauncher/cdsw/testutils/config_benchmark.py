@@ -0,0 +1,464 @@
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import List, Dict, Any
+
+from cdswjoblauncher.cdsw.cdsw_common import CdswSetupResult
+from cdswjoblauncher.cdsw.cdsw_config import CdswJobConfigReader, CdswJobConfig
+from cdswjoblauncher.cdsw.config_cache import CdswJobConfigCache
+from cdswjoblauncher.cdsw.dataclass_utils import from_dict
+from cdswjoblauncher.cdsw.timing import format_rows
+
+LOG = logging.getLogger(__name__)
+BENCHMARK_RESULT_FORMAT_VERSION = 1
+DEFAULT_RESULTS_DIR = os.path.join("benchmarks", "results")
+DEFAULT_REPEAT = 5
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+PHASES = ["load_module", "from_dict", "process_config", "read_from_file", "read_from_file_cached"]
+INDENT = "    "
+
+
+@dataclass(frozen=True)
+class BenchmarkScenario:
+    name: str
+    runs: int
+    variables_per_run: int
+    # Length of the chain of global variables where every variable refers to the previous one
+    chain_depth: int = 0
+    # Runs are generated by a callable of the config instead of being listed
+    callable_runs: bool = False
+
+    def scaled(self, scale: int):
+        return BenchmarkScenario(
+            self.name, self.runs * scale, self.variables_per_run, self.chain_depth, self.callable_runs
+        )
+
+
+# Every level of the variable chain takes a few stack frames to resolve, deeper chains hit the recursion limit
+DEFAULT_SCENARIOS = [
+    BenchmarkScenario("baseline", runs=2, variables_per_run=5),
+    BenchmarkScenario("many_runs", runs=500, variables_per_run=5),
+    BenchmarkScenario("many_variables", runs=20, variables_per_run=200),
+    BenchmarkScenario("deep_chains", runs=50, variables_per_run=10, chain_depth=100),
+    BenchmarkScenario("callable_runs", runs=500, variables_per_run=5, chain_depth=20, callable_runs=True),
+]
+
+
+class SyntheticJobConfigGenerator:
+    """
+    Generates job config files in the format of the config files of the jobs:
+    Global variables with a transitive chain, runs with variables referring to global and other run variables,
+    email and Drive settings and main script arguments referring to the variables.
+    """
+
+    def __init__(self, scenario: BenchmarkScenario):
+        self.scenario = scenario
+
+    def write(self, dest_dir: str) -> str:
+        file = os.path.join(dest_dir, f"cdsw_job_config_{self.scenario.name}.py")
+        with open(file, "w") as f:
+            f.write(self.generate())
+        return file
+
+    def generate(self) -> str:
+        lines = ["from cdswjoblauncher.cdsw.cdsw_common import ReportFile", ""]
+        if self.scenario.callable_runs:
+            lines.append("")
+            lines.append("def generate_runs(conf):")
+            lines.append(f"{INDENT}runs = []")
+            lines.append(f"{INDENT}for idx in range({self.scenario.runs}):")
+            lines.append(f"{INDENT * 2}runs.append(")
+            lines.extend(self._generate_run("{idx}", level=3, in_generator=True))
+            lines.append(f"{INDENT * 2})")
+            lines.append(f"{INDENT}return runs")
+            lines.append("")
+            lines.append("")
+
+        lines.append("config = {")
+        lines.append(f'{INDENT}"job_name": "Benchmark-{self.scenario.name}",')
+        lines.append(f'{INDENT}"command_type": "benchmark",')
+        lines.append(f'{INDENT}"main_script_arguments": [')
+        lines.append(f'{INDENT * 2}"--debug",')
+        lines.append(f"{INDENT * 2}lambda conf: f\"--algorithm {{conf.var('algorithm')}}\",")
+        lines.append(f"{INDENT}],")
+        lines.append(f'{INDENT}"global_variables": {{')
+        lines.extend(self._generate_global_variables(level=2))
+        lines.append(f"{INDENT}}},")
+        if self.scenario.callable_runs:
+            lines.append(f'{INDENT}"runs": generate_runs,')
+        else:
+            lines.append(f'{INDENT}"runs": [')
+            for idx in range(self.scenario.runs):
+                lines.extend(self._generate_run(str(idx), level=2, in_generator=False))
+            lines.append(f"{INDENT}],")
+        lines.append("}")
+        lines.append("")
+        return "\n".join(lines)
+
+    def _generate_global_variables(self, level: int) -> List[str]:
+        indent = INDENT * level
+        lines = [f'{indent}"algorithm": "benchmarkAlgorithm",', f'{indent}"chain0": "chainStart",']
+        for i in range(1, self.scenario.chain_depth + 1):
+            lines.append(f"{indent}\"chain{i}\": lambda conf: f\"{{conf.var('chain{i - 1}')}}+{i}\",")
+        return lines
+
+    def _generate_run(self, idx: str, level: int, in_generator: bool) -> List[str]:
+        indent = INDENT * level
+        # Run names are f-strings in the generator so the index is substituted when runs are generated
+        prefix = "f" if in_generator else ""
+        chain_end = f"chain{self.scenario.chain_depth}"
+        lines = [
+            f"{indent}{{",
+            f'{indent}{INDENT}"name": {prefix}"run{idx}",',
+            f'{indent}{INDENT}"email_settings": {{',
+            f'{indent}{INDENT * 2}"enabled": False,',
+            f'{indent}{INDENT * 2}"send_attachment": True,',
+            f'{indent}{INDENT * 2}"email_body_file_from_command_data": ReportFile.SHORT_HTML.value,',
+            f'{indent}{INDENT * 2}"attachment_file_name": "attachment_file_name",',
+            f"{indent}{INDENT * 2}\"subject\": lambda conf: f\"Subject {{conf.var('algorithm')}}\",",
+            f'{indent}{INDENT * 2}"sender": "benchmarkSender",',
+            f"{indent}{INDENT}}},",
+            f'{indent}{INDENT}"drive_api_upload_settings": {{',
+            f'{indent}{INDENT * 2}"enabled": False,',
+            f"{indent}{INDENT * 2}\"file_name\": lambda conf: f\"file_{{conf.var('{chain_end}')}}\",",
+            f"{indent}{INDENT}}},",
+            f'{indent}{INDENT}"variables": {{',
+        ]
+        for i in range(self.scenario.variables_per_run):
+            lines.append(f"{indent}{INDENT * 2}{self._generate_run_variable(i, chain_end)}")
+        lines.append(f"{indent}{INDENT}}},")
+        lines.append(f'{indent}{INDENT}"main_script_arguments": [')
+        for i in range(self.scenario.variables_per_run):
+            lines.append(f"{indent}{INDENT * 2}lambda conf: f\"--arg{i} {{conf.var('var{i}')}}\",")
+        lines.append(f"{indent}{INDENT}],")
+        lines.append(f"{indent}}}" + ("" if in_generator else ","))
+        return lines
+
+    @staticmethod
+    def _generate_run_variable(i: int, chain_end: str) -> str:
+        # Mix of plain values, references to global variables and references to other variables of the run
+        if i == 0:
+            return f"\"var0\": lambda conf: f\"{{conf.var('{chain_end}')}}\","
+        if i % 3 == 0:
+            return f'"var{i}": "value{i}",'
+        if i % 3 == 1:
+            return f"\"var{i}\": lambda conf: f\"{{conf.var('var{i - 1}')}}+{i}\","
+        return f"\"var{i}\": lambda conf: f\"{{conf.var('algorithm')}}+{i}\","
+
+
+@dataclass
+class PhaseTimings:
+    min: float
+    median: float
+    mean: float
+    max: float
+
+    @staticmethod
+    def of(durations: List[float]):
+        return PhaseTimings(min(durations), statistics.median(durations), statistics.mean(durations), max(durations))
+
+
+@dataclass
+class ScenarioResult:
+    scenario: BenchmarkScenario
+    config_file_size: int
+    phases: Dict[str, PhaseTimings]
+    # Peak of memory allocated by Python while reading and processing the config, in bytes
+    peak_memory: int
+
+
+class ConfigBenchmark:
+    """
+    Measures the duration of the phases of loading job configs and the memory used while loading them.
+    Memory is measured in a separate pass as tracing allocations slows down the config reader.
+    The read_from_file_cached phase reads the config with a hit of the job config cache.
+    """
+
+    def __init__(self, scenarios: List[BenchmarkScenario], repeat: int = DEFAULT_REPEAT):
+        if repeat < 1:
+            raise ValueError("Repeat count should be at least 1! Actual: {}".format(repeat))
+        self.scenarios = scenarios
+        self.repeat = repeat
+
+    def run(self) -> List[ScenarioResult]:
+        results = []
+        with tempfile.TemporaryDirectory(prefix="cdsw-config-benchmark-") as tmp_dir:
+            setup_result = CdswSetupResult(tmp_dir, tmp_dir, {}, tmp_dir)
+            config_cache = CdswJobConfigCache(os.path.join(tmp_dir, "config-cache"))
+            for scenario in self.scenarios:
+                LOG.info("Running benchmark scenario: %s", scenario)
+                file = SyntheticJobConfigGenerator(scenario).write(tmp_dir)
+                results.append(self._run_scenario(scenario, file, setup_result, config_cache))
+        return results
+
+    def _run_scenario(
+        self, scenario: BenchmarkScenario, file: str, setup_result: CdswSetupResult, config_cache: CdswJobConfigCache
+    ):
+        durations: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+        # Populates the cache, so the cached reads are all hits
+        CdswJobConfigReader.read_from_file(file, [], setup_result, config_cache=config_cache)
+        for _ in range(self.repeat):
+            for phase, duration in self._measure_phases(file, setup_result, config_cache).items():
+                durations[phase].append(duration)
+
+        tracemalloc.start()
+        try:
+            CdswJobConfigReader.read_from_file(file, [], setup_result)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return ScenarioResult(
+            scenario,
+            os.path.getsize(file),
+            {phase: PhaseTimings.of(durations[phase]) for phase in PHASES},
+            peak_memory,
+        )
+
+    @staticmethod
+    def _measure_phases(file: str, setup_result: CdswSetupResult, config_cache: CdswJobConfigCache) -> Dict[str, float]:
+        config_reader = CdswJobConfigReader([])
+        start = time.perf_counter()
+        conf_dict = config_reader._read_from_python_conf(file)
+        loaded = time.perf_counter()
+        config = from_dict(data_class=CdswJobConfig, data=conf_dict)
+        config.setup_result = setup_result
+        converted = time.perf_counter()
+        config_reader.process_config(config)
+        processed = time.perf_counter()
+
+        CdswJobConfigReader.read_from_file(file, [], setup_result)
+        read = time.perf_counter()
+
+        CdswJobConfigReader.read_from_file(file, [], setup_result, config_cache=config_cache)
+        end = time.perf_counter()
+        return {
+            "load_module": loaded - start,
+            "from_dict": converted - loaded,
+            "process_config": processed - converted,
+            "read_from_file": read - processed,
+            "read_from_file_cached": end - read,
+        }
+
+
+class BenchmarkResultStore:
+    """
+    Stores benchmark results as JSON files named after the git commit they were measured on.
+    """
+
+    def __init__(self, results_dir: str):
+        self.results_dir = results_dir
+
+    def save(self, results: List[ScenarioResult], commit: str = None) -> str:
+        commit = commit or BenchmarkResultStore.get_current_commit()
+        os.makedirs(self.results_dir, exist_ok=True)
+        file = os.path.join(self.results_dir, f"{commit}.json")
+        data = {
+            "format_version": BENCHMARK_RESULT_FORMAT_VERSION,
+            "commit": commit,
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scenarios": {result.scenario.name: asdict(result) for result in results},
+        }
+        with open(file, "w") as f:
+            json.dump(data, f, indent=2)
+        LOG.info("Written benchmark results to file: %s", file)
+        return file
+
+    def load(self, commit_or_file: str) -> Dict[str, Any]:
+        file = commit_or_file
+        if not os.path.isfile(file):
+            file = os.path.join(self.results_dir, f"{commit_or_file}.json")
+        if not os.path.isfile(file):
+            raise ValueError("Cannot find benchmark results of: {}".format(commit_or_file))
+        with open(file) as f:
+            data = json.load(f)
+        if data.get("format_version") != BENCHMARK_RESULT_FORMAT_VERSION:
+            raise ValueError(
+                "Unsupported format version of benchmark results file {}: {}".format(file, data.get("format_version"))
+            )
+        return data
+
+    @staticmethod
+    def get_current_commit():
+        try:
+            return subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return "unknown"
+
+
+@dataclass
+class BenchmarkComparison:
+    scenario: str
+    metric: str
+    base: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        if not self.base:
+            return 0.0
+        return (self.current - self.base) / self.base
+
+    def is_regression(self, threshold: float):
+        return self.change > threshold
+
+
+class BenchmarkComparator:
+    """
+    Compares the median phase durations and the peak memory of scenarios that are present in both results.
+    """
+
+    @staticmethod
+    def compare(base: Dict[str, Any], current: Dict[str, Any]) -> List[BenchmarkComparison]:
+        comparisons = []
+        for name, current_scenario in current["scenarios"].items():
+            base_scenario = base["scenarios"].get(name)
+            if not base_scenario:
+                LOG.info("Scenario '%s' is not present in base results, skipping comparison", name)
+                continue
+            if base_scenario["scenario"] != current_scenario["scenario"]:
+                LOG.warning("Parameters of scenario '%s' differ, results are not comparable", name)
+                continue
+            for phase, timings in current_scenario["phases"].items():
+                if phase in base_scenario["phases"]:
+                    base_median = base_scenario["phases"][phase]["median"]
+                    comparisons.append(BenchmarkComparison(name, phase, base_median, timings["median"]))
+            comparisons.append(
+                BenchmarkComparison(name, "peak_memory", base_scenario["peak_memory"], current_scenario["peak_memory"])
+            )
+        return comparisons
+
+
+def format_results_table(results: List[ScenarioResult]) -> str:
+    rows = [("Scenario", "Runs", "Vars/run", "Chain", *(f"{phase} (ms)" for phase in PHASES), "Peak memory (KiB)")]
+    for result in results:
+        s = result.scenario
+        rows.append(
+            (
+                s.name + (" (callable)" if s.callable_runs else ""),
+                str(s.runs),
+                str(s.variables_per_run),
+                str(s.chain_depth),
+                *(f"{result.phases[phase].median * 1000:.2f}" for phase in PHASES),
+                f"{result.peak_memory / 1024:.1f}",
+            )
+        )
+    return "\n".join(format_rows(rows))
+
+
+def format_comparison_table(comparisons: List[BenchmarkComparison], threshold: float) -> str:
+    rows = [("Scenario", "Metric", "Base", "Current", "Change", "")]
+    for c in comparisons:
+        rows.append(
+            (
+                c.scenario,
+                c.metric,
+                _format_metric(c.metric, c.base),
+                _format_metric(c.metric, c.current),
+                f"{c.change * 100:+.1f}%",
+                "REGRESSION" if c.is_regression(threshold) else "",
+            )
+        )
+    return "\n".join(format_rows(rows))
+
+
+def _format_metric(metric: str, value: float):
+    if metric == "peak_memory":
+        return f"{value / 1024:.1f} KiB"
+    return f"{value * 1000:.2f} ms"
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser(description="Benchmark of loading and processing job configs")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=None,
+        choices=[s.name for s in DEFAULT_SCENARIOS],
+        help="Scenarios to run, all scenarios are run if not specified",
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=1,
+        help="Multiplier of the number of runs of the scenarios",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Number of measurements of each scenario",
+    )
+    parser.add_argument(
+        "--results-dir",
+        default=DEFAULT_RESULTS_DIR,
+        help="Directory of the stored results, one file per commit",
+    )
+    parser.add_argument(
+        "--no-save",
+        action="store_true",
+        default=False,
+        help="Do not store the results",
+    )
+    parser.add_argument(
+        "--compare",
+        default=None,
+        help="Commit or results file to compare the results with",
+    )
+    parser.add_argument(
+        "--regression-threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help="Relative increase of a metric that is reported as a regression, e.g. 0.1 for 10%%",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        default=False,
+        help="Exit with a non-zero status if any regression is found",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # The config reader logs the whole config on info level, that would dominate the measurements
+    logging.getLogger("cdswjoblauncher.cdsw.cdsw_config").setLevel(logging.WARNING)
+
+    scenarios = [s.scaled(args.scale) for s in DEFAULT_SCENARIOS if not args.scenarios or s.name in args.scenarios]
+    results = ConfigBenchmark(scenarios, repeat=args.repeat).run()
+    print(format_results_table(results))
+
+    store = BenchmarkResultStore(args.results_dir)
+    if not args.no_save:
+        store.save(results)
+    if not args.compare:
+        return 0
+
+    current = {"scenarios": {result.scenario.name: asdict(result) for result in results}}
+    comparisons = BenchmarkComparator.compare(store.load(args.compare), current)
+    print()
+    print(format_comparison_table(comparisons, args.regression_threshold))
+    regressions = [c for c in comparisons if c.is_regression(args.regression_threshold)]
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
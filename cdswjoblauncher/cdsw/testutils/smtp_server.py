@@ -0,0 +1,138 @@
+import logging
+import socketserver
+import threading
+from dataclasses import dataclass
+from typing import List
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass
+class ReceivedMail:
+    sender: str
+    recipients: List[str]
+    data: str
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server: LocalSmtpServer = self.server.owner
+        server.register_connection(self.connection)
+        sender = None
+        recipients = []
+        self._reply("220 localhost Local SMTP server")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8").rstrip("\r\n")
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-localhost", "250 AUTH PLAIN LOGIN")
+            elif verb == "HELO":
+                self._reply("250 localhost")
+            elif verb == "AUTH":
+                server.login_count += 1
+                self._reply("235 Authentication successful")
+            elif verb == "MAIL":
+                sender = command.split(":", 1)[1].strip().strip("<>")
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                server.add_mail(ReceivedMail(sender, recipients, self._read_data()))
+                self._reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+    def finish(self):
+        try:
+            super().finish()
+        except OSError:
+            # Connection was dropped by the server
+            pass
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline().decode("utf-8")
+            if line in (".\r\n", ".\n", ""):
+                return "".join(lines)
+            if line.startswith(".."):
+                line = line[1:]
+            lines.append(line)
+
+    def _reply(self, *lines):
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode("utf-8"))
+
+
+class _ThreadingTcpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSmtpServer:
+    """
+    Minimal plaintext SMTP server on localhost that accepts every login and stores the received mails in memory.
+    Stand-in for the real SMTP server in tests and benchmarks.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = _ThreadingTcpServer((host, port), _SmtpHandler)
+        self._server.owner = self
+        self.host, self.port = self._server.server_address
+        self.mails: List[ReceivedMail] = []
+        self.connection_count = 0
+        self.login_count = 0
+        self._connections = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), name="local-smtp-server", daemon=True
+        )
+        self._thread.start()
+        LOG.info("Started local SMTP server on %s:%s", self.host, self.port)
+        return self
+
+    def stop(self):
+        self.drop_connections()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def register_connection(self, connection):
+        with self._lock:
+            self.connection_count += 1
+            self._connections.append(connection)
+
+    def add_mail(self, mail: ReceivedMail):
+        with self._lock:
+            self.mails.append(mail)
+
+    def drop_connections(self):
+        """
+        Closes all client connections, simulating the server dropping idle sessions.
+        """
+        with self._lock:
+            for connection in self._connections:
+                try:
+                    connection.shutdown(2)
+                except OSError:
+                    pass
+                connection.close()
+            self._connections = []
@@ -170,16 +170,16 @@ def find_repo_root():
 
 class FakeGoogleDriveCdswHelper(GoogleDriveCdswHelper):
     def __init__(self, module_name):
-        # intentionally not calling super.__init__
+        super().__init__(module_name)
         with patch("googleapiwrapper.google_drive.DriveApiWrapper._build_service") as mock_build_service:
             mock_service = Mock()
             mock_service.files.return_value = ["file1", "file2"]
             mock_build_service.return_value = mock_service
-            self.authorizer = FakeGoogleDriveCdswHelper.create_authorizer()
+            self._authorizer = FakeGoogleDriveCdswHelper.create_authorizer()
             session_settings = DriveApiWrapperSessionSettings(
                 FileFindMode.JUST_UNTRASHED, DuplicateFileWriteResolutionMode.FAIL_FAST, enable_path_cache=True
             )
-            self.drive_wrapper = DriveApiWrapper(self.authorizer, session_settings=session_settings)
+            self._drive_wrapper = DriveApiWrapper(self._authorizer, session_settings=session_settings)
             self.drive_command_data_basedir = FileUtils.join_path(
                 "/tmp", module_name, CDSW_PROJECT, "command-data"
             )
@@ -0,0 +1,161 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from enum import Enum
+from typing import List, Dict, Any, Optional
+
+LOG = logging.getLogger(__name__)
+TIMING_REPORT_FORMAT_VERSION = 1
+
+
+class Phase(Enum):
+    SETUP = "setup"
+    CONFIG = "config"
+    CALLBACK = "callback"
+    RUN = "run"
+    MAIN_SCRIPT = "main_script"
+    ZIP = "zip"
+    UPLOAD = "upload"
+    EMAIL = "email"
+
+
+@dataclass
+class Span:
+    id: int
+    name: str
+    phase: str
+    # Seconds since the start of the tracer
+    start: float
+    duration: float = None
+    parent_id: Optional[int] = None
+    thread: str = None
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class Tracer:
+    """
+    Records the duration of the phases of a job as spans.
+    Spans started in a span of the same thread are recorded as its children.
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name: str, phase: Phase, **attributes):
+        stack = self._get_stack()
+        with self._lock:
+            span = Span(
+                id=len(self.spans),
+                name=name,
+                phase=phase.value,
+                start=time.perf_counter() - self._start,
+                parent_id=stack[-1].id if stack else None,
+                thread=threading.current_thread().name,
+                attributes=attributes,
+            )
+            self.spans.append(span)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - self._start - span.start
+            stack.pop()
+            LOG.debug("Span '%s' of phase '%s' took %.3f seconds", span.name, span.phase, span.duration)
+
+    @property
+    def total_duration(self) -> float:
+        return time.perf_counter() - self._start
+
+    def get_phase_totals(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: Count, total and max duration of the spans per phase.
+        Nested spans of the same phase are not counted twice.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        by_id = {span.id: span for span in spans}
+        totals: Dict[str, Dict[str, Any]] = {}
+        for span in spans:
+            if span.duration is None or self._has_ancestor_of_same_phase(span, by_id):
+                continue
+            phase_totals = totals.setdefault(span.phase, {"count": 0, "total": 0.0, "max": 0.0})
+            phase_totals["count"] += 1
+            phase_totals["total"] += span.duration
+            phase_totals["max"] = max(phase_totals["max"], span.duration)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [asdict(span) for span in self.spans]
+        return {
+            "format_version": TIMING_REPORT_FORMAT_VERSION,
+            "started_at": self.started_at.isoformat(),
+            "total_duration": self.total_duration,
+            "phases": self.get_phase_totals(),
+            "spans": spans,
+        }
+
+    def write_report(self, file: str):
+        with open(file, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        LOG.info("Written timing report to file: %s", file)
+
+    def format_summary_table(self, number_of_slowest_spans: int = 10) -> str:
+        rows = [("Phase", "Count", "Total (s)", "Max (s)")]
+        for phase, totals in sorted(self.get_phase_totals().items(), key=lambda kv: -kv[1]["total"]):
+            rows.append((phase, str(totals["count"]), f"{totals['total']:.3f}", f"{totals['max']:.3f}"))
+        lines = format_rows(rows)
+
+        with self._lock:
+            finished_spans = [span for span in self.spans if span.duration is not None]
+        slowest = sorted(finished_spans, key=lambda s: -s.duration)[:number_of_slowest_spans]
+        span_rows = [("Span", "Phase", "Start (s)", "Duration (s)")]
+        span_rows.extend((s.name, s.phase, f"{s.start:.3f}", f"{s.duration:.3f}") for s in slowest)
+        lines.append("")
+        lines.extend(format_rows(span_rows))
+        lines.append("")
+        lines.append(f"Total duration: {self.total_duration:.3f} s")
+        return "\n".join(lines)
+
+    def _get_stack(self) -> List[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @staticmethod
+    def _has_ancestor_of_same_phase(span: Span, by_id: Dict[int, Span]):
+        parent_id = span.parent_id
+        while parent_id is not None:
+            parent = by_id[parent_id]
+            if parent.phase == span.phase:
+                return True
+            parent_id = parent.parent_id
+        return False
+
+
+def format_rows(rows) -> List[str]:
+    """
+    Formats the rows as the lines of a table. The first row is the header, the first column is left-aligned,
+    the other columns are right-aligned.
+    """
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = []
+    for idx, row in enumerate(rows):
+        cells = [row[0].ljust(widths[0])] + [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+        lines.append("  ".join(cells).rstrip())
+        if idx == 0:
+            lines.append("  ".join("-" * width for width in widths))
+    return lines
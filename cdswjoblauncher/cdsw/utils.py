@@ -1,8 +1,9 @@
 import importlib
 import logging
-import pkgutil
 from typing import List, Callable
 
+from cdswjoblauncher.cdsw.module_index import ModuleIndexCache
+
 LOG = logging.getLogger(__name__)
 
 
@@ -45,43 +46,33 @@ class ResolutionContext:
 
 
 class MethodResolver:
-    def __init__(self, module_name, specs):
+    def __init__(self, module_name, specs, index_cache: ModuleIndexCache = None):
         self.module_name = module_name
         self.specs = specs
+        self.index_cache = index_cache or ModuleIndexCache.create_default()
 
     def resolve(self):
         ctx = ResolutionContext(self.module_name)
+        if not self.specs:
+            return ctx.callables
+
+        # Modules are traversed once for all specs, a spec is resolved by a lookup in the index
+        index = self.index_cache.get(self.module_name)
         for spec in self.specs:
             ctx.start_with_spec(spec)
-            parent_module = importlib.import_module(self.module_name)
-            MethodResolver._traverse_modules(ctx, ctx.main_module, parent_module, MethodResolver._mod_callback)
+            for module_path in index.find_class_attribute(ctx.class_name, ctx.method_name):
+                method = MethodResolver._get_method(module_path, ctx.class_name, ctx.method_name)
+                if method:
+                    ctx.add_result(module_path, method)
 
             if not ctx.has_result():
                 raise ValueError(f"No callback method found for spec '{spec}'")
         return ctx.callables
 
     @staticmethod
-    def _mod_callback(ctx: ResolutionContext, module_path: str, module):
-        LOG.debug("Processing module: %s", module.__name__)
-
-        method = None
-        try:
-            cls = getattr(module, ctx.class_name)
-            method = getattr(cls, ctx.method_name)
-        except:
-            pass
-
-        if method:
-            ctx.add_result(module_path, method)
-
-    @staticmethod
-    def _traverse_modules(ctx, module_path, curr_module, callback):
-        callback(ctx, module_path, curr_module)
-        # https://docs.python.org/3/reference/import.html#:~:text=By%20definition%2C%20if%20a%20module,search%20for%20modules%20during%20import.
-        is_package = hasattr(curr_module, "__path__")
-        if is_package:
-            for mod_info in pkgutil.iter_modules(curr_module.__path__):
-                new_module_path = f"{module_path}.{mod_info.name}"
-                # LOG.debug("Loading module from path: %s", new_module_path)
-                new_module = importlib.import_module(new_module_path)
-                MethodResolver._traverse_modules(ctx, new_module_path, new_module, callback)
+    def _get_method(module_path, class_name, method_name):
+        LOG.debug("Importing module: %s", module_path)
+        module = importlib.import_module(module_path)
+        cls = getattr(module, class_name, None)
+        # Static discovery can return classes where the method is not defined by the class itself but inherited
+        return getattr(cls, method_name, None) if cls is not None else None
@@ -0,0 +1,162 @@
+import logging
+import multiprocessing
+import os
+import runpy
+import sys
+import threading
+import time
+import traceback
+from typing import List, Dict, Tuple, Optional
+
+from cdswjoblauncher.cdsw.command_engine import CommandResult
+from cdswjoblauncher.cdsw.process_resources import ResourceUsage, set_rlimits
+
+LOG = logging.getLogger(__name__)
+# Time to wait for a process to exit after SIGTERM before it is killed
+TERMINATE_GRACE_PERIOD_SECONDS = 5
+
+
+class WarmInterpreter:
+    """
+    Runs Python scripts in processes forked from a pre-warmed fork server instead of starting a new interpreter.
+    The fork server imports the preloaded modules once, e.g. the main script as a module with its dependencies.
+    Every script is run in a new fork of the fork server with runpy, so the state of the runs is isolated
+    from each other and from the runner: module globals, sys.argv, env vars, working dir and logging config.
+    The stdout and stderr of the scripts are streamed line by line to the output logger and to the log file.
+
+    The fork server is shared by the runner process, so the preloaded modules of the first instance are used.
+    """
+
+    def __init__(self, preload_modules: List[str], output_logger: logging.Logger = None, timeout: float = None):
+        self.preload_modules = list(preload_modules)
+        self.output_logger = output_logger if output_logger else LOG
+        self.timeout = timeout
+        self._context = multiprocessing.get_context("forkserver")
+        # Modules that fail to import are skipped by the fork server. The main module of the runner is also preloaded,
+        # otherwise it would be imported again in every forked process
+        self._context.set_forkserver_preload(self.preload_modules + [__name__, "__main__"])
+
+    def run(
+        self,
+        argv: List[str],
+        env: Dict[str, str] = None,
+        log_file: str = None,
+        timeout: float = None,
+        rlimits: Dict[int, Tuple[int, int]] = None,
+    ) -> CommandResult:
+        """
+        :param argv: Command of the script: Python interpreter, script and its arguments. The interpreter is ignored
+        :param env: Env vars of the script, in addition to the env vars of the fork server
+        :param timeout: Timeout of the script in seconds, overrides the timeout of the warm interpreter
+        :param rlimits: Soft and hard resource limits of the script process, see resource.setrlimit
+        """
+        if len(argv) < 2:
+            raise ValueError("Expected a Python interpreter and a script in command: {}".format(argv))
+        timeout = timeout if timeout is not None else self.timeout
+        result = CommandResult(list(argv), log_file=log_file)
+        LOG.info("Running script in warm interpreter: %s", argv[1:])
+        output_reader, output_writer = self._context.Pipe(duplex=False)
+        result_reader, result_writer = self._context.Pipe(duplex=False)
+        proc = self._context.Process(
+            target=_run_script,
+            args=(argv[1:], env if env else {}, rlimits, output_writer, result_writer),
+            name="warm-interpreter-run",
+        )
+        start_time = time.perf_counter()
+        proc.start()
+        # The pipes are only written by the script process
+        output_writer.close()
+        result_writer.close()
+        output_file = os.fdopen(os.dup(output_reader.fileno()), "rb")
+        output_reader.close()
+        streamer = threading.Thread(
+            target=self._stream_lines, args=(output_file, log_file), name="warm-interpreter-output", daemon=True
+        )
+        streamer.start()
+        try:
+            proc.join(timeout)
+            if proc.exitcode is None:
+                LOG.error("Script timed out after %s seconds, terminating it: %s", timeout, argv[1:])
+                result.timed_out = True
+                self._terminate(proc)
+            # Processes started by the script can keep the pipe open, so the output is not awaited
+            # longer than the grace period
+            streamer.join(TERMINATE_GRACE_PERIOD_SECONDS)
+            if streamer.is_alive():
+                LOG.warning("Output of script is still open after the script exited: %s", argv[1:])
+            result.wall_time = time.perf_counter() - start_time
+            result.exit_code = proc.exitcode
+            proc.close()
+            try:
+                if result_reader.poll():
+                    result.resource_usage = result_reader.recv()
+            except EOFError:
+                # The script process was killed before it could report its usage
+                LOG.warning("Resource usage of script was not reported: %s", argv[1:])
+        finally:
+            result_reader.close()
+        LOG.info("Finished script in warm interpreter: %s, %s", argv[1:], result)
+        return result
+
+    def _stream_lines(self, output_file, log_file: Optional[str]):
+        log_file_obj = open(log_file, "w", buffering=1) if log_file else None
+        try:
+            for line in output_file:
+                line = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                self.output_logger.info(line)
+                if log_file_obj:
+                    log_file_obj.write(line + os.linesep)
+        finally:
+            output_file.close()
+            if log_file_obj:
+                log_file_obj.close()
+
+    @staticmethod
+    def _terminate(proc):
+        proc.terminate()
+        proc.join(TERMINATE_GRACE_PERIOD_SECONDS)
+        if proc.exitcode is None:
+            LOG.warning("Process %d did not exit after SIGTERM, killing it", proc.pid)
+            proc.kill()
+            proc.join()
+
+
+def _run_script(script_argv: List[str], env: Dict[str, str], rlimits, output_writer, result_writer):
+    # Runs in the process forked from the fork server
+    # Output of processes started by the script goes to the pipe too
+    os.dup2(output_writer.fileno(), 1)
+    os.dup2(output_writer.fileno(), 2)
+    output_writer.close()
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+    os.environ.update(env)
+    if rlimits:
+        set_rlimits(rlimits)
+
+    sys.argv = list(script_argv)
+    # Same as running the script with the interpreter, so modules next to the script can be imported
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_argv[0])))
+    exit_code = 0
+    try:
+        runpy.run_path(script_argv[0], run_name="__main__")
+    except SystemExit as e:
+        exit_code = _to_exit_code(e.code)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        result_writer.send(ResourceUsage.of_current_process())
+        result_writer.close()
+    sys.exit(exit_code)
+
+
+def _to_exit_code(code: Optional[object]) -> int:
+    # Same as the interpreter: None is success, other non-int values are printed to stderr
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
@@ -74,14 +74,18 @@ def init(ctx):
 @click.option('--execution-mode', required=True, help='Execution mode, will be passed back to the package, arbitrary string from the perspective of this app')
 @click.option('--python-module-mode', required=True, type=click.Choice([m.name.lower() for m in PythonModuleMode]), help='Python module mode')
 @click.option('--force-reinstall', is_flag=True, help='Whether to force-reinstall package')
-def initial_setup(ctx, package: str, execution_mode: str, python_module_mode: str, force_reinstall: bool):
+@click.option('--offline', is_flag=True, help='Install package only from the local wheelhouse, without network access')
+@click.option('--use-snapshot', is_flag=True, help='Restore the site-packages snapshot of the package if exists, otherwise create it after installation')
+def initial_setup(ctx, package: str, execution_mode: str, python_module_mode: str, force_reinstall: bool,
+                  offline: bool, use_snapshot: bool):
     """
     Sets up project on CDSW
     """
     module_mode = PythonModuleMode[python_module_mode.upper()]
 
     handler: MainCommandHandler = ctx.obj['handler']
-    handler.initial_setup(package, execution_mode, module_mode, force_reinstall)
+    handler.initial_setup(package, execution_mode, module_mode, force_reinstall, offline=offline,
+                          use_snapshot=use_snapshot)
 
 
 
@@ -0,0 +1,108 @@
+import logging
+import smtplib
+import threading
+import time
+from email.message import Message
+from typing import List
+
+from pythoncommons.email import EmailConfig
+
+LOG = logging.getLogger(__name__)
+DEFAULT_SMTP_TIMEOUT = 60
+RECONNECT_WAIT_SECONDS = 1
+# Errors where the session is lost but sending can be retried on a new session
+RETRIABLE_SMTP_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class MailTransport:
+    """
+    Sends emails over a single SMTP session that is kept alive until the transport is closed.
+    The session is established and authenticated on the first email and re-established if it is lost.
+    Emails are sent right away, only the session is shared by them.
+    """
+
+    def __init__(
+        self,
+        email_config: EmailConfig,
+        use_ssl: bool = True,
+        retry_count: int = 3,
+        timeout: int = DEFAULT_SMTP_TIMEOUT,
+    ):
+        self.conf = email_config
+        self.use_ssl = use_ssl
+        self.retry_count = retry_count
+        self.timeout = timeout
+        self.connect_count = 0
+        self.sent_count = 0
+        self._conn = None
+        # Emails can be sent from multiple threads, e.g. parallel runs, but they share the session
+        self._lock = threading.RLock()
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def send(self, sender: str, recipients: List[str], message: Message):
+        attempts_count = self.retry_count + 1
+        with self._lock:
+            for attempt in range(1, attempts_count + 1):
+                LOG.info(
+                    "[Attempt: %d / %d] Sending mail to recipients: %s with subject '%s'",
+                    attempt,
+                    attempts_count,
+                    recipients,
+                    message["Subject"],
+                )
+                try:
+                    self._get_connection().sendmail(sender, recipients, message.as_string())
+                    self.sent_count += 1
+                    return
+                except RETRIABLE_SMTP_ERRORS:
+                    self._drop_connection()
+                    if attempt == attempts_count:
+                        raise
+                    LOG.warning("SMTP session lost while sending mail, reconnecting.", exc_info=True)
+                    time.sleep(RECONNECT_WAIT_SECONDS * (attempt - 1))
+
+    def _get_connection(self):
+        if self._conn:
+            return self._conn
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        LOG.info("Connecting to SMTP server %s:%s", self.conf.smtp_server, self.conf.smtp_port)
+        conn = smtp_class(self.conf.smtp_server, self.conf.smtp_port, timeout=self.timeout)
+        try:
+            conn.ehlo()
+            account = self.conf.email_account
+            if account and account.user and account.password:
+                LOG.debug("SMTP login")
+                conn.login(account.user, account.password)
+        except BaseException:
+            conn.close()
+            raise
+        self.connect_count += 1
+        self._conn = conn
+        return conn
+
+    def _disconnect(self):
+        if not self._conn:
+            return
+        try:
+            self._conn.quit()
+        except (smtplib.SMTPException, OSError):
+            LOG.debug("Failed to quit SMTP session", exc_info=True)
+            self._conn.close()
+        self._conn = None
+
+    def _drop_connection(self):
+        # The session is lost, so it is not quit, but its socket is still closed
+        try:
+            self._conn.close()
+        except OSError:
+            LOG.debug("Failed to close lost SMTP session", exc_info=True)
+        self._conn = None
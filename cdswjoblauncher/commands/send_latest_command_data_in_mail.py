@@ -1,15 +1,22 @@
 import logging
-import os
+import zipfile
+from email import encoders
+from email.message import Message
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
 from enum import Enum
 from smtplib import SMTPAuthenticationError
 from typing import List
 
-from pythoncommons.email import EmailService, EmailMimeType, EmailAccount, EmailConfig
+from pythoncommons.email import EmailMimeType, EmailAccount, EmailConfig
 from pythoncommons.file_utils import FileUtils
 from pythoncommons.os_utils import OsUtils
-from pythoncommons.zip_utils import ZipFileUtils
+
+from cdswjoblauncher.commands.mail_transport import MailTransport
 
 LOG = logging.getLogger(__name__)
+DEFAULT_MAX_EMAIL_BODY_SIZE = 10 * 1024 * 1024
 
 
 class SummaryFile(Enum):
@@ -34,6 +41,7 @@ class FullEmailConfig:
                  attachment_file: str = None,
                  attachment_filename: str = None,
                  allow_empty_subject=False,
+                 smtp_ssl: bool = True,
                  ):
         """
 
@@ -47,6 +55,7 @@ class FullEmailConfig:
         :param attachment_file:
         :param attachment_filename: Override attachment filename
         :param allow_empty_subject:
+        :param smtp_ssl: Connect to the SMTP server with SSL
         """
         mandatory_attrs = [
             ("account_user", "Email account user"),
@@ -76,6 +85,7 @@ class FullEmailConfig:
         self.attachment_filename = attachment_filename
         self.email_account: EmailAccount = EmailAccount(account_user, account_password)
         self.email_conf: EmailConfig = EmailConfig(smtp_server, smtp_port, self.email_account)
+        self.smtp_ssl: bool = smtp_ssl
         self.sender: str = sender
         self.recipients = recipients
         self.subject = subject
@@ -97,75 +107,131 @@ class SendLatestCommandDataInEmailConfig:
                  email_conf: FullEmailConfig,
                  send_attachment=False,
                  email_body_file: str = SummaryFile.HTML.value,
-                 prepend_email_body_with_text: str = None):
+                 prepend_email_body_with_text: str = None,
+                 max_email_body_size: int = DEFAULT_MAX_EMAIL_BODY_SIZE):
         """
         :param send_attachment: Send command data as email attachment
         :param prepend_email_body_with_text: Prepend the specified text to the email's body.
         :param email_body_file: The specified file from the latest command data zip will be added to the email body.
+        :param max_email_body_size: Maximum size of the email body file in bytes.
         """
         self.email: FullEmailConfig = email_conf
         self.email_body_file: str = email_body_file
         self.prepend_email_body_with_text: str = prepend_email_body_with_text
         self.send_attachment: bool = send_attachment
+        self.max_email_body_size: int = max_email_body_size
 
     def __str__(self):
         return (
             f"Email config: {self.email}\n"
             f"Email body file: {self.email_body_file}\n"
+            f"Max email body size: {self.max_email_body_size}\n"
             f"Send attachment: {self.send_attachment}\n"
         )
 
 
+class ZipMemberReader:
+    """
+    Reads a single member of a zip file into memory, without extracting the zip file.
+    """
+
+    @staticmethod
+    def read(zip_file: str, member: str, max_size: int) -> bytes:
+        FileUtils.ensure_file_exists(zip_file)
+        with zipfile.ZipFile(zip_file) as archive:
+            if member in archive.namelist():
+                return ZipMemberReader._read_member(archive, member, max_size)
+        raise ValueError("File '{}' not found in zip file: {}".format(member, zip_file))
+
+    @staticmethod
+    def _read_member(archive: zipfile.ZipFile, member: str, max_size: int) -> bytes:
+        info = archive.getinfo(member)
+        if info.file_size > max_size:
+            raise ValueError(
+                "File '{}' of zip file {} is too large. Size: {}, max size: {}".format(
+                    member, archive.filename, info.file_size, max_size
+                )
+            )
+        # Reading is limited by the max size as well, the size recorded in the zip file could be wrong
+        with archive.open(info) as f:
+            content = f.read(max_size + 1)
+        if len(content) > max_size:
+            raise ValueError(
+                "File '{}' of zip file {} is larger than the max size: {}".format(member, archive.filename, max_size)
+            )
+        return content
+
+
 class SendLatestCommandDataInEmail:
-    def __init__(self, config):
+    def __init__(self, config, transport: MailTransport = None):
         self.config = config
+        # If not specified, a new SMTP session is used for sending this email only
+        self.transport = transport
 
     def run(self):
         LOG.info(f"Starting sending latest command data in email.\n Config: {str(self.config)}")
-
-        zip_extract_dest = FileUtils.join_path(os.sep, "tmp", "extracted_zip")
-        ZipFileUtils.extract_zip_file(self.config.email.attachment_file, zip_extract_dest)
+        if not self.config.email.recipients:
+            LOG.error("Cannot send email as recipient email addresses are not set!")
+            return
 
         # Pick file from zip that will be the email's body
-        email_body_file = FileUtils.join_path(os.sep, zip_extract_dest, self.config.email_body_file)
-        FileUtils.ensure_file_exists(email_body_file)
-        email_body_contents: str = FileUtils.read_file(email_body_file)
+        email_body_file = self.config.email_body_file
+        email_body_contents: str = ZipMemberReader.read(
+            self.config.email.attachment_file, email_body_file, self.config.max_email_body_size
+        ).decode("utf-8")
 
         if self.config.prepend_email_body_with_text:
             LOG.debug("Prepending email body with: %s", self.config.prepend_email_body_with_text)
             email_body_contents = self.config.prepend_email_body_with_text + email_body_contents
 
         body_mimetype: EmailMimeType = self._determine_body_mimetype_by_attachment(email_body_file)
-        email_service = EmailService(self.config.email.email_conf)
-        kwargs = {
-            "body_mimetype": body_mimetype,
-        }
-
-        if self.config.send_attachment:
-            kwargs["attachment_file"] = self.config.email.attachment_file
-            kwargs["override_attachment_filename"] = self.config.email.attachment_filename
-
+        message = self._create_message(email_body_contents, body_mimetype)
         try:
-            email_service.send_mail(
-                self.config.email.sender,
-                self.config.email.subject,
-                email_body_contents,
-                self.config.email.recipients,
-                **kwargs,
-            )
-        except SMTPAuthenticationError as smtpe:
-            ignore_smtp_auth_env: str = OsUtils.get_env_value(EnvVar.IGNORE_SMTP_AUTH_ERROR.value, "")
-            LOG.info(f"Recognized env var '{EnvVar.IGNORE_SMTP_AUTH_ERROR.value}': {ignore_smtp_auth_env}")
-            if not ignore_smtp_auth_env:
-                raise smtpe
+            if self.transport:
+                self.transport.send(self.config.email.sender, self.config.email.recipients, message)
             else:
-                # Swallow exception
-                LOG.exception(
-                    f"SMTP auth error occurred but env var " f"'{EnvVar.IGNORE_SMTP_AUTH_ERROR.value}' was set",
-                    exc_info=True,
-                )
+                with MailTransport(self.config.email.email_conf, use_ssl=self.config.email.smtp_ssl) as transport:
+                    transport.send(self.config.email.sender, self.config.email.recipients, message)
+        except SMTPAuthenticationError as smtpe:
+            self.handle_smtp_auth_error(smtpe)
         LOG.info("Finished sending email to recipients")
 
+    @staticmethod
+    def handle_smtp_auth_error(smtpe: SMTPAuthenticationError):
+        ignore_smtp_auth_env: str = OsUtils.get_env_value(EnvVar.IGNORE_SMTP_AUTH_ERROR.value, "")
+        LOG.info(f"Recognized env var '{EnvVar.IGNORE_SMTP_AUTH_ERROR.value}': {ignore_smtp_auth_env}")
+        if not ignore_smtp_auth_env:
+            raise smtpe
+        else:
+            # Swallow exception
+            LOG.exception(
+                f"SMTP auth error occurred but env var " f"'{EnvVar.IGNORE_SMTP_AUTH_ERROR.value}' was set",
+                exc_info=True,
+            )
+
+    def _create_message(self, body: str, body_mimetype: EmailMimeType) -> Message:
+        mime_text = MIMEText(str(body), body_mimetype.value)
+        if self.config.send_attachment:
+            attachment_file = self.config.email.attachment_file
+            message = MIMEMultipart()
+            message.attach(mime_text)
+            attachment = MIMEBase("application", "zip")
+            with open(attachment_file, "rb") as f:
+                attachment.set_payload(f.read())
+            encoders.encode_base64(attachment)
+            attachment_name = self.config.email.attachment_filename or FileUtils.basename(attachment_file)
+            if not attachment_name.endswith(".zip"):
+                attachment_name += ".zip"
+            attachment.add_header("Content-Disposition", "attachment", filename=attachment_name)
+            message.attach(attachment)
+        else:
+            message = mime_text
+        message["From"] = self.config.email.sender
+        message["To"] = ", ".join(self.config.email.recipients)
+        message["Subject"] = self.config.email.subject
+        message.preamble = "I am not using a MIME-aware mail reader.\n"
+        return message
+
     @staticmethod
     def _determine_body_mimetype_by_attachment(email_body_file: str) -> EmailMimeType:
         if email_body_file.endswith(".html"):
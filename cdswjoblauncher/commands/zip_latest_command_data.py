@@ -1,28 +1,50 @@
 import logging
+import os
+from enum import Enum
 from typing import List
 
 from pythoncommons.file_utils import FileUtils
-from pythoncommons.zip_utils import ZipFileUtils
 
 from cdswjoblauncher.commands.cmd_type import LATEST_DATA_ZIP_LINK_NAME
+from cdswjoblauncher.commands.zip_manifest import (
+    ZipManifest,
+    ArchiveManifest,
+    FileFingerprinter,
+    FINGERPRINT_HASH_ALGORITHM,
+)
+from cdswjoblauncher.commands.zip_writer import StreamingZipWriter, ZipWriteResult
 
 LOG = logging.getLogger(__name__)
 
 
+class ArchiveMode(Enum):
+    FULL = "full"
+    REUSE = "reuse"
+
+
 class CommandDataZipperConfig:
-    def __init__(self,
-                 dest_dir,
-                 ignore_filetypes: List[str],
-                 input_files: List[str],
-                 project_basedir,
-                 cmd_type_real_name: str,
-                 dest_filename: str = None):
+    def __init__(
+        self,
+        dest_dir,
+        ignore_filetypes: List[str],
+        input_files: List[str],
+        project_basedir,
+        cmd_type_real_name: str,
+        dest_filename: str = None,
+        digest_algorithm: str = None,
+        incremental: bool = False,
+    ):
         self.cmd_type_real_name = cmd_type_real_name
         self.input_files = input_files
         self.output_dir = dest_dir
         self.project_out_root = project_basedir
         self.ignore_filetypes = ignore_filetypes
         self.dest_filename = self._get_dest_filename(dest_filename, cmd_type_real_name)
+        # Digest of the zip file is computed while writing it, e.g. 'sha256'
+        self.digest_algorithm = digest_algorithm
+        # Incremental mode: The previous archive is reused if no files changed since it was written.
+        # Otherwise a new full archive is written, as the archive is uploaded and sent as the command output.
+        self.incremental = incremental
 
     @staticmethod
     def _get_dest_filename(dest_filename, cmd_type_real_name: str):
@@ -37,6 +59,8 @@ class CommandDataZipperConfig:
 class ZipLatestCommandData:
     def __init__(self, config: CommandDataZipperConfig):
         self.config = config
+        self.result: ZipWriteResult = None
+        self.archive_mode: ArchiveMode = None
 
     @property
     def cmd_type(self):
@@ -49,9 +73,7 @@ class ZipLatestCommandData:
         for fname in input_files:
             if "*" in fname:
                 fname = fname.replace("*", ".*")
-                found_files = FileUtils.find_files(
-                    basedir, regex=fname, single_level=True, full_path_result=True
-                )
+                found_files = FileUtils.find_files(basedir, regex=fname, single_level=True, full_path_result=True)
                 LOG.info("Found files for pattern '%s': %s", fname, found_files)
                 resolved_files.extend(found_files)
             else:
@@ -69,6 +91,16 @@ class ZipLatestCommandData:
         LOG.info(f"Listing resolved input files. Command: {self.cmd_type}, Files: {resolved_files}")
         return resolved_files
 
+    def snapshot_input_files(self, basedir: str):
+        """
+        Resolves the input files from the specified basedir to their real paths, following the latest-* links.
+        This way, the files to zip are pinned even if the links are pointed elsewhere before the zipper runs.
+        :param basedir: The dir to resolve the input files from
+        """
+        resolved_files = self._check_input_files(self.config.input_files, basedir)
+        self.config.input_files = [os.path.realpath(f) for f in resolved_files]
+        LOG.info(f"Snapshot of input files. Command: {self.cmd_type}, Files: {self.config.input_files}")
+
     def run(self):
         LOG.info(
             "Starting zipping latest command data... \n "
@@ -80,9 +112,14 @@ class ZipLatestCommandData:
         )
         self.config.input_files = self._check_input_files(self.config.input_files, self.config.project_out_root)
 
-        zip_file_name, temp_dir_dest = ZipFileUtils.create_zip_file_advanced(
-            self.config.input_files, self.config.dest_filename, self.config.ignore_filetypes, self.config.output_dir
-        )
+        dest_file = self._determine_dest_file()
+        if self.config.incremental:
+            self.result = self._write_incremental(dest_file)
+        else:
+            writer = StreamingZipWriter(self.config.ignore_filetypes, digest_algorithm=self.config.digest_algorithm)
+            self.result = writer.write(self.config.input_files, dest_file)
+            self.archive_mode = ArchiveMode.FULL
+        zip_file_name = self.result.file
         FileUtils.create_symlink_path_dir(LATEST_DATA_ZIP_LINK_NAME, zip_file_name, self.config.project_out_root)
 
         # Create the latest link for the command as well
@@ -91,9 +128,48 @@ class ZipLatestCommandData:
             f"{LATEST_DATA_ZIP_LINK_NAME}-{self.cmd_type}", zip_file_name, self.config.project_out_root
         )
 
-        # Save command data file per command to home dir when temp dir mode is being used
-        if temp_dir_dest:
-            # TODO cdsw-separation This is copied from CommandType.command_data_name --> Better way to specify?
-            zip_file_name_real: str = f"latest-command-data-{self.cmd_type}-real.zip"
-            target_file_path = FileUtils.join_path(self.config.project_out_root, FileUtils.basename(zip_file_name_real))
-            FileUtils.copy_file(zip_file_name, target_file_path)
+    def _determine_dest_file(self):
+        temp_dir_dest: bool = not self.config.output_dir or self.config.output_dir.startswith("/tmp")
+        if not temp_dir_dest:
+            return FileUtils.join_path(self.config.output_dir, self.config.dest_filename)
+        # Command data file per command is saved to the project dir when temp dir mode is being used.
+        # The zip file is written there directly instead of writing it to the temp dir and copying it.
+        # TODO cdsw-separation This is copied from CommandType.command_data_name --> Better way to specify?
+        zip_file_name_real: str = f"latest-command-data-{self.cmd_type}-real.zip"
+        return FileUtils.join_path(self.config.project_out_root, zip_file_name_real)
+
+    def _write_incremental(self, dest_file: str) -> ZipWriteResult:
+        # Digest of the archive is recorded to the manifest, so it is always computed in incremental mode
+        writer = StreamingZipWriter(
+            self.config.ignore_filetypes, digest_algorithm=self.config.digest_algorithm or FINGERPRINT_HASH_ALGORITHM
+        )
+        manifest_file = ZipManifest.get_manifest_file(dest_file)
+        manifest = ZipManifest.load(manifest_file)
+        if manifest and not manifest.latest.exists():
+            LOG.info("Archive of zip manifest does not exist: %s", manifest.latest.archive)
+            manifest = None
+
+        fingerprinter = FileFingerprinter([manifest.latest.files] if manifest else [])
+        fingerprints = fingerprinter.fingerprint_all(writer.list_files(self.config.input_files))
+        LOG.info("Fingerprinted %d files, hashed %d files", len(fingerprints), fingerprinter.hashed_files)
+
+        if manifest and manifest.latest.has_same_files(fingerprints):
+            latest = manifest.latest
+            LOG.info("Files did not change since the previous archive, reusing it: %s", latest.archive)
+            result = ZipWriteResult(
+                file=latest.archive,
+                number_of_files=len(fingerprints),
+                number_of_ignored_files=0,
+                size=os.path.getsize(latest.archive),
+                digest_algorithm=writer.digest_algorithm,
+                digest=latest.digest,
+            )
+            manifest.latest = ArchiveManifest(latest.archive, latest.digest, fingerprints)
+            self.archive_mode = ArchiveMode.REUSE
+        else:
+            result = writer.write(self.config.input_files, dest_file)
+            manifest = ZipManifest(latest=ArchiveManifest(result.file, result.digest, fingerprints))
+            self.archive_mode = ArchiveMode.FULL
+        manifest.save(manifest_file)
+        LOG.info("Archive mode: %s, zip file: %s", self.archive_mode.value, result.file)
+        return result
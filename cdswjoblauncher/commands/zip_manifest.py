@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Tuple, Optional
+
+LOG = logging.getLogger(__name__)
+MANIFEST_FORMAT_VERSION = 2
+FINGERPRINT_HASH_ALGORITHM = "sha256"
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FileFingerprint:
+    path: str
+    size: int
+    mtime_ns: int
+    hash: str
+
+    def has_same_stat(self, stat_result: os.stat_result):
+        return self.size == stat_result.st_size and self.mtime_ns == stat_result.st_mtime_ns
+
+
+@dataclass
+class ArchiveManifest:
+    archive: str
+    digest: str
+    # Fingerprints of the files of the archive, keyed by their path in the zip file
+    files: Dict[str, FileFingerprint] = field(default_factory=dict)
+
+    def exists(self):
+        return os.path.exists(self.archive)
+
+    def has_same_files(self, fingerprints: Dict[str, FileFingerprint]):
+        return _get_hashes(self.files) == _get_hashes(fingerprints)
+
+
+@dataclass
+class ZipManifest:
+    # The last archive that was created or reused
+    latest: ArchiveManifest
+    format_version: int = MANIFEST_FORMAT_VERSION
+
+    @staticmethod
+    def get_manifest_file(zip_file: str):
+        return f"{zip_file}.manifest.json"
+
+    @staticmethod
+    def load(manifest_file: str) -> Optional["ZipManifest"]:
+        if not os.path.exists(manifest_file):
+            return None
+        try:
+            with open(manifest_file) as f:
+                data = json.load(f)
+            if data.get("format_version") != MANIFEST_FORMAT_VERSION:
+                LOG.info("Ignoring zip manifest with different format version: %s", manifest_file)
+                return None
+            return ZipManifest(latest=ZipManifest._load_archive_manifest(data["latest"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            LOG.warning("Failed to load zip manifest: %s", manifest_file, exc_info=True)
+            return None
+
+    def save(self, manifest_file: str):
+        tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+        os.replace(tmp_file, manifest_file)
+
+    @staticmethod
+    def _load_archive_manifest(data: Dict) -> ArchiveManifest:
+        files = {path_in_zip: FileFingerprint(**fp) for path_in_zip, fp in data["files"].items()}
+        return ArchiveManifest(archive=data["archive"], digest=data["digest"], files=files)
+
+
+class FileFingerprinter:
+    """
+    Creates fingerprints of files.
+    Files are only hashed if their size or modification time differs from the known fingerprint of the same path.
+    """
+
+    def __init__(self, known_fingerprints: List[Dict[str, FileFingerprint]] = None):
+        self._known: Dict[str, FileFingerprint] = {}
+        for fingerprints in known_fingerprints or []:
+            for fp in fingerprints.values():
+                self._known[fp.path] = fp
+        self.hashed_files = 0
+
+    def fingerprint_all(self, files: List[Tuple[str, str]]) -> Dict[str, FileFingerprint]:
+        return {path_in_zip: self.fingerprint(path) for path, path_in_zip in files}
+
+    def fingerprint(self, path: str) -> FileFingerprint:
+        stat_result = os.stat(path)
+        known = self._known.get(path)
+        if known and known.has_same_stat(stat_result):
+            return known
+        self.hashed_files += 1
+        return FileFingerprint(path, stat_result.st_size, stat_result.st_mtime_ns, self._hash_file(path))
+
+    @staticmethod
+    def _hash_file(path: str):
+        digest = hashlib.new(FINGERPRINT_HASH_ALGORITHM)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+def _get_hashes(fingerprints: Dict[str, FileFingerprint]):
+    return {path_in_zip: fp.hash for path_in_zip, fp in fingerprints.items()}
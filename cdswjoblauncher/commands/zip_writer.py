@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+import zipfile
+from dataclasses import dataclass
+from typing import List, Iterable, Tuple
+from zlib import Z_DEFAULT_COMPRESSION
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass
+class ZipWriteResult:
+    file: str
+    number_of_files: int
+    number_of_ignored_files: int
+    size: int
+    digest_algorithm: str = None
+    digest: str = None
+
+
+class _DigestingWriter:
+    """
+    Forward-only file object that updates a digest with every byte written.
+    As it does not support seeking, ZipFile writes the entries in a single pass with data descriptors
+    instead of seeking back to the local headers, so the digest covers the final content of the archive.
+    """
+
+    def __init__(self, fp, digest=None):
+        self._fp = fp
+        self._digest = digest
+        self._pos = 0
+
+    def write(self, data):
+        self._fp.write(data)
+        if self._digest:
+            self._digest.update(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        self._fp.flush()
+
+
+class StreamingZipWriter:
+    """
+    Writes the input files and directories to a zip file with a single pass over the files.
+    Directories are walked and filtered by the ignored file types while they are written, so no staging copy is made.
+    The archive is written to a temporary file next to the destination that is atomically renamed once it is complete.
+    """
+
+    def __init__(self, ignore_filetypes: List[str] = None, digest_algorithm: str = None, compress: bool = True):
+        self.ignore_extensions = [self._normalize_extension(ext) for ext in (ignore_filetypes or [])]
+        if digest_algorithm and digest_algorithm not in hashlib.algorithms_available:
+            raise ValueError(
+                "Unknown digest algorithm: {}. Available algorithms: {}".format(
+                    digest_algorithm, sorted(hashlib.algorithms_available)
+                )
+            )
+        self.digest_algorithm = digest_algorithm
+        self.compress = compress
+
+    def write(self, input_files: List[str], dest_file: str) -> ZipWriteResult:
+        """
+        Writes the input files to the destination zip file.
+        :param input_files: Files and directories to add to the zip file
+        :param dest_file: The zip file to write
+        :return: The result of writing the zip file
+        """
+        tmp_file = f"{dest_file}.{os.getpid()}.tmp"
+        digest = hashlib.new(self.digest_algorithm) if self.digest_algorithm else None
+        LOG.info("Creating zip file. Target file: %s, Input files: %s", dest_file, input_files)
+        number_of_files = 0
+        number_of_ignored_files = 0
+        try:
+            with open(tmp_file, "wb") as f:
+                writer = _DigestingWriter(f, digest)
+                with zipfile.ZipFile(writer, "w", **self._get_zip_kwargs()) as zip_file:
+                    for path, path_in_zip, ignored in self.iterate_input_files(input_files):
+                        if ignored:
+                            LOG.debug("Ignoring file while zipping: %s", path)
+                            number_of_ignored_files += 1
+                            continue
+                        LOG.debug("Adding file '%s' to zip file '%s' as '%s'", path, dest_file, path_in_zip)
+                        zip_file.write(path, path_in_zip)
+                        number_of_files += 1
+                size = writer.tell()
+            os.replace(tmp_file, dest_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+        result = ZipWriteResult(
+            file=dest_file,
+            number_of_files=number_of_files,
+            number_of_ignored_files=number_of_ignored_files,
+            size=size,
+            digest_algorithm=self.digest_algorithm,
+            digest=digest.hexdigest() if digest else None,
+        )
+        LOG.info("Finished writing zip file: %s", result)
+        return result
+
+    def list_files(self, input_files: List[str]) -> List[Tuple[str, str]]:
+        """
+        :return: The path and the path in the zip file of all files that would be written to the zip file
+        """
+        return [
+            (path, path_in_zip) for path, path_in_zip, ignored in self.iterate_input_files(input_files) if not ignored
+        ]
+
+    def iterate_input_files(self, input_files: List[str]) -> Iterable[Tuple[str, str, bool]]:
+        for input_file in input_files:
+            if not os.path.exists(input_file):
+                LOG.warning("Src file does not exist: %s", input_file)
+                continue
+            if os.path.isdir(input_file):
+                # Paths in the zip file are relative to the input dir
+                for dirpath, dirnames, filenames in os.walk(input_file):
+                    dirnames.sort()
+                    for filename in sorted(filenames):
+                        path = os.path.join(dirpath, filename)
+                        path_in_zip = os.path.relpath(path, input_file)
+                        yield path, path_in_zip, self._is_ignored(filename)
+            else:
+                # Explicitly specified files are never ignored
+                yield input_file, os.path.basename(input_file), False
+
+    def _is_ignored(self, filename: str):
+        return any(filename.endswith("." + ext) for ext in self.ignore_extensions)
+
+    def _get_zip_kwargs(self):
+        if not self.compress:
+            return {}
+        return {"compression": zipfile.ZIP_DEFLATED, "compresslevel": Z_DEFAULT_COMPRESSION}
+
+    @staticmethod
+    def _normalize_extension(ext: str):
+        if ext.startswith(".") or ext.startswith("*."):
+            return ext.split(".")[-1]
+        return ext
@@ -9,6 +9,12 @@ from dataclasses_json import dataclass_json, LetterCase
 @dataclass
 class Config:
     cdsw_home_dir: str = None
+    # Local wheel cache used by initial-setup, a default directory is used if not specified
+    wheelhouse_dir: str = None
+    # Directory of site-packages snapshots used by initial-setup, a default directory is used if not specified
+    snapshots_dir: str = None
+    # Restore site-packages snapshots with hardlinks instead of copying the files
+    snapshot_hardlinks: bool = False
 
     @classmethod
     def from_file(cls, path: str) -> 'Config':
@@ -2,7 +2,14 @@ from cdswjoblauncher.cdsw.cdsw_common import PythonModuleMode
 from cdswjoblauncher.contract import CdswApp, CdswSetupInput
 from cdswjoblauncher.core.context import CdswLauncherContext
 from cdswjoblauncher.core.error import CdswLauncherException
-from cdswjoblauncher.core.module import ModuleUtils, ClassResolver
+from cdswjoblauncher.core.module import ClassResolver
+from cdswjoblauncher.core.provisioning import (
+    Wheelhouse,
+    SitePackagesSnapshots,
+    PackageProvisioner,
+    DEFAULT_WHEELHOUSE_DIR,
+    DEFAULT_SNAPSHOTS_DIR,
+)
 
 
 class MainCommandHandler:
@@ -14,10 +21,23 @@ class MainCommandHandler:
         if not self.ctx:
             raise CdswLauncherException("No context is received")
 
-    def initial_setup(self, package_name, execution_mode: str, module_mode: PythonModuleMode,
-                      force_reinstall: bool):
+    def initial_setup(
+        self,
+        package_name,
+        execution_mode: str,
+        module_mode: PythonModuleMode,
+        force_reinstall: bool,
+        offline: bool = False,
+        use_snapshot: bool = False,
+    ):
         module_name = package_name.replace("-", "")
-        ModuleUtils.import_or_install(module_name, package_name, force_reinstall)
+        config = self.ctx.config
+        wheelhouse = Wheelhouse(config.wheelhouse_dir or DEFAULT_WHEELHOUSE_DIR)
+        snapshots = SitePackagesSnapshots(
+            config.snapshots_dir or DEFAULT_SNAPSHOTS_DIR, use_hardlinks=config.snapshot_hardlinks
+        )
+        provisioner = PackageProvisioner(wheelhouse, snapshots, module_mode)
+        provisioner.provision(module_name, package_name, force_reinstall, offline=offline, use_snapshot=use_snapshot)
         resolver = ClassResolver(module_name, CdswApp)
         app_type = resolver.resolve()
         app: CdswApp = app_type()
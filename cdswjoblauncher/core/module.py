@@ -1,30 +1,15 @@
 import importlib
-import pkgutil
+import logging
 from inspect import isclass
 from typing import List, Iterable, Type
 
-import pip
-import logging
-
+from cdswjoblauncher.cdsw.module_index import ModuleIndexCache
 from cdswjoblauncher.contract import CdswApp
 from cdswjoblauncher.core.error import CdswLauncherException
 
 LOG = logging.getLogger(__name__)
 
 
-class ModuleUtils:
-    @staticmethod
-    def import_or_install(module: str, package: str, force_reinstall: bool):
-        if force_reinstall:
-            pip.main(['install', package, "--force-reinstall"])
-            return
-        try:
-            __import__(module)
-        except ImportError:
-            pip.main(['install', package])
-
-
-
 class ClassResolverContext:
     def __init__(self, module_name: str, cls: Type):
         self.module_name = module_name
@@ -43,62 +28,56 @@ class ClassResolverContext:
         if not self._found.keys():
             raise ValueError(f"{cname} not found in module: {self.module_name}. Traversed modules: {self._traversed_modules}")
         if len(self._found.keys()) > 1:
-            raise ValueError(f"Multiple {cname}s found: {self._found} in module: {self.module_name}.")
+            raise ValueError(f"Multiple {cname}s found: {self._get_found_names()} in module: {self.module_name}.")
 
         mod_key = list(self._found.keys())[0]
         apps = self._found[mod_key]
         if len(apps) != 1:
-            raise ValueError(f"Multiple {cname}s found in module: {mod_key}")
+            raise ValueError(f"Multiple {cname}s found in module: {mod_key}: {self._get_found_names()}")
 
         return apps[0]
 
+    def _get_found_names(self):
+        return [f"{module_path}.{app.__name__}" for module_path, apps in self._found.items() for app in apps]
+
     def process_module(self, mname):
         LOG.debug("Processing module: %s", mname)
         self._traversed_modules.append(mname)
 
 
 class ClassResolver:
-    def __init__(self, module_name, cls: Type):
+    def __init__(self, module_name, cls: Type, index_cache: ModuleIndexCache = None):
         self.module_name = module_name
         self.cls = cls
+        self.index_cache = index_cache or ModuleIndexCache.create_default()
 
     def resolve(self):
         ctx = ClassResolverContext(self.module_name, self.cls)
-        main_module = importlib.import_module(self.module_name)
+        # The modules are only imported to check that they exist, the app classes are found via the module index
+        importlib.import_module(self.module_name)
         try:
             cdsw_module_path = f"{self.module_name}.cdsw"
-            cdsw_module = importlib.import_module(cdsw_module_path)
+            importlib.import_module(cdsw_module_path)
         except ModuleNotFoundError as e:
             raise CdswLauncherException(f"Cannot find cdsw module in module: {self.module_name}") from e
 
-        ClassResolver._traverse_modules(ctx, cdsw_module_path, cdsw_module, ClassResolver._mod_callback)
-        app_type = ctx.check_result()
-        return app_type
-
-    @staticmethod
-    def _mod_callback(ctx: ClassResolverContext, module_path: str, module):
-        ctx.process_module(module.__name__)
-
-        apps: List[CdswApp] = []
-        for attribute_name in dir(module):
-            attribute = getattr(module, attribute_name)
-            if isclass(attribute) and issubclass(attribute, ctx.cls):
+        index = self.index_cache.get(cdsw_module_path)
+        for module_path in index.modules.keys():
+            ctx.process_module(module_path)
+        for module_path, classes in index.find_subclasses(ctx.cls).items():
+            apps: List[CdswApp] = []
+            module = importlib.import_module(module_path)
+            for attribute_name, _ in classes:
+                attribute = getattr(module, attribute_name, None)
+                # Static discovery only finds candidates by the names of the base classes
+                if not isclass(attribute) or not issubclass(attribute, ctx.cls):
+                    continue
                 if "cdswjoblauncher" in attribute.__module__:
                     LOG.warning("Ignoring attribute: %s", attribute)
                 else:
                     apps.append(attribute)
+            if apps:
+                ctx.add_result(module_path, apps)
 
-        if apps:
-            ctx.add_result(module_path, apps)
-
-    @staticmethod
-    def _traverse_modules(ctx, module_path, curr_module, callback):
-        callback(ctx, module_path, curr_module)
-        # https://docs.python.org/3/reference/import.html#:~:text=By%20definition%2C%20if%20a%20module,search%20for%20modules%20during%20import.
-        is_package = hasattr(curr_module, "__path__")
-        if is_package:
-            for mod_info in pkgutil.iter_modules(curr_module.__path__):
-                new_module_path = f"{module_path}.{mod_info.name}"
-                # LOG.debug("Loading module from path: %s", new_module_path)
-                new_module = importlib.import_module(new_module_path)
-                ClassResolver._traverse_modules(ctx, new_module_path, new_module, callback)
+        app_type = ctx.check_result()
+        return app_type
@@ -0,0 +1,252 @@
+import glob
+import hashlib
+import importlib
+import json
+import logging
+import os
+import platform
+import shutil
+import site
+import sys
+from datetime import datetime
+from fnmatch import fnmatch
+from os.path import expanduser
+from typing import List
+
+import pip
+from pythoncommons.file_utils import FileUtils
+
+from cdswjoblauncher.cdsw.cdsw_common import PythonModuleMode
+from cdswjoblauncher.cdsw.constants import PROJECT_NAME
+from cdswjoblauncher.core.error import CdswLauncherException
+
+LOG = logging.getLogger(__name__)
+DEFAULT_WHEELHOUSE_DIR = FileUtils.join_path(expanduser("~"), ".cache", PROJECT_NAME, "wheelhouse")
+DEFAULT_SNAPSHOTS_DIR = FileUtils.join_path(expanduser("~"), ".cache", PROJECT_NAME, "site-packages-snapshots")
+SNAPSHOT_METADATA_FILE = "snapshot.json"
+SNAPSHOT_FILES_DIR = "files"
+
+
+def get_site_packages_dir(module_mode: PythonModuleMode):
+    if module_mode == PythonModuleMode.GLOBAL:
+        return site.getsitepackages()[0]
+    return site.USER_SITE
+
+
+class Wheelhouse:
+    """
+    Local directory of wheels of a package and all of its dependencies.
+    Packages are installed from the wheelhouse only, so an installation does not need the network
+    once the wheelhouse is populated.
+    """
+
+    def __init__(self, wheel_dir: str = DEFAULT_WHEELHOUSE_DIR):
+        self.wheel_dir = wheel_dir
+
+    def populate(self, package: str):
+        """
+        Builds or downloads the wheels of the package and its dependencies to the wheelhouse.
+        Wheels that are already in the wheelhouse are reused.
+        """
+        FileUtils.ensure_dir_created(self.wheel_dir)
+        LOG.info("Populating wheelhouse %s with package: %s", self.wheel_dir, package)
+        self._run_pip(["wheel", "--wheel-dir", self.wheel_dir, "--find-links", self.wheel_dir, package])
+
+    def install(self, package: str, force_reinstall: bool = False):
+        if not self.has_wheel(package):
+            raise CdswLauncherException(
+                f"No wheel found for package '{package}' in wheelhouse: {self.wheel_dir}. "
+                "Populate the wheelhouse while online first."
+            )
+        LOG.info("Installing package '%s' from wheelhouse: %s", package, self.wheel_dir)
+        args = ["install", "--no-index", "--find-links", self.wheel_dir, package]
+        if force_reinstall:
+            args.append("--force-reinstall")
+        self._run_pip(args)
+
+    def has_wheel(self, package: str):
+        return len(self.get_wheels(package)) > 0
+
+    def get_wheels(self, package: str = None) -> List[str]:
+        # Wheel file names use underscores in the distribution name: {distribution}-{version}(-{build})?-{tags}.whl
+        pattern = f"{Wheelhouse._normalize(package)}-*.whl" if package else "*.whl"
+        wheels = glob.glob(os.path.join(self.wheel_dir, "*.whl"))
+        return sorted(f for f in wheels if fnmatch(Wheelhouse._normalize_file(f), pattern))
+
+    def get_fingerprint(self) -> str:
+        """
+        :return: Digest of the name, size and modification time of all wheels of the wheelhouse.
+        The wheel file names contain the version of the distributions, so the fingerprint changes
+        whenever a wheel is added or replaced.
+        """
+        digest = hashlib.sha256()
+        for wheel in self.get_wheels():
+            stat_result = os.stat(wheel)
+            wheel_id = f"{os.path.basename(wheel)}\0{stat_result.st_size}\0{stat_result.st_mtime_ns}\n"
+            digest.update(wheel_id.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _normalize(name: str):
+        return name.lower().replace("-", "_").replace(".", "_")
+
+    @staticmethod
+    def _normalize_file(file: str):
+        distribution, rest = os.path.basename(file).split("-", 1)
+        return f"{Wheelhouse._normalize(distribution)}-{rest}"
+
+    @staticmethod
+    def _run_pip(args: List[str]):
+        LOG.debug("Running pip with arguments: %s", args)
+        exit_code = pip.main(args)
+        if exit_code != 0:
+            raise CdswLauncherException(f"pip failed with exit code {exit_code}. Arguments: {args}")
+
+
+class SitePackagesSnapshots:
+    """
+    Snapshots of fully resolved site-packages directories, keyed by the package, the Python interpreter
+    and the wheels of the wheelhouse the package was installed from.
+    Restoring a snapshot copies the files of the snapshot to the site-packages directory.
+    Files of the site-packages directory that are not part of the snapshot are kept.
+    With hardlinks, restoring is much faster, but a file of the site-packages directory that is modified in place
+    (instead of being replaced, like pip does) also modifies the snapshot.
+    """
+
+    def __init__(self, snapshots_dir: str = DEFAULT_SNAPSHOTS_DIR, use_hardlinks: bool = False):
+        self.snapshots_dir = snapshots_dir
+        self.use_hardlinks = use_hardlinks
+
+    @staticmethod
+    def get_key(package: str, module_mode: PythonModuleMode, wheelhouse_fingerprint: str):
+        interpreter = f"{sys.executable} {sys.version} {platform.platform()}"
+        key_input = f"{package}\0{module_mode.value}\0{interpreter}\0{wheelhouse_fingerprint}"
+        digest = hashlib.sha256(key_input.encode("utf-8")).hexdigest()
+        return f"{package}-{digest[:16]}"
+
+    def exists(self, key: str):
+        return os.path.isfile(os.path.join(self.snapshots_dir, key, SNAPSHOT_METADATA_FILE))
+
+    def create(self, key: str, site_dir: str):
+        snapshot_dir = os.path.join(self.snapshots_dir, key)
+        tmp_dir = f"{snapshot_dir}.{os.getpid()}.tmp"
+        LOG.info("Creating snapshot '%s' of site-packages directory: %s", key, site_dir)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        FileUtils.ensure_dir_created(tmp_dir)
+        try:
+            # Files are copied so later installations to the site-packages directory never change the snapshot
+            files_dir = os.path.join(tmp_dir, SNAPSHOT_FILES_DIR)
+            number_of_files = SitePackagesSnapshots._copy_tree(site_dir, files_dir, link=False)
+            metadata = {
+                "key": key,
+                "site_dir": site_dir,
+                "created_at": datetime.now().isoformat(),
+                "python": sys.version,
+                "number_of_files": number_of_files,
+            }
+            with open(os.path.join(tmp_dir, SNAPSHOT_METADATA_FILE), "w") as f:
+                json.dump(metadata, f, indent=2)
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            os.replace(tmp_dir, snapshot_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        LOG.info("Created snapshot '%s' with %d files", key, number_of_files)
+
+    def restore(self, key: str, site_dir: str):
+        if not self.exists(key):
+            raise CdswLauncherException(f"Snapshot '{key}' does not exist in: {self.snapshots_dir}")
+        LOG.info("Restoring snapshot '%s' to site-packages directory: %s", key, site_dir)
+        files_dir = os.path.join(self.snapshots_dir, key, SNAPSHOT_FILES_DIR)
+        number_of_files = self._copy_tree(files_dir, site_dir, link=self.use_hardlinks)
+        importlib.invalidate_caches()
+        LOG.info("Restored %d files of snapshot '%s'", number_of_files, key)
+
+    @staticmethod
+    def _copy_tree(src_dir: str, dest_dir: str, link: bool) -> int:
+        number_of_files = 0
+        for dirpath, dirnames, filenames in os.walk(src_dir):
+            # Bytecode is recreated on import and depends on the location of the source files
+            dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+            target_dir = os.path.join(dest_dir, os.path.relpath(dirpath, src_dir))
+            os.makedirs(target_dir, exist_ok=True)
+            for filename in filenames:
+                src, dest = os.path.join(dirpath, filename), os.path.join(target_dir, filename)
+                SitePackagesSnapshots._copy_file(src, dest, link)
+                number_of_files += 1
+        return number_of_files
+
+    @staticmethod
+    def _copy_file(src: str, dest: str, link: bool):
+        # Existing files are replaced, not modified in place, so a file of a snapshot is never changed via a hardlink
+        # of the site-packages directory
+        tmp_dest = f"{dest}.{os.getpid()}.tmp"
+        try:
+            if not link:
+                shutil.copy2(src, tmp_dest)
+            else:
+                try:
+                    os.link(src, tmp_dest)
+                except OSError:
+                    # e.g. the snapshot and the site-packages directory are on different file systems
+                    shutil.copy2(src, tmp_dest)
+            os.replace(tmp_dest, dest)
+        finally:
+            if os.path.exists(tmp_dest):
+                os.remove(tmp_dest)
+
+
+class PackageProvisioner:
+    """
+    Installs a package with its dependencies from the wheelhouse and optionally restores or creates
+    a snapshot of the site-packages directory.
+    """
+
+    def __init__(self, wheelhouse: Wheelhouse, snapshots: SitePackagesSnapshots, module_mode: PythonModuleMode):
+        self.wheelhouse = wheelhouse
+        self.snapshots = snapshots
+        self.module_mode = module_mode
+
+    def provision(
+        self, module: str, package: str, force_reinstall: bool, offline: bool = False, use_snapshot: bool = False
+    ):
+        site_dir = get_site_packages_dir(self.module_mode)
+        snapshot_key = self._get_snapshot_key(package) if use_snapshot else None
+        if not force_reinstall and self._is_importable(module):
+            LOG.info("Module '%s' is already installed", module)
+            if use_snapshot and not self.snapshots.exists(snapshot_key):
+                self.snapshots.create(snapshot_key, site_dir)
+            return
+
+        if use_snapshot and not force_reinstall and self.snapshots.exists(snapshot_key):
+            self.snapshots.restore(snapshot_key, site_dir)
+            if self._is_importable(module, evict=True):
+                return
+            LOG.warning("Module '%s' cannot be imported after restoring snapshot, installing package", module)
+
+        if not offline:
+            self.wheelhouse.populate(package)
+        self.wheelhouse.install(package, force_reinstall=force_reinstall)
+        importlib.invalidate_caches()
+
+        if use_snapshot:
+            # The wheelhouse could have been populated with new versions since the key was determined
+            self.snapshots.create(self._get_snapshot_key(package), site_dir)
+
+    def _get_snapshot_key(self, package: str):
+        return SitePackagesSnapshots.get_key(package, self.module_mode, self.wheelhouse.get_fingerprint())
+
+    @staticmethod
+    def _is_importable(module: str, evict: bool = False):
+        """
+        :param evict: Remove the module and its submodules from sys.modules first, so they are imported from the
+        site-packages directory again instead of returning the modules that were already imported
+        """
+        if evict:
+            for name in [m for m in sys.modules if m == module or m.startswith(module + ".")]:
+                del sys.modules[name]
+        try:
+            importlib.import_module(module)
+            return True
+        except ImportError:
+            return False
@@ -0,0 +1,27 @@
+from cdswjoblauncher.cdsw.cdsw_common import ReportFile
+
+config = {
+    "job_name": "Reviewsync",
+    "command_type": "reviewsync",
+    "mandatory_env_vars": ["GSHEET_CLIENT_SECRET", "GSHEET_SPREADSHEET", "MAIL_ACC_USER"],
+    "optional_env_vars": ["BRANCHES", "GSHEET_JIRA_COLUMN"],
+    "main_script_arguments": ["--gsheet-client-secret"],
+    "resource_limits": {"cpu_seconds": 3600, "address_space_mb": 4096, "open_files": 1024},
+    "runs": [
+        {
+            "name": "limited",
+            "email_settings": None,
+            "drive_api_upload_settings": None,
+            "variables": {},
+            "main_script_arguments": [],
+            "resource_limits": {"address_space_mb": 2048, "wall_timeout_seconds": 1800},
+        },
+        {
+            "name": "default",
+            "email_settings": None,
+            "drive_api_upload_settings": None,
+            "variables": {},
+            "main_script_arguments": [],
+        },
+    ],
+}
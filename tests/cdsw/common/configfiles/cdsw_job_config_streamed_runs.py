@@ -0,0 +1,33 @@
+from cdswjoblauncher.cdsw.cdsw_common import ReportFile
+
+
+def generate_runs(conf):
+    for name in conf.env_or_default("STREAMED_RUN_NAMES", "run1,run2").split(","):
+        yield {
+            "name": name,
+            "email_settings": {
+                "enabled": False,
+                "send_attachment": True,
+                "email_body_file_from_command_data": ReportFile.SHORT_HTML.value,
+                "attachment_file_name": "attachment_file_name",
+                "subject": lambda conf: f"Subject of {conf.var('algorithm')}",
+                "sender": "testSender",
+            },
+            "drive_api_upload_settings": {"enabled": False, "file_name": "simple"},
+            "variables": {"runName": name},
+            "main_script_arguments": [lambda conf: f"--run {conf.var('runName')}"],
+        }
+
+
+config = {
+    "job_name": "Reviewsync",
+    "command_type": "reviewsync",
+    "mandatory_env_vars": [],
+    "optional_env_vars": [],
+    "main_script_arguments": ["--debug", lambda conf: f"--algorithm {conf.var('algorithm')}"],
+    "global_variables": {
+        "algorithm": "testAlgorithm",
+    },
+    "stream_runs": True,
+    "runs": generate_runs,
+}
@@ -2,7 +2,9 @@ import datetime
 import logging
 import os
 import re
+import tempfile
 import unittest
+from unittest.mock import patch
 from typing import Dict
 
 from dacite import WrongTypeError
@@ -13,7 +15,9 @@ from pythoncommons.os_utils import OsUtils
 from pythoncommons.project_utils import ProjectUtils, ProjectRootDeterminationStrategy
 
 from cdswjoblauncher.cdsw.cdsw_common import CdswSetupResult, CdswSetup
-from cdswjoblauncher.cdsw.cdsw_config import CdswJobConfigReader
+from cdswjoblauncher.cdsw.cdsw_config import CdswJobConfigReader, CdswJobConfig, CdswRun, EmailSettings, \
+    DriveApiUploadSettings, FieldSpec, FieldSpecInstance, FieldSpecNode, ResourceLimits
+from cdswjoblauncher.cdsw.config_cache import CdswJobConfigCache, ConfigSource, get_launcher_version
 from cdswjoblauncher.cdsw.constants import CdswEnvVar, PROJECT_NAME
 from cdswjoblauncher.cdsw.testutils.test_utils import CdswTestingCommons, TEST_MODULE_NAME, TEST_MODULE_MAIN_SCRIPT_NAME
 
@@ -238,6 +242,64 @@ class CdswConfigReaderTest(unittest.TestCase):
         LOG.info(exc_msg)
         self.assertIn("Cannot resolve variable 'varD'", exc_msg)
 
+    def test_config_reader_transitive_variable_resolution_cycle(self):
+        self._set_mandatory_env_vars()
+        file = self._get_config_file("cdsw_job_config_transitive_variable_resolution_cycle.py")
+        with self.assertRaises(ValueError) as ve:
+            CdswJobConfigReader.read_from_file(file, self.valid_env_vars, self.setup_result)
+        exc_msg = ve.exception.args[0]
+        LOG.info(exc_msg)
+        self.assertIn("Cycle detected while resolving variables of 'global_variables': varA -> varB -> varC -> varA", exc_msg)
+
+    def test_config_reader_variables_are_evaluated_once_per_scope(self):
+        evaluations = []
+
+        def counted(name, func):
+            def wrapper(conf):
+                evaluations.append(name)
+                return func(conf)
+
+            return wrapper
+
+        runs = [
+            CdswRun(
+                name=f"run{i}",
+                email_settings=EmailSettings(
+                    enabled=False,
+                    send_attachment=False,
+                    attachment_file_name="attachment",
+                    email_body_file_from_command_data="report-short.html",
+                    subject="subject",
+                    sender="sender",
+                ),
+                drive_api_upload_settings=DriveApiUploadSettings(enabled=False, file_name="file"),
+                main_script_arguments=[lambda conf: f"--arg1 {conf.var('runVar')}", lambda conf: f"--arg2 {conf.var('varA')}"],
+                variables={
+                    "runVar": counted(f"runVar{i}", lambda conf: f"{conf.var('varA')}+{conf.var('runVar2')}"),
+                    "runVar2": counted(f"runVar2_{i}", lambda conf: f"{conf.var('varC')}"),
+                },
+            )
+            for i in range(2)
+        ]
+        config = CdswJobConfig(
+            job_name="job",
+            command_type="reviewsync",
+            runs=runs,
+            main_script_arguments=[lambda conf: f"--global {conf.var('varA')}"],
+            global_variables={
+                "varA": counted("varA", lambda conf: f"{conf.var('varB')}{conf.var('varC')}"),
+                "varB": counted("varB", lambda conf: f"{conf.var('varC')}b"),
+                "varC": counted("varC", lambda conf: "c"),
+            },
+        )
+        CdswJobConfigReader(self.valid_env_vars).process_config(config)
+
+        self.assertEqual(["varA", "varB", "varC", "runVar0", "runVar2_0", "runVar1", "runVar2_1"], evaluations)
+        self.assertEqual({"varA": "cbc", "varB": "cb", "varC": "c"}, config.global_variables)
+        self.assertEqual(["--global cbc"], config.main_script_arguments)
+        self.assertEqual(["--global cbc", "--arg1 cbc+c", "--arg2 cbc"], config.runs[0].main_script_arguments)
+        self.assertEqual(["varC", "varB", "varA"], config.resolver.global_scope.evaluation_order)
+
     def test_config_reader_transitive_variable_resolution_unresolved(self):
         self._set_mandatory_env_vars()
         file = self._get_config_file("cdsw_job_config_transitive_variable_resolution_unresolved.py")
@@ -332,6 +394,22 @@ class CdswConfigReaderTest(unittest.TestCase):
         self.assertEqual("constant1_v1_constant2_v3_constant3", drive_api_upload_settings.file_name)
         self.assertFalse(drive_api_upload_settings.enabled)
 
+    def test_config_reader_resource_limits(self):
+        self._set_mandatory_env_vars()
+        file = self._get_config_file("cdsw_job_config_resource_limits.py")
+        config = CdswJobConfigReader.read_from_file(file, self.valid_env_vars, self.setup_result)
+
+        self.assertEqual(ResourceLimits(cpu_seconds=3600, address_space_mb=4096, open_files=1024), config.resource_limits)
+        self.assertEqual(
+            ResourceLimits(cpu_seconds=3600, address_space_mb=2048, open_files=1024, wall_timeout_seconds=1800),
+            config.resource_limits.merge(config.runs[0].resource_limits),
+        )
+        self.assertIsNone(config.runs[1].resource_limits)
+        self.assertEqual(config.resource_limits, config.resource_limits.merge(config.runs[1].resource_limits))
+        with self.assertRaises(ValueError) as ve:
+            ResourceLimits(open_files=0)
+        self.assertIn("Resource limit 'open_files' must be a positive number!", ve.exception.args[0])
+
     def test_config_reader_runconfig_defined_main_script_arguments_env_vars(self):
         self._set_mandatory_env_vars()
         file = self._get_config_file("cdsw_job_config_runconfig_defined_main_script_arguments_env_vars.py")
@@ -510,6 +588,32 @@ class CdswConfigReaderTest(unittest.TestCase):
         LOG.info(exc_msg)
         self.assertIn("Duplicate job name not allowed!", exc_msg)
 
+    def test_config_reader_streamed_runs(self):
+        file = self._get_config_file("cdsw_job_config_streamed_runs.py")
+        config = CdswJobConfigReader.read_from_file(file, self.valid_env_vars, self.setup_result)
+        self.assertTrue(config.runs_defined_as_callable)
+        runs = list(config.runs)
+        self.assertEqual(["run1", "run2"], [run.name for run in runs])
+        self.assertEqual("Subject of testAlgorithm", runs[0].email_settings.subject)
+        self.assertEqual(["--debug", "--algorithm testAlgorithm", "--run run2"], runs[1].main_script_arguments)
+        with self.assertRaises(ValueError):
+            list(config.runs)
+
+    def test_config_reader_streamed_runs_with_same_name_not_allowed(self):
+        os.environ["STREAMED_RUN_NAMES"] = "run1,run2,run1"
+        try:
+            file = self._get_config_file("cdsw_job_config_streamed_runs.py")
+            config = CdswJobConfigReader.read_from_file(file, self.valid_env_vars, self.setup_result)
+            runs = iter(config.runs)
+            # Runs before the duplicate are returned
+            self.assertEqual("run1", next(runs).name)
+            self.assertEqual("run2", next(runs).name)
+            with self.assertRaises(ValueError) as ve:
+                next(runs)
+        finally:
+            del os.environ["STREAMED_RUN_NAMES"]
+        self.assertIn("Duplicate job name not allowed! Job name: run1", ve.exception.args[0])
+
     def test_config_reader_env_var_sanitize(self):
         self._set_env_vars_from_dict(
             {
@@ -581,6 +685,75 @@ class CdswConfigReaderTest(unittest.TestCase):
             config.runs[0].main_script_arguments,
         )
 
+    def test_config_reader_with_config_cache(self):
+        self._set_mandatory_env_vars()
+        file = self._get_config_file("cdsw_job_config_two_run_configs_defined_complex.py")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config_cache = CdswJobConfigCache(cache_dir)
+            self.assertIsNone(config_cache.lookup(ConfigSource.read(file), self.valid_env_vars))
+
+            config = CdswJobConfigReader.read_from_file(
+                file, self.valid_env_vars, self.setup_result, config_cache=config_cache
+            )
+            self.assertIsNotNone(config_cache.lookup(ConfigSource.read(file), self.valid_env_vars))
+
+            cached_config = CdswJobConfigReader.read_from_file(
+                file, self.valid_env_vars, self.setup_result, config_cache=config_cache
+            )
+            self.assertEqual(config.job_name, cached_config.job_name)
+            self.assertEqual(
+                [r.main_script_arguments for r in config.runs], [r.main_script_arguments for r in cached_config.runs]
+            )
+
+            config_cache.invalidate(file)
+            self.assertIsNone(config_cache.lookup(ConfigSource.read(file), self.valid_env_vars))
+
+    def test_config_reader_config_cache_miss_on_changed_env_var(self):
+        self._set_mandatory_env_vars()
+        file = self._get_config_file(VALID_CONFIG_FILE)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config_cache = CdswJobConfigCache(cache_dir)
+            CdswJobConfigReader.read_from_file(file, self.valid_env_vars, self.setup_result, config_cache=config_cache)
+            self.assertIsNotNone(config_cache.lookup(ConfigSource.read(file), self.valid_env_vars))
+
+            del os.environ["GSHEET_SPREADSHEET"]
+            self.assertIsNone(config_cache.lookup(ConfigSource.read(file), self.valid_env_vars))
+            with self.assertRaises(ValueError) as ve:
+                CdswJobConfigReader.read_from_file(
+                    file, self.valid_env_vars, self.setup_result, config_cache=config_cache
+                )
+            self.assertIn("The following env vars are mandatory but they are not set", ve.exception.args[0])
+
+    def test_config_reader_config_cache_miss_on_changed_launcher_version(self):
+        self._set_mandatory_env_vars()
+        file = self._get_config_file(VALID_CONFIG_FILE)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config_cache = CdswJobConfigCache(cache_dir)
+            CdswJobConfigReader.read_from_file(file, self.valid_env_vars, self.setup_result, config_cache=config_cache)
+            self.assertIsNotNone(config_cache.lookup(ConfigSource.read(file), self.valid_env_vars))
+
+            with patch(
+                "cdswjoblauncher.cdsw.config_cache.get_launcher_version", return_value=get_launcher_version() + "-new"
+            ):
+                self.assertIsNone(config_cache.lookup(ConfigSource.read(file), self.valid_env_vars))
+
+    def test_field_spec_compiled_access_path(self):
+        field_spec = FieldSpec("runs[].email_settings.subject")
+        self.assertEqual(
+            [FieldSpecNode("runs", fan_out=True), FieldSpecNode("email_settings"), FieldSpecNode("subject")],
+            field_spec.nodes,
+        )
+        self.assertEqual([FieldSpecNode("email_settings"), FieldSpecNode("subject")], field_spec.fan_out_suffix)
+
+        fsi = FieldSpecInstance.create_from(field_spec, index=3)
+        self.assertEqual("runs[3].email_settings.subject", fsi.val)
+        self.assertEqual(FieldSpecNode("runs", index=3), fsi.nodes[0])
+        # Instances should not modify the compiled path of the field spec
+        self.assertTrue(field_spec.nodes[0].fan_out)
+
+        with self.assertRaises(ValueError):
+            FieldSpec("runs[].email_settings..subject")
+
     def _match_env_var_for_regex(self, config, env_name, regex):
         LOG.debug(
             "Matching Env var with name '%s' with resolved value of %s",
@@ -2,9 +2,14 @@ import argparse
 import logging
 import os
 import random
+import resource
+import smtplib
 import string
 import tempfile
+import threading
+import time
 import unittest
+import zipfile
 from os.path import expanduser
 from typing import List
 from unittest.mock import patch, Mock, call as mock_call
@@ -17,10 +22,15 @@ from pythoncommons.string_utils import StringUtils
 
 from cdswjoblauncher.cdsw.cdsw_common import CdswSetup, CommonFiles, GoogleDriveCdswHelper, CommonDirs
 from cdswjoblauncher.cdsw.cdsw_config import CdswRun, EmailSettings, CdswJobConfig, DriveApiUploadSettings, \
-    CdswJobConfigReader
-from cdswjoblauncher.cdsw.cdsw_runner import CdswRunnerConfig, ConfigMode, CdswConfigReaderAdapter
+    CdswJobConfigReader, ResourceLimits
+from cdswjoblauncher.cdsw.cdsw_runner import CdswRunnerConfig, ConfigMode, CdswConfigReaderAdapter, CdswRunner, \
+    CdswRunResult
+from cdswjoblauncher.cdsw.command_engine import AsyncCommandEngine, CommandResult
+from cdswjoblauncher.cdsw.warm_interpreter import WarmInterpreter
+from cdswjoblauncher.cdsw.process_resources import ResourceUsage
 from cdswjoblauncher.cdsw.constants import CdswEnvVar, PYTHON3, YarnDevToolsEnvVar, PROJECT_NAME
 
+from cdswjoblauncher.core.error import CommandExecutionException, CommandTimedOutException
 from cdswjoblauncher.cdsw.testutils.test_utils import FakeCdswRunner, FakeGoogleDriveCdswHelper, CommandExpectations, \
     CdswTestingCommons, Object, TEST_MODULE_NAME, TEST_MODULE_MAIN_SCRIPT_NAME
 from testmodule.cdsw.mod1.mod2.cdsw_test_mod import JobPreparation
@@ -128,6 +138,9 @@ class TestCdswRunner(unittest.TestCase):
         mock_job_config: CdswJobConfig = Mock(spec=CdswJobConfig)
         mock_job_config.command_type = DEFAULT_COMMAND_TYPE
         mock_job_config.runs = runs
+        mock_job_config.max_parallel_runs = 1
+        mock_job_config.pipeline_post_processing = False
+        mock_job_config.resource_limits = None
         return mock_job_config
 
     @staticmethod
@@ -144,6 +157,7 @@ class TestCdswRunner(unittest.TestCase):
 
         mock_run1.email_settings = None
         mock_run1.drive_api_upload_settings = None
+        mock_run1.resource_limits = None
         if add_email_settings:
             mock_run1.email_settings = EmailSettings(
                 enabled=email_enabled,
@@ -176,6 +190,26 @@ class TestCdswRunner(unittest.TestCase):
         self.assertEqual(ConfigMode.AUTO_DISCOVERY, config.execution_mode)
         self.assertEqual(reviewsync_config_file_path, config.job_config_file)
 
+    def test_auto_discovery_of_config_file(self):
+        args = self._create_args_for_specified_file(None, dry_run=True)
+        auto_discovery_args, reviewsync_config_file_path = self._create_args_for_auto_discovery(dry_run=True)
+        args.config_dir = auto_discovery_args.config_dir
+        with patch.object(
+            CdswRunnerConfig, "_list_job_config_files", wraps=CdswRunnerConfig._list_job_config_files
+        ) as list_job_config_files:
+            config = CdswRunnerConfig(self.parser, args)
+            self.assertEqual(ConfigMode.AUTO_DISCOVERY, config.execution_mode)
+            self.assertEqual(reviewsync_config_file_path, config.job_config_file)
+            # The config dir is only listed for the error message
+            list_job_config_files.assert_not_called()
+
+            args.command_type_name = "unknown"
+            with self.assertRaises(ValueError) as ve:
+                CdswRunnerConfig(self.parser, args)
+            self.assertIn("Expected file path: unknown_job_config.py", str(ve.exception))
+            self.assertIn(reviewsync_config_file_path, str(ve.exception))
+            self.assertEqual(1, list_job_config_files.call_count)
+
     def test_argument_parsing_into_config(self):
         args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=True)
         config = CdswRunnerConfig(self.parser, args)
@@ -454,6 +488,31 @@ class TestCdswRunner(unittest.TestCase):
             msg="Unexpected calls to main script: {}".format(calls_of_main_script),
         )
 
+    def test_google_drive_helper_is_initialized_on_first_use(self):
+        with patch.object(GoogleDriveCdswHelper, "create_authorizer") as mock_create_authorizer, patch(
+            "googleapiwrapper.google_drive.DriveApiWrapper", side_effect=lambda *args, **kwargs: Mock()
+        ) as mock_drive_api_wrapper, patch.object(GoogleDriveCdswHelper, "_THREAD_DRIVE_WRAPPERS", threading.local()):
+            mock_create_authorizer.return_value.token_full_path = "/tmp/token.pickle"
+            helper = GoogleDriveCdswHelper(TEST_MODULE_NAME)
+            self.assertFalse(helper.initialized)
+            mock_create_authorizer.assert_not_called()
+            mock_drive_api_wrapper.assert_not_called()
+
+            drive_wrapper = helper.drive_wrapper
+            self.assertTrue(helper.initialized)
+            self.assertIs(drive_wrapper, helper.drive_wrapper)
+            # Drive API wrapper is shared with other helpers of the thread
+            self.assertIs(drive_wrapper, GoogleDriveCdswHelper(TEST_MODULE_NAME).drive_wrapper)
+            self.assertEqual(1, mock_drive_api_wrapper.call_count)
+
+            # Other threads have their own Drive API wrapper
+            wrappers_of_other_thread = []
+            thread = threading.Thread(target=lambda: wrappers_of_other_thread.append(helper.drive_wrapper))
+            thread.start()
+            thread.join()
+            self.assertIsNot(drive_wrapper, wrappers_of_other_thread[0])
+            self.assertEqual(2, mock_drive_api_wrapper.call_count)
+
     @patch(CDSW_RUNNER_DRIVE_CDSW_HELPER_UPLOAD_PATH)
     def test_execute_google_drive_is_disabled_by_env_var(self, mock_google_drive_cdsw_helper_upload):
         mock_google_drive_cdsw_helper_upload.return_value = self.create_mock_drive_api_file(
@@ -517,6 +576,400 @@ class TestCdswRunner(unittest.TestCase):
         call = self._get_call_arguments_as_list(calls_of_google_drive_uploader, 0)
         self.assertEqual(expected_local_file_name, call[0])
         self.assertEqual(expected_google_drive_file_name, call[1])
+        self.assertEqual(
+            [("testGoogleDriveApiFilename", expected_local_file_name)],
+            [(m.drive_filename, m.local_file) for m in cdsw_runner.upload_metrics],
+        )
+        self.assertEqual(
+            {"setup", "config", "callback", "run", "main_script", "zip", "upload", "email"},
+            set(cdsw_runner.tracer.get_phase_totals().keys()),
+        )
+
+    def test_execute_runs_in_parallel_keeps_order_of_runs(self):
+        mock_runs = []
+        for i in range(1, 5):
+            mock_run = self._create_mock_cdsw_run(f"run{i}", email_enabled=False, google_drive_upload_enabled=False)
+            mock_run.main_script_arguments = [f"--run-id {i}"]
+            mock_runs.append(mock_run)
+        mock_job_config = self._create_mock_job_config(mock_runs)
+
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=True)
+        args.max_parallel_runs = 3
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        cdsw_runner.start()
+
+        self.assertEqual(["run1", "run2", "run3", "run4"], [r.run_name for r in cdsw_runner.run_results])
+        self.assertEqual(4, len(cdsw_runner.executed_commands))
+        for i, cmd in enumerate(cdsw_runner.executed_commands, start=1):
+            self.assertEqual(f"{PYTHON3} {self.main_script_path} --run-id {i}", cmd)
+
+    @patch(SUBPROCESSRUNNER_RUN_METHOD_PATH)
+    @patch(CDSW_RUNNER_DRIVE_CDSW_HELPER_UPLOAD_PATH)
+    def test_execute_runs_in_parallel_zips_session_data_of_each_run(
+        self,
+        mock_google_drive_cdsw_helper_upload,
+        mock_subprocess_runner,
+    ):
+        mock_runs = []
+        for i in range(1, 3):
+            mock_run = self._create_mock_cdsw_run(f"run{i}", email_enabled=False, google_drive_upload_enabled=True)
+            mock_run.main_script_arguments = [f"--run-id {i}"]
+            mock_runs.append(mock_run)
+        mock_job_config = self._create_mock_job_config(mock_runs)
+
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        args.max_parallel_runs = 2
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        self.tmp_dir_name = tempfile.TemporaryDirectory()
+        lock = threading.Lock()
+        running_main_scripts = []
+        max_running_main_scripts = []
+        main_script_of_run2_started = threading.Event()
+
+        def main_script(cmd, **kwargs):
+            run_id = cmd.split(" ")[-1]
+            with lock:
+                running_main_scripts.append(run_id)
+                max_running_main_scripts.append(len(running_main_scripts))
+            if run_id == "2":
+                main_script_of_run2_started.set()
+            # Session dir and latest-* links of the main script, in the common output dir
+            time.sleep(0.1)
+            session_dir = FileUtils.join_path(self.tmp_dir_name.name, f"session-{run_id}")
+            FileUtils.ensure_dir_created(session_dir)
+            FileUtils.write_to_file(FileUtils.join_path(session_dir, "report.txt"), f"report of run {run_id}")
+            FileUtils.create_symlink_path_dir("latest-session-reviewsync", session_dir, cdsw_runner.output_basedir)
+            log_file = FileUtils.join_path(self.tmp_dir_name.name, f"log-{run_id}.log")
+            FileUtils.write_to_file(log_file, f"log of run {run_id}")
+            FileUtils.create_symlink_path_dir("latest-log-reviewsync-INFO", log_file, cdsw_runner.output_basedir)
+            with lock:
+                running_main_scripts.remove(run_id)
+
+        upload_of_run1_overlapped = []
+
+        def upload(command_type_name, local_file, drive_filename):
+            if FileUtils.basename(FileUtils.get_parent_dir_name(local_file)) == "run1":
+                # The main script of the next run is running while the first run is uploaded
+                upload_of_run1_overlapped.append(main_script_of_run2_started.wait(10))
+            return self.create_mock_drive_api_file(f"http://googledrive/{drive_filename}")
+
+        mock_subprocess_runner.side_effect = main_script
+        mock_google_drive_cdsw_helper_upload.side_effect = upload
+        cdsw_runner.start()
+
+        self.assertEqual([True], upload_of_run1_overlapped)
+        self.assertEqual([1, 1], max_running_main_scripts)
+        self.assertEqual(["run1", "run2"], [r.run_name for r in cdsw_runner.run_results])
+        # Usage of the children reaped by the shell path cannot be attributed to a run when runs execute concurrently
+        self.assertEqual([None, None], [r.resource_usage for r in cdsw_runner.run_results])
+        for i in range(1, 3):
+            command_data_dir = FileUtils.join_path(cdsw_runner.output_basedir, CdswRunner.RUNS_OUTPUT_DIR_NAME, f"run{i}")
+            zip_file = FileUtils.join_path(command_data_dir, "latest-command-data-zip-reviewsync")
+            with zipfile.ZipFile(zip_file) as zf:
+                self.assertEqual(f"report of run {i}", zf.read("report.txt").decode())
+                self.assertEqual(f"log of run {i}", zf.read(f"log-{i}.log").decode())
+
+    @patch(SUBPROCESSRUNNER_RUN_METHOD_PATH)
+    @patch(CDSW_RUNNER_DRIVE_CDSW_HELPER_UPLOAD_PATH)
+    @patch(SEND_EMAIL_COMMAND_RUN_PATH, autospec=True)
+    def test_execute_runs_with_pipelined_post_processing(
+        self,
+        mock_send_email_command_run,
+        mock_google_drive_cdsw_helper_upload,
+        mock_subprocess_runner,
+    ):
+        mock_google_drive_cdsw_helper_upload.return_value = self.create_mock_drive_api_file(
+            "http://googledrive/link-of-file-in-google-drive"
+        )
+        mock_run1 = self._create_mock_cdsw_run("run1", email_enabled=True, google_drive_upload_enabled=True)
+        mock_run2 = self._create_mock_cdsw_run("run2", email_enabled=False, google_drive_upload_enabled=True)
+        mock_job_config = self._create_mock_job_config([mock_run1, mock_run2])
+
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        args.pipeline_post_processing = True
+        self.setup_side_effect_on_mock_subprocess_runner(mock_subprocess_runner)
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        cdsw_runner.start()
+
+        self.assertEqual(2, len(mock_subprocess_runner.call_args_list))
+        self.assertEqual(1, len(mock_send_email_command_run.call_args_list))
+        calls_of_google_drive_uploader = mock_google_drive_cdsw_helper_upload.call_args_list
+        self.assertEqual(2, len(calls_of_google_drive_uploader))
+        for idx, run_name in enumerate(["run1", "run2"]):
+            command_data_dir = FileUtils.join_path(cdsw_runner.output_basedir, CdswRunner.RUNS_OUTPUT_DIR_NAME, run_name)
+            self.assertEqual(
+                FileUtils.join_path(command_data_dir, "latest-command-data-zip-reviewsync"),
+                self._get_call_arguments_as_list(calls_of_google_drive_uploader, idx)[1],
+            )
+        self.assertEqual(["run1", "run2"], [r.run_name for r in cdsw_runner.run_results])
+        self.assertEqual(2, len(cdsw_runner.google_drive_uploads))
+        # The email of the run is sent with the zip file of the run
+        send_email_cmd = mock_send_email_command_run.call_args[0][0]
+        self.assertEqual(
+            FileUtils.join_path(
+                cdsw_runner.output_basedir, CdswRunner.RUNS_OUTPUT_DIR_NAME, "run1", "latest-command-data-zip-reviewsync"
+            ),
+            send_email_cmd.config.email.attachment_file,
+        )
+
+    @patch(SUBPROCESSRUNNER_RUN_METHOD_PATH)
+    @patch(DRIVE_API_WRAPPER_UPLOAD_PATH)
+    def test_execute_runs_with_pipelined_post_processing_uploads_concurrently(
+        self,
+        mock_drive_api_wrapper_upload,
+        mock_subprocess_runner,
+    ):
+        mock_run1 = self._create_mock_cdsw_run("run1", email_enabled=False, google_drive_upload_enabled=True)
+        mock_run2 = self._create_mock_cdsw_run("run2", email_enabled=False, google_drive_upload_enabled=True)
+        mock_job_config = self._create_mock_job_config([mock_run1, mock_run2])
+        upload_of_run2_started = threading.Event()
+        upload_of_run1_overlapped = []
+
+        def upload(local_file, drive_path):
+            if "run2" in local_file:
+                upload_of_run2_started.set()
+            else:
+                upload_of_run1_overlapped.append(upload_of_run2_started.wait(10))
+            return self.create_mock_drive_api_file(f"http://googledrive/{drive_path}")
+
+        mock_drive_api_wrapper_upload.side_effect = upload
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        args.pipeline_post_processing = True
+        args.max_parallel_uploads = 2
+        self.setup_side_effect_on_mock_subprocess_runner(mock_subprocess_runner)
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        # The fake Drive helper is created with the default upload settings
+        with patch.object(self.fake_google_drive_cdsw_helper, "_upload_slots", threading.BoundedSemaphore(2)):
+            cdsw_runner.start()
+
+        self.assertEqual([True], upload_of_run1_overlapped)
+        self.assertEqual(2, len(cdsw_runner.google_drive_uploads))
+
+    @patch(SUBPROCESSRUNNER_RUN_METHOD_PATH)
+    @patch(CDSW_RUNNER_DRIVE_CDSW_HELPER_UPLOAD_PATH)
+    def test_execute_runs_with_pipelined_post_processing_reports_stage_failures(
+        self,
+        mock_google_drive_cdsw_helper_upload,
+        mock_subprocess_runner,
+    ):
+        mock_google_drive_cdsw_helper_upload.side_effect = ValueError("Upload failed")
+        mock_run1 = self._create_mock_cdsw_run("run1", email_enabled=False, google_drive_upload_enabled=True)
+        mock_run2 = self._create_mock_cdsw_run("run2", email_enabled=False, google_drive_upload_enabled=False)
+        mock_job_config = self._create_mock_job_config([mock_run1, mock_run2])
+
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        args.pipeline_post_processing = True
+        self.setup_side_effect_on_mock_subprocess_runner(mock_subprocess_runner)
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        with self.assertRaises(ValueError) as ve:
+            cdsw_runner.start()
+
+        exc_msg = ve.exception.args[0]
+        self.assertIn("Post-processing failed for 1 run(s)", exc_msg)
+        self.assertIn("Stage 'upload' failed for 'run1'", exc_msg)
+        self.assertEqual(2, len(mock_subprocess_runner.call_args_list))
+
+    def test_error_of_closing_mail_transport_does_not_replace_error_of_job(self):
+        mock_job_config = self._create_mock_job_config([])
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=True)
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        cdsw_runner.cdsw_runner_config.config_reader.read_from_file.side_effect = ValueError("Invalid job config")
+        cdsw_runner.mail_transport = Mock()
+        cdsw_runner.mail_transport.close.side_effect = smtplib.SMTPServerDisconnected("Connection lost")
+
+        with self.assertRaises(ValueError) as ve:
+            cdsw_runner.start()
+        self.assertEqual("Invalid job config", str(ve.exception))
+        self.assertIsNone(cdsw_runner.mail_transport)
+
+    def test_max_parallel_runs_from_cli_must_be_positive(self):
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=True)
+        args.max_parallel_runs = 0
+        with self.assertRaises(Exception) as e:
+            CdswRunnerConfig(self.parser, args)
+        self.assertIn("--max-parallel-runs", str(e.exception))
+
+    def test_main_script_is_run_by_async_command_engine(self):
+        mock_job_config = self._create_mock_job_config([])
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        args.async_command_engine = True
+        args.command_timeout = 60
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        self.assertEqual(60, cdsw_runner.command_engine.timeout)
+
+        self.tmp_dir_name = tempfile.TemporaryDirectory()
+        cdsw_runner.output_basedir = self.tmp_dir_name.name
+        run_output_dir = FileUtils.join_path(self.tmp_dir_name.name, CdswRunner.RUNS_OUTPUT_DIR_NAME, "run1")
+        cdsw_runner.command_engine = Mock(spec=AsyncCommandEngine)
+        cdsw_runner.command_engine.timeout = 60
+        cdsw_runner.command_engine.run.return_value = CommandResult([], exit_code=0)
+        run_result = CdswRunResult("run1", run_output_dir)
+        cdsw_runner.execute_main_script(["--arg1 value1"], run_result=run_result)
+
+        expected_argv = [PYTHON3, self.main_script_path, "--arg1", "value1"]
+        cdsw_runner.command_engine.run.assert_called_once_with(
+            expected_argv,
+            log_file=FileUtils.join_path(run_output_dir, "command-run1.log"),
+            timeout=60,
+            rlimits=None,
+        )
+        self.assertEqual([f"{PYTHON3} {self.main_script_path} --arg1 value1"], run_result.executed_commands)
+        self.assertEqual([cdsw_runner.command_engine.run.return_value], run_result.command_results)
+        self.assertIs(cdsw_runner.command_engine.run.return_value.resource_usage, run_result.resource_usage)
+
+        cdsw_runner.command_engine.run.return_value = CommandResult(expected_argv, exit_code=1)
+        with self.assertRaises(CommandExecutionException):
+            cdsw_runner.execute_main_script(["--arg1"], run_result=run_result)
+        cdsw_runner.command_engine.run.return_value = CommandResult(expected_argv, exit_code=-15, timed_out=True)
+        with self.assertRaises(CommandTimedOutException):
+            cdsw_runner.execute_main_script(["--arg1"], run_result=run_result)
+
+    def test_main_script_arguments_with_quote_characters(self):
+        mock_job_config = self._create_mock_job_config([])
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        self.tmp_dir_name = tempfile.TemporaryDirectory()
+        cdsw_runner.output_basedir = self.tmp_dir_name.name
+        arguments = ["--subject Reviewsync's report", '--title "quoted']
+
+        # The command of the legacy runner is not split by the runner
+        with patch(SUBPROCESSRUNNER_RUN_METHOD_PATH) as mock_subprocess_runner:
+            run_result = CdswRunResult("run1", self.tmp_dir_name.name)
+            cdsw_runner.execute_main_script(arguments, run_result=run_result)
+        expected_cmd = f"{PYTHON3} {self.main_script_path} --subject Reviewsync's report --title \"quoted"
+        self.assertEqual(expected_cmd, mock_subprocess_runner.call_args[0][0])
+        self.assertEqual([expected_cmd], run_result.executed_commands)
+
+        cdsw_runner.command_engine = Mock(spec=AsyncCommandEngine)
+        cdsw_runner.command_engine.timeout = None
+        cdsw_runner.command_engine.run.return_value = CommandResult([], exit_code=0)
+        cdsw_runner.execute_main_script(arguments, run_result=CdswRunResult("run1", self.tmp_dir_name.name))
+        self.assertEqual(
+            [PYTHON3, self.main_script_path, "--subject", "Reviewsync's", "report", "--title", '"quoted'],
+            cdsw_runner.command_engine.run.call_args[0][0],
+        )
+
+    def test_main_script_arguments_as_string(self):
+        mock_job_config = self._create_mock_job_config([])
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        self.tmp_dir_name = tempfile.TemporaryDirectory()
+        cdsw_runner.output_basedir = self.tmp_dir_name.name
+
+        # The whole argument string is accepted, as in earlier versions
+        with patch(SUBPROCESSRUNNER_RUN_METHOD_PATH) as mock_subprocess_runner:
+            cdsw_runner.execute_main_script("--arg1 value1 --arg2")
+        self.assertEqual(
+            f"{PYTHON3} {self.main_script_path} --arg1 value1 --arg2", mock_subprocess_runner.call_args[0][0]
+        )
+
+        cdsw_runner.command_engine = Mock(spec=AsyncCommandEngine)
+        cdsw_runner.command_engine.timeout = None
+        cdsw_runner.command_engine.run.return_value = CommandResult([], exit_code=0)
+        cdsw_runner.execute_main_script("--arg1 value1 --arg2")
+        self.assertEqual(
+            [PYTHON3, self.main_script_path, "--arg1", "value1", "--arg2"],
+            cdsw_runner.command_engine.run.call_args[0][0],
+        )
+
+    def test_resource_limits_of_runs(self):
+        mock_run1 = self._create_mock_cdsw_run("run1", add_email_settings=False, add_google_drive_settings=False)
+        mock_run1.resource_limits = ResourceLimits(address_space_mb=1024, wall_timeout_seconds=30)
+        mock_run2 = self._create_mock_cdsw_run("run2", add_email_settings=False, add_google_drive_settings=False)
+        mock_job_config = self._create_mock_job_config([mock_run1, mock_run2])
+        mock_job_config.resource_limits = ResourceLimits(cpu_seconds=600, address_space_mb=2048)
+
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        args.command_type_session_based = False
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        # The command engine is only created when a run has resource limits
+        self.assertIsNone(cdsw_runner.command_engine)
+        cdsw_runner.job_config = mock_job_config
+        self.assertEqual(
+            ResourceLimits(cpu_seconds=600, address_space_mb=1024, wall_timeout_seconds=30),
+            cdsw_runner._determine_resource_limits(mock_run1),
+        )
+        self.assertEqual(mock_job_config.resource_limits, cdsw_runner._determine_resource_limits(mock_run2))
+
+        self.tmp_dir_name = tempfile.TemporaryDirectory()
+        run_output_dir = FileUtils.join_path(self.tmp_dir_name.name, "run1")
+        cdsw_runner.output_basedir = run_output_dir
+        usage = ResourceUsage(user_cpu_time=1.5, max_rss_kb=2048, block_input_ops=8)
+        command_result = CommandResult([], exit_code=0, resource_usage=usage)
+        with patch.object(AsyncCommandEngine, "run", return_value=command_result) as mock_engine_run:
+            run_result = CdswRunResult("run1", run_output_dir)
+            cdsw_runner.execute_main_script(
+                ["--arg1"], run_result=run_result, resource_limits=cdsw_runner._determine_resource_limits(mock_run1)
+            )
+        self.assertIsNotNone(cdsw_runner.command_engine)
+        cdsw_runner.command_engine.close()
+
+        kwargs = mock_engine_run.call_args[1]
+        self.assertEqual(30, kwargs["timeout"])
+        self.assertEqual(
+            {resource.RLIMIT_CPU: (600, 605), resource.RLIMIT_AS: (1024 * 1024 * 1024, 1024 * 1024 * 1024)},
+            kwargs["rlimits"],
+        )
+        self.assertIs(usage, run_result.resource_usage)
+        main_script_span = [s for s in cdsw_runner.tracer.spans if s.name == "main_script"][0]
+        self.assertEqual(1.5, main_script_span.attributes["resource_usage"]["user_cpu_time"])
+        self.assertEqual(8, main_script_span.attributes["resource_usage"]["block_input_ops"])
+
+        # Pipelined post-processing applies the limits of the runs as well
+        with patch.object(AsyncCommandEngine, "run", return_value=command_result) as mock_engine_run, patch.object(
+            CdswRunner, "_create_command_data_zipper"
+        ), patch.object(CdswRunner, "_run_command_data_zipper"):
+            cdsw_runner._execute_runs_with_post_processing_pipeline([mock_run1, mock_run2])
+        cdsw_runner.command_engine.close()
+        self.assertEqual([30, None], [call_args[1]["timeout"] for call_args in mock_engine_run.call_args_list])
+        self.assertEqual(
+            [
+                {resource.RLIMIT_CPU: (600, 605), resource.RLIMIT_AS: (1024 * 1024 * 1024, 1024 * 1024 * 1024)},
+                {resource.RLIMIT_CPU: (600, 605), resource.RLIMIT_AS: (2048 * 1024 * 1024, 2048 * 1024 * 1024)},
+            ],
+            [call_args[1]["rlimits"] for call_args in mock_engine_run.call_args_list],
+        )
+
+    def test_command_engine_is_sized_to_max_parallel_runs(self):
+        mock_job_config = self._create_mock_job_config([])
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=True)
+        args.async_command_engine = True
+        args.max_parallel_runs = 3
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        cdsw_runner.start()
+        self.assertEqual(3, cdsw_runner.command_engine.max_concurrent_commands)
+
+    def test_main_script_is_run_by_warm_interpreter(self):
+        mock_job_config = self._create_mock_job_config([])
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=False)
+        args.warm_interpreter = True
+        args.command_timeout = 60
+        cdsw_runner = self._create_cdsw_runner_with_mock_config(args, mock_job_config)
+        self.assertIsNone(cdsw_runner.warm_interpreter)
+        self.assertEqual("testmodule.main_script", cdsw_runner._determine_main_module_name())
+
+        self.tmp_dir_name = tempfile.TemporaryDirectory()
+        cdsw_runner.output_basedir = self.tmp_dir_name.name
+        with patch.object(WarmInterpreter, "run", return_value=CommandResult([], exit_code=0)) as mock_warm_run:
+            run_result = CdswRunResult("run1", self.tmp_dir_name.name)
+            cdsw_runner.execute_main_script(["--arg1 value1"], run_result=run_result)
+
+        self.assertIsNone(cdsw_runner.command_engine)
+        self.assertEqual(["testmodule.main_script"], cdsw_runner.warm_interpreter.preload_modules)
+        mock_warm_run.assert_called_once_with(
+            [PYTHON3, self.main_script_path, "--arg1", "value1"],
+            log_file=FileUtils.join_path(self.tmp_dir_name.name, "command-run1.log"),
+            timeout=60,
+            rlimits=None,
+        )
+        self.assertEqual([f"{PYTHON3} {self.main_script_path} --arg1 value1"], run_result.executed_commands)
+
+    def test_command_timeout_from_cli_must_be_positive(self):
+        args = self._create_args_for_specified_file(FAKE_CONFIG_FILE, dry_run=True)
+        args.command_timeout = 0
+        with self.assertRaises(Exception) as e:
+            CdswRunnerConfig(self.parser, args)
+        self.assertIn("--command-timeout", str(e.exception))
 
     # TODO Add TC: send_latest_command_data_in_email, various testcases
     # TODO Add TC: unknown command type
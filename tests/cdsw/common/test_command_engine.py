@@ -0,0 +1,187 @@
+import logging
+import os
+import resource
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from cdswjoblauncher.cdsw.command_engine import AsyncCommandEngine
+from cdswjoblauncher.cdsw.process_resources import ResourceUsage, set_rlimits
+
+LOG = logging.getLogger(__name__)
+
+
+class AsyncCommandEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_logger = logging.getLogger("test_command_engine_output")
+        self.engine = AsyncCommandEngine(output_logger=self.output_logger)
+
+    def tearDown(self):
+        self.engine.close()
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _python(code: str):
+        return [sys.executable, "-c", code]
+
+    def test_output_is_streamed_to_logger_and_log_file(self):
+        log_file = os.path.join(self.tmp_dir.name, "command.log")
+        code = "import sys; print('line1'); print('line2', file=sys.stderr); print('line3')"
+        with self.assertLogs(self.output_logger, level=logging.INFO) as cm:
+            result = self.engine.run(self._python(code), log_file=log_file)
+
+        self.assertTrue(result.succeeded)
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual(log_file, result.log_file)
+        self.assertEqual(["line1", "line2", "line3"], sorted(r.getMessage() for r in cm.records))
+        with open(log_file) as f:
+            self.assertEqual(["line1", "line2", "line3"], sorted(f.read().splitlines()))
+
+    def test_exit_code_and_resource_usage(self):
+        code = "import sys; data = bytearray(64 * 1024 * 1024); sum(range(10 ** 6)); sys.exit(3)"
+        result = self.engine.run(self._python(code))
+
+        self.assertFalse(result.succeeded)
+        self.assertEqual(3, result.exit_code)
+        self.assertFalse(result.timed_out)
+        self.assertGreater(result.wall_time, 0)
+        self.assertGreater(result.cpu_time, 0)
+        # The child allocated 64 MiB
+        self.assertGreater(result.max_rss_kb, 64 * 1024)
+        self.assertIn("exit code: 3", str(result))
+
+    def test_block_io_is_recorded(self):
+        file = os.path.join(self.tmp_dir.name, "data.bin")
+        code = "import os; f = open({!r}, 'wb'); f.write(os.urandom(4 * 1024 * 1024)); f.flush(); os.fsync(f.fileno())"
+        result = self.engine.run(self._python(code.format(file)))
+        self.assertTrue(result.succeeded)
+        # Block output is not counted by all file systems, e.g. tmpfs
+        self.assertGreaterEqual(result.resource_usage.block_output_ops, 0)
+        self.assertIn("block I/O:", str(result))
+
+    def test_resource_limits(self):
+        code = "import resource; print(resource.getrlimit(resource.RLIMIT_NOFILE))"
+        with self.assertLogs(self.output_logger, level=logging.INFO) as cm:
+            result = self.engine.run(self._python(code), rlimits={resource.RLIMIT_NOFILE: (64, 64)})
+        self.assertTrue(result.succeeded)
+        self.assertEqual(["(64, 64)"], [r.getMessage() for r in cm.records])
+
+        address_space = 256 * 1024 * 1024
+        result = self.engine.run(
+            self._python("bytearray(512 * 1024 * 1024)"), rlimits={resource.RLIMIT_AS: (address_space, address_space)}
+        )
+        # MemoryError
+        self.assertEqual(1, result.exit_code)
+
+    def test_cpu_limit(self):
+        result = self.engine.run(self._python("while True: pass"), rlimits={resource.RLIMIT_CPU: (1, 2)}, timeout=20)
+        self.assertFalse(result.timed_out)
+        self.assertEqual(-signal.SIGXCPU, result.exit_code)
+        self.assertGreaterEqual(result.cpu_time, 0.9)
+
+    def test_rlimits_are_lowered_to_hard_limit(self):
+        original_limits = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if original_limits[1] == resource.RLIM_INFINITY:
+            self.skipTest("Hard limit of open files is unlimited")
+        try:
+            set_rlimits({resource.RLIMIT_NOFILE: (resource.RLIM_INFINITY, resource.RLIM_INFINITY)})
+            self.assertEqual(original_limits[1], resource.getrlimit(resource.RLIMIT_NOFILE)[1])
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, original_limits)
+
+    def test_resource_usage_of_children(self):
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self.engine.run(self._python("sum(range(10 ** 6))"))
+        usage = ResourceUsage.of_children_between(before, resource.getrusage(resource.RUSAGE_CHILDREN))
+        self.assertGreater(usage.cpu_time, 0)
+        self.assertGreaterEqual(usage.max_rss_kb, 0)
+
+    def test_peak_rss_of_children_reaped_earlier_is_not_attributed(self):
+        def rusage(cpu_time, max_rss_kb):
+            return SimpleNamespace(ru_utime=cpu_time, ru_stime=0.0, ru_maxrss=max_rss_kb, ru_inblock=0, ru_oublock=0)
+
+        self.assertEqual(0, ResourceUsage.of_children_between(rusage(1.0, 4096), rusage(2.0, 4096)).max_rss_kb)
+        self.assertEqual(8192, ResourceUsage.of_children_between(rusage(1.0, 4096), rusage(2.0, 8192)).max_rss_kb)
+
+    def test_env(self):
+        code = "import os; print(os.environ['TEST_COMMAND_ENGINE_VAR'])"
+        with self.assertLogs(self.output_logger, level=logging.INFO) as cm:
+            result = self.engine.run(self._python(code), env={"TEST_COMMAND_ENGINE_VAR": "value"})
+        self.assertTrue(result.succeeded)
+        self.assertEqual(["value"], [r.getMessage() for r in cm.records])
+
+    def test_arguments_are_not_interpreted_by_a_shell(self):
+        code = "import sys; print(sys.argv[1])"
+        with self.assertLogs(self.output_logger, level=logging.INFO) as cm:
+            self.engine.run(self._python(code) + ["$HOME; echo 'x'"])
+        self.assertEqual(["$HOME; echo 'x'"], [r.getMessage() for r in cm.records])
+
+    def test_timeout(self):
+        start_time = time.perf_counter()
+        result = self.engine.run(self._python("import time; time.sleep(30)"), timeout=0.5)
+
+        self.assertLess(time.perf_counter() - start_time, 10)
+        self.assertTrue(result.timed_out)
+        self.assertFalse(result.succeeded)
+        self.assertEqual(-signal.SIGTERM, result.exit_code)
+
+    def test_cancel_all(self):
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(self.engine.run(self._python("import time; time.sleep(30)")))
+        )
+        thread.start()
+        # Wait for the command to be started
+        deadline = time.monotonic() + 10
+        while not self.engine._tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.engine.cancel_all()
+        thread.join(timeout=10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(1, len(results))
+        self.assertTrue(results[0].cancelled)
+        self.assertFalse(results[0].succeeded)
+
+    def test_concurrent_commands(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.engine.run(self._python("import time; time.sleep(1)"))))
+            for _ in range(3)
+        ]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLess(time.perf_counter() - start_time, 2.5)
+        self.assertEqual(3, len(results))
+        self.assertTrue(all(r.succeeded for r in results))
+
+    def test_commands_wait_for_a_free_reaper_before_they_are_started(self):
+        self.engine.close()
+        self.engine = AsyncCommandEngine(output_logger=self.output_logger, max_concurrent_commands=1)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.engine.run(self._python("import time; time.sleep(1)"), timeout=1.5))
+            )
+            for _ in range(2)
+        ]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # The commands are run one after the other, the timeout of the second one starts when it is started
+        self.assertGreaterEqual(time.perf_counter() - start_time, 2)
+        self.assertEqual(2, len(results))
+        self.assertTrue(all(r.succeeded for r in results))
+        self.assertTrue(all(r.wall_time < 1.5 for r in results))
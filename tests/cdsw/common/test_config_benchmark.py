@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from cdswjoblauncher.cdsw.cdsw_common import CdswSetupResult
+from cdswjoblauncher.cdsw.cdsw_config import CdswJobConfigReader
+from cdswjoblauncher.cdsw.testutils.config_benchmark import (
+    BenchmarkScenario,
+    SyntheticJobConfigGenerator,
+    ConfigBenchmark,
+    BenchmarkResultStore,
+    BenchmarkComparator,
+    PHASES,
+)
+
+
+class ConfigBenchmarkTest(unittest.TestCase):
+    def test_generated_configs_are_valid(self):
+        for callable_runs in (False, True):
+            scenario = BenchmarkScenario(
+                "test", runs=3, variables_per_run=7, chain_depth=5, callable_runs=callable_runs
+            )
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                file = SyntheticJobConfigGenerator(scenario).write(tmp_dir)
+                setup_result = CdswSetupResult(tmp_dir, tmp_dir, {}, tmp_dir)
+                config = CdswJobConfigReader.read_from_file(file, [], setup_result)
+
+            self.assertEqual(["run0", "run1", "run2"], [run.name for run in config.runs])
+            run = config.runs[0]
+            self.assertEqual("chainStart+1+2+3+4+5", run.variables["var0"])
+            self.assertEqual("chainStart+1+2+3+4+5+1", run.variables["var1"])
+            self.assertEqual("benchmarkAlgorithm+2", run.variables["var2"])
+            self.assertEqual("value3", run.variables["var3"])
+            self.assertEqual("file_chainStart+1+2+3+4+5", run.drive_api_upload_settings.file_name)
+            self.assertIn("--arg3 value3", run.main_script_arguments)
+
+    def test_run_save_and_compare(self):
+        scenarios = [BenchmarkScenario("small", runs=2, variables_per_run=3, chain_depth=2)]
+        results = ConfigBenchmark(scenarios, repeat=2).run()
+        self.assertEqual(1, len(results))
+        self.assertEqual(set(PHASES), set(results[0].phases.keys()))
+        self.assertTrue(results[0].peak_memory > 0)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = BenchmarkResultStore(tmp_dir)
+            file = store.save(results, commit="abc123")
+            self.assertEqual(os.path.join(tmp_dir, "abc123.json"), file)
+            base = store.load("abc123")
+
+        comparisons = BenchmarkComparator.compare(base, base)
+        self.assertEqual(len(PHASES) + 1, len(comparisons))
+        self.assertFalse(any(c.is_regression(0.0) for c in comparisons))
@@ -0,0 +1,82 @@
+import unittest
+
+import dacite
+from dacite import WrongTypeError, MissingValueError, UnionMatchError
+
+from cdswjoblauncher.cdsw.cdsw_config import CdswJobConfig, CdswRun, EmailSettings, DriveApiUploadSettings
+from cdswjoblauncher.cdsw.dataclass_utils import from_dict, DataclassConverter
+
+
+def generate_runs(conf):
+    return []
+
+
+class DataclassUtilsTest(unittest.TestCase):
+    @staticmethod
+    def _create_run_dict(name="run1"):
+        return {
+            "name": name,
+            "email_settings": {
+                "enabled": True,
+                "send_attachment": True,
+                "attachment_file_name": lambda conf: "attachment.zip",
+                "email_body_file_from_command_data": "report.html",
+                "subject": "subject",
+                "sender": "sender",
+            },
+            "drive_api_upload_settings": {"enabled": False, "file_name": "file"},
+            "main_script_arguments": ["--arg1", lambda conf: "--arg2"],
+            "variables": {"var1": "value1"},
+        }
+
+    def test_from_dict_same_as_dacite(self):
+        data = {
+            "job_name": "job",
+            "command_type": "reviewsync",
+            "runs": [self._create_run_dict("run1"), self._create_run_dict("run2")],
+            "global_variables": {"var1": "value1", "var2": True, "var3": 3},
+            "max_parallel_runs": 2,
+            "unknown_key": "ignored",
+        }
+        self.assertEqual(dacite.from_dict(CdswJobConfig, data), from_dict(CdswJobConfig, data))
+
+        data["runs"] = generate_runs
+        config = from_dict(CdswJobConfig, data)
+        self.assertIs(generate_runs, config.runs)
+
+    def test_missing_optional_fields_are_none(self):
+        run = from_dict(CdswRun, {"name": "run1"})
+        self.assertIsNone(run.email_settings)
+        self.assertIsNone(run.drive_api_upload_settings)
+        self.assertEqual([], run.main_script_arguments)
+
+    def test_errors(self):
+        with self.assertRaises(MissingValueError) as cm:
+            from_dict(CdswJobConfig, {"job_name": "job"})
+        self.assertEqual("command_type", cm.exception.field_path)
+
+        run_dict = self._create_run_dict()
+        run_dict["email_settings"]["enabled"] = "yes"
+        with self.assertRaises(WrongTypeError) as cm:
+            from_dict(CdswRun, run_dict)
+        self.assertEqual("email_settings.enabled", cm.exception.field_path)
+
+        with self.assertRaises(UnionMatchError) as cm:
+            from_dict(CdswJobConfig, {"job_name": "job", "command_type": "reviewsync", "runs": [run_dict]})
+        self.assertEqual("runs", cm.exception.field_path)
+
+    def test_converter_is_cached(self):
+        self.assertIs(DataclassConverter.get(CdswRun), DataclassConverter.get(CdswRun))
+
+    def test_slots(self):
+        run = from_dict(CdswRun, self._create_run_dict())
+        for obj in (run, run.email_settings, run.drive_api_upload_settings):
+            self.assertFalse(hasattr(obj, "__dict__"))
+        with self.assertRaises(AttributeError):
+            run.unknown_field = "value"
+        self.assertEqual(
+            DriveApiUploadSettings(enabled=True, file_name="file"),
+            DriveApiUploadSettings(enabled=True, file_name="file"),
+        )
+        self.assertIn("EmailSettings(enabled=True", repr(run.email_settings))
+        self.assertEqual(["enabled", "send_attachment"], list(EmailSettings.__slots__[:2]))
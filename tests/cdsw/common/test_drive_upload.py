@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from googleapiclient.errors import HttpError
+
+from cdswjoblauncher.cdsw.drive_upload import DriveUploadSettings, ResumableDriveApiWrapper, UploadMetrics
+
+MEDIA_FILE_UPLOAD_PATH = "cdswjoblauncher.cdsw.drive_upload.MediaFileUpload"
+SLEEP_PATH = "cdswjoblauncher.cdsw.drive_upload.time.sleep"
+
+
+class ResumableDriveApiWrapperTest(unittest.TestCase):
+    @staticmethod
+    def _create_wrapper(next_chunk_side_effect, max_retries=3):
+        # Not calling __init__ to not authorize and build a real service
+        wrapper = ResumableDriveApiWrapper.__new__(ResumableDriveApiWrapper)
+        wrapper.upload_settings = DriveUploadSettings(chunk_size=256 * 1024, max_retries=max_retries)
+        wrapper.files_service = Mock()
+        wrapper.files_service.create.return_value.next_chunk.side_effect = next_chunk_side_effect
+        return wrapper
+
+    @staticmethod
+    def _http_error(status):
+        return HttpError(Mock(status=status, reason="error"), b"")
+
+    @patch(SLEEP_PATH)
+    @patch(MEDIA_FILE_UPLOAD_PATH)
+    def test_failed_chunks_are_retried(self, mock_media_file_upload, mock_sleep):
+        status = Mock()
+        status.progress.return_value = 0.5
+        wrapper = self._create_wrapper(
+            [self._http_error(503), (status, None), ConnectionResetError(), (None, {"id": "fileId", "name": "f.zip"})]
+        )
+
+        drive_api_file = wrapper._upload_and_create_new_file("f.zip", {"name": "f.zip"}, "/tmp/f.zip", fields="id")
+
+        self.assertEqual("fileId", drive_api_file.id)
+        self.assertEqual(4, wrapper.files_service.create.return_value.next_chunk.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+        self.assertTrue(mock_media_file_upload.call_args.kwargs["resumable"])
+        self.assertEqual(256 * 1024, mock_media_file_upload.call_args.kwargs["chunksize"])
+
+    @patch(SLEEP_PATH)
+    @patch(MEDIA_FILE_UPLOAD_PATH)
+    def test_upload_fails_on_non_retriable_error_or_after_max_retries(self, mock_media_file_upload, mock_sleep):
+        wrapper = self._create_wrapper([self._http_error(403)])
+        with self.assertRaises(HttpError):
+            wrapper._upload_and_create_new_file("f.zip", {"name": "f.zip"}, "/tmp/f.zip", fields="id")
+        mock_sleep.assert_not_called()
+
+        wrapper = self._create_wrapper([self._http_error(500)] * 3, max_retries=2)
+        with self.assertRaises(HttpError):
+            wrapper._upload_and_create_new_file("f.zip", {"name": "f.zip"}, "/tmp/f.zip", fields="id")
+        self.assertEqual(2, mock_sleep.call_count)
+
+    def test_invalid_upload_settings(self):
+        with self.assertRaises(ValueError):
+            DriveUploadSettings(chunk_size=1000)
+        with self.assertRaises(ValueError):
+            DriveUploadSettings(max_parallel_uploads=0)
+
+    def test_upload_metrics_throughput(self):
+        self.assertEqual(512.0, UploadMetrics("f.zip", "/tmp/f.zip", 1024, 2.0).throughput)
+        self.assertEqual(0.0, UploadMetrics("f.zip", "/tmp/f.zip", None, 2.0).throughput)
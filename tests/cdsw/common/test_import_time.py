@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import unittest
+from typing import Dict
+
+from cdswjoblauncher.cdsw.lazy_import import LazyModule, lazy_import
+
+RUNNER_MODULE = "cdswjoblauncher.cdsw.cdsw_runner"
+IMPORT_TIME_BUDGET_ENV_VAR = "IMPORT_TIME_BUDGET_MS"
+# Cumulative import time of the runner module, the runner imported in about 80 ms with deferred imports
+# and in about 700 ms before
+DEFAULT_IMPORT_TIME_BUDGET_MS = 350
+NUMBER_OF_MEASUREMENTS = 3
+# Modules that should only be imported when the feature using them is used
+DEFERRED_MODULES = [
+    "googleapiwrapper",
+    "googleapiclient",
+    "pythoncommons.logging_setup",
+    "pythoncommons.process",
+    "_pytest",
+    "smtplib",
+    "asyncio",
+    "cdswjoblauncher.commands.send_latest_command_data_in_mail",
+]
+
+
+def measure_import_time(module: str) -> Dict[str, int]:
+    """
+    Imports the module in a new interpreter with '-X importtime'.
+    :return: Cumulative import time of the imported modules in microseconds
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    result = {}
+    for line in proc.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        result[name.strip()] = int(cumulative)
+    return result
+
+
+class ImportTimeTest(unittest.TestCase):
+    def test_heavy_modules_are_not_imported(self):
+        imported_modules = measure_import_time(RUNNER_MODULE)
+        self.assertIn(RUNNER_MODULE, imported_modules)
+        for module in imported_modules:
+            for deferred_module in DEFERRED_MODULES:
+                self.assertFalse(
+                    module == deferred_module or module.startswith(deferred_module + "."),
+                    msg="Module '{}' is imported by {}".format(module, RUNNER_MODULE),
+                )
+
+    def test_import_time_budget(self):
+        budget_ms = int(os.environ.get(IMPORT_TIME_BUDGET_ENV_VAR, DEFAULT_IMPORT_TIME_BUDGET_MS))
+        # The best of multiple measurements, to be less sensitive to the load of the machine
+        import_time_ms = min(
+            measure_import_time(RUNNER_MODULE)[RUNNER_MODULE] / 1000 for _ in range(NUMBER_OF_MEASUREMENTS)
+        )
+        self.assertLessEqual(
+            import_time_ms,
+            budget_ms,
+            msg="Importing {} took {:.1f} ms, budget is {} ms".format(RUNNER_MODULE, import_time_ms, budget_ms),
+        )
+
+    def test_lazy_module(self):
+        self.assertIs(sys.modules["os"], lazy_import("os"))
+        lazy_json = LazyModule("json")
+        self.assertIn("not imported", repr(lazy_json))
+        self.assertEqual("[1]", lazy_json.dumps([1]))
+        self.assertIn("(imported)", repr(lazy_json))
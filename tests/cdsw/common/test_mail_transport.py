@@ -0,0 +1,135 @@
+import os
+import smtplib
+import tempfile
+import unittest
+import zipfile
+from email.mime.text import MIMEText
+from unittest.mock import patch
+
+from pythoncommons.email import EmailConfig, EmailAccount
+
+from cdswjoblauncher.cdsw.testutils.smtp_server import LocalSmtpServer
+from cdswjoblauncher.commands.mail_transport import MailTransport
+from cdswjoblauncher.commands.send_latest_command_data_in_mail import (
+    FullEmailConfig,
+    SendLatestCommandDataInEmailConfig,
+    SendLatestCommandDataInEmail,
+)
+
+SENDER = "sender@example.com"
+RECIPIENTS = ["recipient@example.com"]
+
+
+class MailTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.smtp_server = LocalSmtpServer().start()
+        self.email_conf = EmailConfig(
+            self.smtp_server.host, self.smtp_server.port, EmailAccount("user", "password")
+        )
+
+    def tearDown(self):
+        self.smtp_server.stop()
+
+    @staticmethod
+    def _create_message(subject):
+        message = MIMEText("body")
+        message["Subject"] = subject
+        return message
+
+    def test_mails_are_sent_over_single_session(self):
+        with MailTransport(self.email_conf, use_ssl=False) as transport:
+            for i in range(3):
+                transport.send(SENDER, RECIPIENTS, self._create_message(f"subject{i}"))
+
+        self.assertEqual(3, len(self.smtp_server.mails))
+        self.assertEqual(1, self.smtp_server.connection_count)
+        self.assertEqual(1, self.smtp_server.login_count)
+        self.assertEqual(RECIPIENTS, self.smtp_server.mails[0].recipients)
+
+    def test_reconnect_when_session_is_lost(self):
+        with MailTransport(self.email_conf, use_ssl=False) as transport:
+            transport.send(SENDER, RECIPIENTS, self._create_message("subject1"))
+            self.smtp_server.drop_connections()
+            transport.send(SENDER, RECIPIENTS, self._create_message("subject2"))
+            self.assertEqual(2, transport.connect_count)
+
+        self.assertEqual(2, len(self.smtp_server.mails))
+        self.assertEqual(2, self.smtp_server.login_count)
+
+    def test_lost_session_is_closed_before_reconnecting(self):
+        with MailTransport(self.email_conf, use_ssl=False) as transport:
+            transport.send(SENDER, RECIPIENTS, self._create_message("subject1"))
+            lost_conn = transport._conn
+            reset = ConnectionResetError("Connection reset")
+            with patch.object(lost_conn, "sendmail", side_effect=reset), patch.object(
+                lost_conn, "close", wraps=lost_conn.close
+            ) as close:
+                transport.send(SENDER, RECIPIENTS, self._create_message("subject2"))
+            close.assert_called_once_with()
+            self.assertIsNone(lost_conn.sock)
+            self.assertEqual(2, transport.connect_count)
+
+        self.assertEqual(2, len(self.smtp_server.mails))
+
+    def test_mails_are_sent_before_close(self):
+        transport = MailTransport(self.email_conf, use_ssl=False)
+        transport.send(SENDER, RECIPIENTS, self._create_message("subject1"))
+        self.assertEqual(1, len(self.smtp_server.mails))
+        transport.send(SENDER, RECIPIENTS, self._create_message("subject2"))
+        self.assertEqual(2, len(self.smtp_server.mails))
+        self.assertIn("Subject: subject1", self.smtp_server.mails[0].data)
+        self.assertIn("Subject: subject2", self.smtp_server.mails[1].data)
+
+        transport.close()
+        self.assertEqual(1, self.smtp_server.connection_count)
+
+    def test_send_latest_command_data_in_email(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_file = os.path.join(tmp_dir, "command_data.zip")
+            with zipfile.ZipFile(zip_file, "w") as zf:
+                zf.writestr("summary.html", "<b>summary</b>")
+            email_conf = FullEmailConfig(
+                "user",
+                "password",
+                self.smtp_server.host,
+                self.smtp_server.port,
+                SENDER,
+                RECIPIENTS,
+                subject="Command data",
+                attachment_file=zip_file,
+                attachment_filename="attachment",
+                smtp_ssl=False,
+            )
+            config = SendLatestCommandDataInEmailConfig(
+                email_conf, send_attachment=True, prepend_email_body_with_text="Link: "
+            )
+            SendLatestCommandDataInEmail(config).run()
+
+        self.assertEqual(1, len(self.smtp_server.mails))
+        data = self.smtp_server.mails[0].data
+        self.assertIn("Subject: Command data", data)
+        self.assertIn('filename="attachment.zip"', data)
+
+    def test_one_off_transport_is_closed_when_sending_failed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_file = os.path.join(tmp_dir, "command_data.zip")
+            with zipfile.ZipFile(zip_file, "w") as zf:
+                zf.writestr("summary.html", "<b>summary</b>")
+            email_conf = FullEmailConfig(
+                "user",
+                "password",
+                self.smtp_server.host,
+                self.smtp_server.port,
+                SENDER,
+                RECIPIENTS,
+                subject="Command data",
+                attachment_file=zip_file,
+                smtp_ssl=False,
+            )
+            config = SendLatestCommandDataInEmailConfig(email_conf, send_attachment=True)
+            with patch.object(MailTransport, "send", side_effect=smtplib.SMTPDataError(554, b"rejected")), patch.object(
+                MailTransport, "close", autospec=True, side_effect=MailTransport.close
+            ) as close:
+                with self.assertRaises(smtplib.SMTPDataError):
+                    SendLatestCommandDataInEmail(config).run()
+        close.assert_called_once()
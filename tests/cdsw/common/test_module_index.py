@@ -0,0 +1,145 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from cdswjoblauncher.cdsw.constants import CdswEnvVar
+from cdswjoblauncher.cdsw.module_index import ModuleIndexCache, ModuleIndexer, DiscoveryMode, get_module_discovery_mode
+from cdswjoblauncher.cdsw.testutils.test_utils import TEST_MODULE_NAME
+from cdswjoblauncher.cdsw.utils import MethodResolver
+from cdswjoblauncher.contract import CdswApp
+from cdswjoblauncher.core.module import ClassResolver
+
+APP_MODULE_NAME = "moduleindexapp"
+
+
+class ModuleIndexTest(unittest.TestCase):
+    def setUp(self):
+        ModuleIndexCache.clear()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        sys.path.insert(0, self.tmp_dir.name)
+
+    def tearDown(self):
+        ModuleIndexCache.clear()
+        sys.path.remove(self.tmp_dir.name)
+        for module in [m for m in sys.modules if m == APP_MODULE_NAME or m.startswith(f"{APP_MODULE_NAME}.")]:
+            del sys.modules[module]
+        self.tmp_dir.cleanup()
+
+    def _create_app_module(self):
+        files = {
+            "__init__.py": "",
+            "cdsw/__init__.py": "",
+            "cdsw/app.py": "from cdswjoblauncher.contract import CdswApp\n\n\nclass MyApp(CdswApp):\n    pass\n",
+            "cdsw/callbacks/__init__.py": "",
+            "cdsw/callbacks/prep.py": "class Prep:\n    @staticmethod\n    def execute():\n        return 'prep'\n",
+            "cdsw/callbacks/other.py": "from moduleindexapp.cdsw.callbacks.prep import Prep\n\n\nclass Child(Prep):\n    pass\n",
+            "cdsw/callbacks/duplicate.py": "class Duplicate:\n    def execute(self):\n        pass\n",
+            "cdsw/callbacks/duplicate2.py": "class Duplicate:\n    def execute(self):\n        pass\n",
+            "cdsw/heavy.py": "raise RuntimeError('Module should not be imported')\n",
+        }
+        for path, content in files.items():
+            file = os.path.join(self.tmp_dir.name, APP_MODULE_NAME, path)
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            with open(file, "w") as f:
+                f.write(content)
+
+    @staticmethod
+    def _static_index_cache():
+        return ModuleIndexCache(mode=DiscoveryMode.STATIC)
+
+    def test_resolve_callbacks_with_single_traversal(self):
+        with patch.object(ModuleIndexer, "build", wraps=ModuleIndexer.build) as build:
+            callables = MethodResolver(TEST_MODULE_NAME, ["JobPreparation.execute"]).resolve()
+            MethodResolver(TEST_MODULE_NAME, ["JobPreparation.execute"]).resolve()
+        self.assertEqual(1, build.call_count)
+        from testmodule.cdsw.mod1.mod2.cdsw_test_mod import JobPreparation
+
+        self.assertEqual(JobPreparation.execute, callables[0])
+
+    def test_resolve_callback_not_found(self):
+        with self.assertRaises(ValueError) as cm:
+            MethodResolver(TEST_MODULE_NAME, ["JobPreparation.notExisting"]).resolve()
+        self.assertIn("No callback method found for spec 'JobPreparation.notExisting'", str(cm.exception))
+
+    def test_resolve_ambiguous_callback(self):
+        self._create_app_module()
+        with self.assertRaises(ValueError) as cm:
+            MethodResolver(APP_MODULE_NAME, ["Duplicate.execute"], index_cache=self._static_index_cache()).resolve()
+        self.assertIn("Ambiguous spec Duplicate.execute", str(cm.exception))
+        self.assertIn(f"{APP_MODULE_NAME}.cdsw.callbacks.duplicate2", str(cm.exception))
+
+    def test_static_discovery_only_imports_matching_modules(self):
+        self._create_app_module()
+        index_cache = self._static_index_cache()
+        callables = MethodResolver(
+            APP_MODULE_NAME, ["Prep.execute", "Child.execute"], index_cache=index_cache
+        ).resolve()
+        self.assertEqual(["prep", "prep"], [c() for c in callables])
+        self.assertNotIn(f"{APP_MODULE_NAME}.cdsw.heavy", sys.modules)
+        self.assertNotIn(f"{APP_MODULE_NAME}.cdsw.callbacks.duplicate", sys.modules)
+
+        app_type = ClassResolver(APP_MODULE_NAME, CdswApp, index_cache=index_cache).resolve()
+        self.assertEqual(f"{APP_MODULE_NAME}.cdsw.app", app_type.__module__)
+        self.assertEqual("MyApp", app_type.__name__)
+        self.assertNotIn(f"{APP_MODULE_NAME}.cdsw.heavy", sys.modules)
+
+    def test_import_discovery_imports_all_modules(self):
+        self._create_app_module()
+        index_cache = ModuleIndexCache(mode=DiscoveryMode.IMPORT)
+        with self.assertRaises(RuntimeError):
+            MethodResolver(APP_MODULE_NAME, ["Prep.execute"], index_cache=index_cache).resolve()
+
+    def test_static_discovery_of_subclasses(self):
+        self._create_app_module()
+        with open(os.path.join(self.tmp_dir.name, APP_MODULE_NAME, "cdsw", "app2.py"), "w") as f:
+            f.write("from moduleindexapp.cdsw import app\n\n\nclass OtherApp(app.MyApp):\n    pass\n")
+        with self.assertRaises(ValueError) as cm:
+            ClassResolver(APP_MODULE_NAME, CdswApp, index_cache=self._static_index_cache()).resolve()
+        self.assertIn(f"{APP_MODULE_NAME}.cdsw.app.MyApp", str(cm.exception))
+        self.assertIn(f"{APP_MODULE_NAME}.cdsw.app2.OtherApp", str(cm.exception))
+
+    def test_import_discovery_is_the_default(self):
+        with patch.dict(os.environ):
+            os.environ.pop(CdswEnvVar.MODULE_DISCOVERY_MODE.value, None)
+            self.assertEqual(DiscoveryMode.IMPORT, get_module_discovery_mode())
+            os.environ[CdswEnvVar.MODULE_DISCOVERY_MODE.value] = "STATIC"
+            self.assertEqual(DiscoveryMode.STATIC, get_module_discovery_mode())
+
+    def test_import_discovery_finds_re_exported_classes(self):
+        self._create_app_module()
+        os.remove(os.path.join(self.tmp_dir.name, APP_MODULE_NAME, "cdsw", "heavy.py"))
+        # The app class is created by a factory, so its source does not define a subclass of CdswApp
+        with open(os.path.join(self.tmp_dir.name, APP_MODULE_NAME, "cdsw", "app.py"), "w") as f:
+            f.write(
+                "from cdswjoblauncher.contract import CdswApp\n\n\n"
+                "def create_app_class():\n    return type('MyApp', (CdswApp,), {})\n"
+            )
+        with open(os.path.join(self.tmp_dir.name, APP_MODULE_NAME, "cdsw", "__init__.py"), "w") as f:
+            f.write("from moduleindexapp.cdsw.app import create_app_class\n\nMyApp = create_app_class()\n")
+
+        app_type = ClassResolver(APP_MODULE_NAME, CdswApp, index_cache=ModuleIndexCache()).resolve()
+        self.assertEqual("MyApp", app_type.__name__)
+        with self.assertRaises(ValueError):
+            ClassResolver(APP_MODULE_NAME, CdswApp, index_cache=self._static_index_cache()).resolve()
+
+    def test_persistent_index_is_reused_until_source_files_change(self):
+        self._create_app_module()
+        index_cache = ModuleIndexCache(persistent=True, cache_dir=self.cache_dir, mode=DiscoveryMode.STATIC)
+        index = index_cache.get(APP_MODULE_NAME)
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, f"{APP_MODULE_NAME}-static.pickle")))
+
+        # Simulate a new process
+        ModuleIndexCache.clear()
+        with patch.object(ModuleIndexer, "build", wraps=ModuleIndexer.build) as build:
+            self.assertEqual(index, index_cache.get(APP_MODULE_NAME))
+            self.assertEqual(0, build.call_count)
+
+            ModuleIndexCache.clear()
+            with open(os.path.join(self.tmp_dir.name, APP_MODULE_NAME, "cdsw", "new.py"), "w") as f:
+                f.write("class New:\n    pass\n")
+            new_index = index_cache.get(APP_MODULE_NAME)
+            self.assertEqual(1, build.call_count)
+        self.assertIn(f"{APP_MODULE_NAME}.cdsw.new", new_index.modules)
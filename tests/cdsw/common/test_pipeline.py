@@ -0,0 +1,78 @@
+import threading
+import unittest
+
+from cdswjoblauncher.cdsw.pipeline import Pipeline
+
+
+class PipelineTest(unittest.TestCase):
+    def test_items_go_through_all_stages_in_order(self):
+        processed = []
+        pipeline = Pipeline("test", queue_size=1)
+        pipeline.add_stage("double", lambda item: item.append(item[0] * 2))
+        pipeline.add_stage("collect", lambda item: processed.append(item))
+        pipeline.start()
+        for i in range(5):
+            pipeline.submit(f"item{i}", [i])
+        failures = pipeline.drain()
+
+        self.assertEqual([], failures)
+        self.assertEqual([[0, 0], [1, 2], [2, 4], [3, 6], [4, 8]], processed)
+
+    def test_failed_stage_skips_remaining_stages_of_item(self):
+        processed = []
+
+        def fail_on_odd(item):
+            if item % 2 == 1:
+                raise ValueError(f"odd: {item}")
+
+        pipeline = Pipeline("test", queue_size=2)
+        pipeline.add_stage("check", fail_on_odd)
+        pipeline.add_stage("collect", lambda item: processed.append(item))
+        pipeline.start()
+        for i in range(4):
+            pipeline.submit(f"item{i}", i)
+        failures = pipeline.drain()
+
+        self.assertEqual([0, 2], processed)
+        self.assertEqual(["item1", "item3"], [f.item_name for f in failures])
+        self.assertEqual({"check"}, {f.stage_name for f in failures})
+
+    def test_drain_reraises_error_that_killed_a_stage(self):
+        processed = []
+
+        def exit_on_second(item):
+            if item == 1:
+                raise SystemExit("worker killed")
+
+        pipeline = Pipeline("test", queue_size=1)
+        pipeline.add_stage("exit", exit_on_second)
+        pipeline.add_stage("collect", lambda item: processed.append(item))
+        pipeline.start()
+        # Items submitted after the stage died do not block the submitter
+        for i in range(5):
+            pipeline.submit(f"item{i}", i)
+        with self.assertRaises(SystemExit) as cm:
+            pipeline.drain()
+
+        self.assertEqual("worker killed", cm.exception.code)
+        self.assertEqual([0], processed)
+        self.assertFalse(any(stage.thread.is_alive() for stage in pipeline.stages))
+
+    def test_stages_run_concurrently_with_submitter(self):
+        release = threading.Event()
+        pipeline = Pipeline("test", queue_size=1)
+        pipeline.add_stage("wait", lambda item: release.wait(timeout=5))
+        pipeline.start()
+        # First item is picked up by the worker, second one waits in the queue: neither blocks the submitter
+        pipeline.submit("item0", 0)
+        pipeline.submit("item1", 1)
+        release.set()
+        self.assertEqual([], pipeline.drain())
+
+    def test_add_stage_after_start_not_allowed(self):
+        pipeline = Pipeline("test")
+        pipeline.add_stage("noop", lambda item: None)
+        pipeline.start()
+        with self.assertRaises(ValueError):
+            pipeline.add_stage("other", lambda item: None)
+        pipeline.drain()
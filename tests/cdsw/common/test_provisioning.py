@@ -0,0 +1,158 @@
+import os
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import patch, Mock
+
+from cdswjoblauncher.cdsw.cdsw_common import PythonModuleMode
+from cdswjoblauncher.core.error import CdswLauncherException
+from cdswjoblauncher.core.provisioning import Wheelhouse, SitePackagesSnapshots, PackageProvisioner
+
+PACKAGE = "cdsw-example-module"
+MODULE = "cdswexamplemodule"
+
+
+class ProvisioningTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.wheel_dir = os.path.join(self.tmp_dir.name, "wheelhouse")
+        self.site_dir = os.path.join(self.tmp_dir.name, "site-packages")
+        self.snapshots_dir = os.path.join(self.tmp_dir.name, "snapshots")
+        os.makedirs(self.wheel_dir)
+        os.makedirs(self.site_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_file(self, dir, path, content):
+        file = os.path.join(dir, path)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, "w") as f:
+            f.write(content)
+        return file
+
+    def test_offline_install_without_wheel(self):
+        with patch("pip.main") as pip_main:
+            with self.assertRaises(CdswLauncherException):
+                Wheelhouse(self.wheel_dir).install(PACKAGE)
+        pip_main.assert_not_called()
+
+    def test_offline_install_from_wheelhouse(self):
+        self._write_file(self.wheel_dir, "cdsw_example_module-1.0-py3-none-any.whl", "")
+        self._write_file(self.wheel_dir, "other-1.0-py3-none-any.whl", "")
+        wheelhouse = Wheelhouse(self.wheel_dir)
+        self.assertEqual(1, len(wheelhouse.get_wheels(PACKAGE)))
+
+        with patch("pip.main", return_value=0) as pip_main:
+            wheelhouse.install(PACKAGE, force_reinstall=True)
+        pip_main.assert_called_once_with(
+            ["install", "--no-index", "--find-links", self.wheel_dir, PACKAGE, "--force-reinstall"]
+        )
+
+        with patch("pip.main", return_value=1):
+            with self.assertRaises(CdswLauncherException):
+                wheelhouse.install(PACKAGE)
+
+    def test_create_and_restore_snapshot(self):
+        self._write_file(self.site_dir, os.path.join(MODULE, "__init__.py"), "VERSION = 1")
+        self._write_file(self.site_dir, os.path.join(MODULE, "__pycache__", "__init__.pyc"), "")
+        snapshots = SitePackagesSnapshots(self.snapshots_dir)
+        wheelhouse_fingerprint = Wheelhouse(self.wheel_dir).get_fingerprint()
+        key = SitePackagesSnapshots.get_key(PACKAGE, PythonModuleMode.USER, wheelhouse_fingerprint)
+        self.assertFalse(snapshots.exists(key))
+        snapshots.create(key, self.site_dir)
+        self.assertTrue(snapshots.exists(key))
+
+        new_site_dir = os.path.join(self.tmp_dir.name, "new-site-packages")
+        snapshots.restore(key, new_site_dir)
+        restored_file = os.path.join(new_site_dir, MODULE, "__init__.py")
+        with open(restored_file) as f:
+            self.assertEqual("VERSION = 1", f.read())
+        self.assertFalse(os.path.exists(os.path.join(new_site_dir, MODULE, "__pycache__")))
+
+        # Changing the site-packages directory does not change the snapshot
+        self._write_file(new_site_dir, os.path.join(MODULE, "__init__.py"), "VERSION = 2")
+        snapshots.restore(key, new_site_dir)
+        with open(restored_file) as f:
+            self.assertEqual("VERSION = 1", f.read())
+
+        linked_site_dir = os.path.join(self.tmp_dir.name, "linked-site-packages")
+        SitePackagesSnapshots(self.snapshots_dir, use_hardlinks=True).restore(key, linked_site_dir)
+        snapshot_file = os.path.join(self.snapshots_dir, key, "files", MODULE, "__init__.py")
+        linked_file = os.path.join(linked_site_dir, MODULE, "__init__.py")
+        self.assertEqual(os.stat(snapshot_file).st_ino, os.stat(linked_file).st_ino)
+        self.assertNotEqual(os.stat(snapshot_file).st_ino, os.stat(restored_file).st_ino)
+
+    def test_provision_from_snapshot(self):
+        self._write_file(self.site_dir, os.path.join(MODULE, "__init__.py"), "")
+        wheelhouse = Mock(spec=Wheelhouse)
+        wheelhouse.get_fingerprint.return_value = "fingerprint1"
+        snapshots = SitePackagesSnapshots(self.snapshots_dir)
+        provisioner = PackageProvisioner(wheelhouse, snapshots, PythonModuleMode.USER)
+
+        with patch("cdswjoblauncher.core.provisioning.get_site_packages_dir", return_value=self.site_dir), patch.object(
+            PackageProvisioner, "_is_importable", side_effect=[False, False, True]
+        ) as is_importable:
+            provisioner.provision(MODULE, PACKAGE, force_reinstall=False, offline=True, use_snapshot=True)
+            wheelhouse.populate.assert_not_called()
+            wheelhouse.install.assert_called_once_with(PACKAGE, force_reinstall=False)
+            self.assertTrue(
+                snapshots.exists(SitePackagesSnapshots.get_key(PACKAGE, PythonModuleMode.USER, "fingerprint1"))
+            )
+
+            wheelhouse.reset_mock()
+            provisioner.provision(MODULE, PACKAGE, force_reinstall=False, offline=True, use_snapshot=True)
+            wheelhouse.install.assert_not_called()
+            # The restored module is imported again, not taken from the already imported modules
+            is_importable.assert_called_with(MODULE, evict=True)
+
+        # The snapshot of other versions of the wheels is not restored
+        wheelhouse.get_fingerprint.return_value = "fingerprint2"
+        with patch("cdswjoblauncher.core.provisioning.get_site_packages_dir", return_value=self.site_dir), patch.object(
+            PackageProvisioner, "_is_importable", return_value=False
+        ):
+            provisioner.provision(MODULE, PACKAGE, force_reinstall=False, offline=True, use_snapshot=True)
+            wheelhouse.install.assert_called_once_with(PACKAGE, force_reinstall=False)
+            self.assertTrue(
+                snapshots.exists(SitePackagesSnapshots.get_key(PACKAGE, PythonModuleMode.USER, "fingerprint2"))
+            )
+
+    def test_snapshot_is_not_restored_if_module_is_importable(self):
+        wheelhouse = Mock(spec=Wheelhouse)
+        wheelhouse.get_fingerprint.return_value = "fingerprint"
+        snapshots = Mock(spec=SitePackagesSnapshots)
+        snapshots.exists.return_value = True
+        provisioner = PackageProvisioner(wheelhouse, snapshots, PythonModuleMode.USER)
+        with patch("cdswjoblauncher.core.provisioning.get_site_packages_dir", return_value=self.site_dir), patch.object(
+            PackageProvisioner, "_is_importable", return_value=True
+        ):
+            provisioner.provision(MODULE, PACKAGE, force_reinstall=False, offline=True, use_snapshot=True)
+        snapshots.restore.assert_not_called()
+        snapshots.create.assert_not_called()
+        wheelhouse.install.assert_not_called()
+
+    def test_evicted_module_is_imported_again(self):
+        # An already imported module that is not importable from the site-packages directory
+        with patch.dict(sys.modules, {MODULE: types.ModuleType(MODULE)}):
+            self.assertTrue(PackageProvisioner._is_importable(MODULE))
+            self.assertFalse(PackageProvisioner._is_importable(MODULE, evict=True))
+            self.assertNotIn(MODULE, sys.modules)
+
+    def test_wheelhouse_fingerprint(self):
+        wheelhouse = Wheelhouse(self.wheel_dir)
+        self._write_file(self.wheel_dir, "cdsw_example_module-1.0-py3-none-any.whl", "")
+        fingerprint = wheelhouse.get_fingerprint()
+        self.assertEqual(fingerprint, wheelhouse.get_fingerprint())
+
+        self._write_file(self.wheel_dir, "cdsw_example_module-1.1-py3-none-any.whl", "")
+        self.assertNotEqual(fingerprint, wheelhouse.get_fingerprint())
+
+    def test_provision_online(self):
+        wheelhouse = Mock(spec=Wheelhouse)
+        wheelhouse.get_fingerprint.return_value = "fingerprint"
+        provisioner = PackageProvisioner(wheelhouse, SitePackagesSnapshots(self.snapshots_dir), PythonModuleMode.USER)
+        with patch.object(PackageProvisioner, "_is_importable", return_value=True):
+            provisioner.provision(MODULE, PACKAGE, force_reinstall=True)
+        wheelhouse.populate.assert_called_once_with(PACKAGE)
+        wheelhouse.install.assert_called_once_with(PACKAGE, force_reinstall=True)
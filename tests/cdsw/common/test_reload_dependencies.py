@@ -0,0 +1,155 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from cdswjoblauncher.cdsw.cdsw_common import CommonDirs
+from cdswjoblauncher.cdsw.libreloader.reload_dependencies import (
+    Reloader,
+    FORCE_INSTALL_REQUIREMENTS_ENV_VAR,
+    INSTALL_REQUIREMENTS_ENV_VAR,
+    JOB_CONFIGS_MANIFEST_FILE_NAME,
+    REQUIREMENTS_FINGERPRINT_TTL_ENV_VAR,
+)
+
+MODULE_NAME = "mymodule"
+
+
+class ReloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.site_dir = os.path.join(self.tmp_dir.name, "site-packages")
+        self.jobs_dir = os.path.join(self.tmp_dir.name, "jobs")
+        self.module_root = os.path.join(self.site_dir, MODULE_NAME)
+        os.makedirs(self.jobs_dir)
+        self._write_file(os.path.join("cdsw", "scripts", "install-requirements.sh"), "pip3 install mymodule")
+        self._write_file(os.path.join("cdsw", "scripts", "requirements.txt"), "requests==2.31.0")
+        self._write_file(os.path.join("cdsw", "job_configs", "job1.py"), "config = {}")
+        self._create_dist_info("1.0")
+
+        patch.object(Reloader, "get_python_module_root", return_value=self.site_dir).start()
+        patch.object(CommonDirs, "JOBS_BASEDIR", self.jobs_dir).start()
+        patch.dict(os.environ, {}).start()
+        for env_var in (
+            INSTALL_REQUIREMENTS_ENV_VAR,
+            FORCE_INSTALL_REQUIREMENTS_ENV_VAR,
+            REQUIREMENTS_FINGERPRINT_TTL_ENV_VAR,
+            "TEST_EXEC_MODE",
+        ):
+            os.environ.pop(env_var, None)
+        self.run_script = patch.object(Reloader, "_run_script", return_value=0).start()
+        Reloader._setup_paths(MODULE_NAME)
+
+    def tearDown(self):
+        patch.stopall()
+        self.tmp_dir.cleanup()
+
+    def _write_file(self, path, content):
+        file = os.path.join(self.module_root, path)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, "w") as f:
+            f.write(content)
+
+    def _create_dist_info(self, version):
+        dist_info = os.path.join(self.site_dir, f"{MODULE_NAME}-{version}.dist-info")
+        os.makedirs(dist_info)
+        with open(os.path.join(dist_info, "top_level.txt"), "w") as f:
+            f.write(f"{MODULE_NAME}\n")
+        return dist_info
+
+    def test_install_is_skipped_when_requirements_not_changed(self):
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(1, self.run_script.call_count)
+        self.assertTrue(os.path.isfile(os.path.join(self.module_root, ".requirements-fingerprint")))
+        self.assertTrue(os.path.isfile(os.path.join(self.jobs_dir, "job1.py")))
+
+        os.remove(os.path.join(self.jobs_dir, "job1.py"))
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(1, self.run_script.call_count)
+        # Job configs are still copied
+        self.assertTrue(os.path.isfile(os.path.join(self.jobs_dir, "job1.py")))
+
+    def test_install_when_requirements_changed(self):
+        Reloader._install_requirements_if_needed()
+        self._write_file(os.path.join("cdsw", "scripts", "requirements.txt"), "requests==2.32.0")
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(2, self.run_script.call_count)
+
+    def test_install_when_installed_version_changed(self):
+        Reloader._install_requirements_if_needed()
+        os.rename(
+            os.path.join(self.site_dir, f"{MODULE_NAME}-1.0.dist-info"),
+            os.path.join(self.site_dir, f"{MODULE_NAME}-1.1.dist-info"),
+        )
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(2, self.run_script.call_count)
+
+    def test_install_when_execution_mode_changed(self):
+        Reloader._install_requirements_if_needed()
+        os.environ["TEST_EXEC_MODE"] = "upstream"
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(2, self.run_script.call_count)
+        self.assertEqual(["upstream"], self.run_script.call_args[1]["args"])
+
+    def test_install_when_fingerprint_expired(self):
+        Reloader._install_requirements_if_needed()
+        fingerprint_file = os.path.join(self.module_root, ".requirements-fingerprint")
+        # Upstream releases of the module are picked up by installing again after the TTL
+        os.utime(fingerprint_file, (time.time() - 7 * 60 * 60, time.time() - 7 * 60 * 60))
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(2, self.run_script.call_count)
+
+        os.environ[REQUIREMENTS_FINGERPRINT_TTL_ENV_VAR] = "0"
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(3, self.run_script.call_count)
+
+    def test_forced_install(self):
+        Reloader._install_requirements_if_needed()
+        os.environ[FORCE_INSTALL_REQUIREMENTS_ENV_VAR] = "True"
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(2, self.run_script.call_count)
+
+    def test_fingerprint_not_stored_when_install_failed(self):
+        self.run_script.return_value = 1
+        Reloader._install_requirements_if_needed()
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(2, self.run_script.call_count)
+        self.assertFalse(os.path.exists(os.path.join(self.module_root, ".requirements-fingerprint")))
+
+    def test_install_disabled(self):
+        os.environ[INSTALL_REQUIREMENTS_ENV_VAR] = "False"
+        Reloader._install_requirements_if_needed()
+        self.assertEqual(0, self.run_script.call_count)
+
+    def test_sync_job_configs(self):
+        self._write_file(os.path.join("cdsw", "job_configs", "sub", "job2.py"), "config = {}")
+        self._write_file(os.path.join("cdsw", "job_configs", "README.md"), "")
+        with open(os.path.join(self.jobs_dir, "user_job.py"), "w") as f:
+            f.write("config = {}")
+        result = Reloader._copy_job_configs_to_cdsw_jobs_root()
+        self.assertEqual(["job1.py", "job2.py"], result.added)
+        self.assertTrue(os.path.isfile(os.path.join(self.jobs_dir, JOB_CONFIGS_MANIFEST_FILE_NAME)))
+
+        with patch.object(Reloader, "_copy_file_atomically") as copy_file:
+            result = Reloader._copy_job_configs_to_cdsw_jobs_root()
+        copy_file.assert_not_called()
+        self.assertFalse(result.has_changes)
+        self.assertEqual(["job1.py", "job2.py"], result.unchanged)
+
+        # Same content with a different modification time is not copied
+        os.utime(os.path.join(self.jobs_dir, "job1.py"), (0, 0))
+        with patch.object(Reloader, "_copy_file_atomically") as copy_file:
+            Reloader._copy_job_configs_to_cdsw_jobs_root()
+        copy_file.assert_not_called()
+
+        self._write_file(os.path.join("cdsw", "job_configs", "job1.py"), "config = {'job_name': 'job1'}")
+        os.remove(os.path.join(self.module_root, "cdsw", "job_configs", "sub", "job2.py"))
+        result = Reloader._copy_job_configs_to_cdsw_jobs_root()
+        self.assertEqual(["job1.py"], result.updated)
+        self.assertEqual(["job2.py"], result.removed)
+        with open(os.path.join(self.jobs_dir, "job1.py")) as f:
+            self.assertEqual("config = {'job_name': 'job1'}", f.read())
+        self.assertEqual(
+            sorted(["job1.py", "user_job.py", JOB_CONFIGS_MANIFEST_FILE_NAME]), sorted(os.listdir(self.jobs_dir))
+        )
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+
+from cdswjoblauncher.cdsw.timing import Tracer, Phase
+
+
+class TracerTest(unittest.TestCase):
+    def test_nested_spans(self):
+        tracer = Tracer()
+        with tracer.span("run1", Phase.RUN):
+            with tracer.span("main_script", Phase.MAIN_SCRIPT, run="run1"):
+                pass
+            with tracer.span("nested_run", Phase.RUN):
+                pass
+        with self.assertRaises(ValueError):
+            with tracer.span("run2", Phase.RUN):
+                raise ValueError("failed")
+
+        run1, main_script, nested_run, run2 = tracer.spans
+        self.assertIsNone(run1.parent_id)
+        self.assertEqual(run1.id, main_script.parent_id)
+        self.assertEqual({"run": "run1"}, main_script.attributes)
+        self.assertTrue(run1.duration >= main_script.duration)
+        self.assertEqual("ValueError('failed')", run2.error)
+
+        totals = tracer.get_phase_totals()
+        # Nested span of the same phase is not counted twice
+        self.assertEqual(2, totals["run"]["count"])
+        self.assertEqual(1, totals["main_script"]["count"])
+
+    def test_report(self):
+        tracer = Tracer()
+        with tracer.span("initial_setup", Phase.SETUP):
+            pass
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, "report.json")
+            tracer.write_report(file)
+            with open(file) as f:
+                report = json.load(f)
+        self.assertEqual(["initial_setup"], [span["name"] for span in report["spans"]])
+        self.assertEqual(1, report["phases"]["setup"]["count"])
+
+        summary = tracer.format_summary_table()
+        self.assertIn("initial_setup", summary)
+        self.assertIn("Total duration", summary)
+
+    def test_summary_table_reads_spans_under_lock(self):
+        tracer = Tracer()
+        unlocked_reads = []
+
+        class CheckedSpans(list):
+            def __iter__(self):
+                if not tracer._lock.locked():
+                    unlocked_reads.append(len(self))
+                return super().__iter__()
+
+        tracer.spans = CheckedSpans()
+        with tracer.span("initial_setup", Phase.SETUP):
+            pass
+        self.assertIn("initial_setup", tracer.format_summary_table())
+        self.assertEqual([], unlocked_reads)
@@ -0,0 +1,129 @@
+import logging
+import os
+import resource
+import signal
+import sys
+import tempfile
+import time
+import unittest
+
+from cdswjoblauncher.cdsw.warm_interpreter import WarmInterpreter
+
+LOG = logging.getLogger(__name__)
+# Not imported by the fork server itself, so it is only in sys.modules of the runs if it is preloaded
+PRELOADED_MODULE = "tabnanny"
+
+
+class WarmInterpreterTest(unittest.TestCase):
+    interpreter = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.output_logger = logging.getLogger("test_warm_interpreter_output")
+        cls.interpreter = WarmInterpreter([PRELOADED_MODULE], output_logger=cls.output_logger)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _create_script(self, code: str, name: str = "script.py"):
+        script = os.path.join(self.tmp_dir.name, name)
+        with open(script, "w") as f:
+            f.write(code)
+        return script
+
+    def _run(self, script: str, *args, **kwargs):
+        with self.assertLogs(self.output_logger, level=logging.INFO) as cm:
+            result = self.interpreter.run([sys.executable, script, *args], **kwargs)
+            # assertLogs fails if nothing is logged
+            self.output_logger.info("end")
+        return result, [r.getMessage() for r in cm.records[:-1]]
+
+    def test_script_is_run_as_main_with_arguments(self):
+        script = self._create_script(
+            "import subprocess, sys\n"
+            "if __name__ == '__main__':\n"
+            "    print(sys.argv)\n"
+            "    print('error', file=sys.stderr)\n"
+            "    subprocess.run(['echo', 'output of child process'], check=True)\n"
+        )
+        log_file = os.path.join(self.tmp_dir.name, "script.log")
+        result, lines = self._run(script, "--arg1", "value 1", log_file=log_file)
+
+        self.assertTrue(result.succeeded)
+        self.assertEqual(
+            sorted([str([script, "--arg1", "value 1"]), "error", "output of child process"]), sorted(lines)
+        )
+        with open(log_file) as f:
+            self.assertEqual(sorted(lines), sorted(f.read().splitlines()))
+        self.assertGreater(result.max_rss_kb, 0)
+
+    def test_preloaded_modules_are_imported_once(self):
+        script = self._create_script("import sys\nprint({!r} in sys.modules)\n".format(PRELOADED_MODULE))
+        _, lines = self._run(script)
+        self.assertEqual(["True"], lines)
+
+    def test_state_is_isolated_between_runs(self):
+        script = self._create_script(
+            "import os, sys, {module}\n"
+            "print(getattr({module}, 'run_marker', None), os.environ.get('WARM_TEST_VAR'), len(sys.argv))\n"
+            "{module}.run_marker = sys.argv[1]\n"
+            "os.environ['WARM_TEST_VAR'] = sys.argv[1]\n".format(module=PRELOADED_MODULE)
+        )
+        _, lines = self._run(script, "run1", env={"OTHER_VAR": "value"})
+        self.assertEqual(["None None 2"], lines)
+        _, lines = self._run(script, "run2", "extra")
+        self.assertEqual(["None None 3"], lines)
+        self.assertNotIn("WARM_TEST_VAR", os.environ)
+
+    def test_modules_next_to_script_can_be_imported(self):
+        self._create_script("VALUE = 'value of sibling module'\n", name="warm_sibling_module.py")
+        script = self._create_script("import warm_sibling_module\nprint(warm_sibling_module.VALUE)\n")
+        result, lines = self._run(script)
+        self.assertTrue(result.succeeded)
+        self.assertEqual(["value of sibling module"], lines)
+
+    def test_env(self):
+        script = self._create_script("import os\nprint(os.environ['WARM_TEST_VAR'])\n")
+        result, lines = self._run(script, env={"WARM_TEST_VAR": "value"})
+        self.assertTrue(result.succeeded)
+        self.assertEqual(["value"], lines)
+
+    def test_exit_codes(self):
+        script = self._create_script(
+            "import sys\nsys.exit(int(sys.argv[1]) if sys.argv[1].isdigit() else sys.argv[1])\n"
+        )
+        result = self.interpreter.run([sys.executable, script, "0"])
+        self.assertEqual(0, result.exit_code)
+        result = self.interpreter.run([sys.executable, script, "4"])
+        self.assertEqual(4, result.exit_code)
+        self.assertFalse(result.succeeded)
+        result, lines = self._run(script, "message")
+        self.assertEqual(1, result.exit_code)
+        self.assertEqual(["message"], lines)
+
+        script = self._create_script("raise ValueError('failure of script')\n", name="failing.py")
+        result, lines = self._run(script)
+        self.assertEqual(1, result.exit_code)
+        self.assertIn("ValueError: failure of script", lines)
+
+    def test_timeout(self):
+        script = self._create_script("import time\ntime.sleep(30)\n")
+        start_time = time.perf_counter()
+        result = self.interpreter.run([sys.executable, script], timeout=0.5)
+
+        self.assertLess(time.perf_counter() - start_time, 10)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(-signal.SIGTERM, result.exit_code)
+
+    def test_resource_limits(self):
+        script = self._create_script("import resource\nprint(resource.getrlimit(resource.RLIMIT_NOFILE))\n")
+        result, lines = self._run(script, rlimits={resource.RLIMIT_NOFILE: (64, 64)})
+        self.assertTrue(result.succeeded)
+        self.assertEqual(["(64, 64)"], lines)
+
+    def test_invalid_command(self):
+        with self.assertRaises(ValueError):
+            self.interpreter.run([sys.executable])
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from cdswjoblauncher.commands.zip_latest_command_data import (
+    CommandDataZipperConfig,
+    ZipLatestCommandData,
+    ArchiveMode,
+)
+from cdswjoblauncher.commands.send_latest_command_data_in_mail import ZipMemberReader
+
+CMD_TYPE = "testcmd"
+
+
+class ZipLatestCommandDataIncrementalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.basedir = self.tmp_dir.name
+        self.session_dir = os.path.join(self.basedir, f"latest-session-{CMD_TYPE}")
+        os.makedirs(self.session_dir)
+        self._write_file("report.html", "report")
+        self._write_file("details.log", "details")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_file(self, name, content):
+        with open(os.path.join(self.session_dir, name), "w") as f:
+            f.write(content)
+
+    def _run_zipper(self):
+        config = CommandDataZipperConfig(
+            dest_dir=self.basedir,
+            ignore_filetypes=[],
+            input_files=[f"latest-session-{CMD_TYPE}"],
+            project_basedir=self.basedir,
+            cmd_type_real_name=CMD_TYPE,
+            incremental=True,
+        )
+        zipper = ZipLatestCommandData(config)
+        zipper.run()
+        self.assertEqual(
+            zipper.result.file, os.path.realpath(os.path.join(self.basedir, f"latest-command-data-zip-{CMD_TYPE}"))
+        )
+        return zipper
+
+    def test_incremental_zip_modes(self):
+        zipper = self._run_zipper()
+        self.assertEqual(ArchiveMode.FULL, zipper.archive_mode)
+        full_archive = zipper.result.file
+        digest = zipper.result.digest
+
+        zipper = self._run_zipper()
+        self.assertEqual(ArchiveMode.REUSE, zipper.archive_mode)
+        self.assertEqual(full_archive, zipper.result.file)
+        self.assertEqual(digest, zipper.result.digest)
+
+        self._write_file("report.html", "changed report")
+        self._write_file("new.log", "new")
+        os.remove(os.path.join(self.session_dir, "details.log"))
+        zipper = self._run_zipper()
+        self.assertEqual(ArchiveMode.FULL, zipper.archive_mode)
+        self.assertNotEqual(digest, zipper.result.digest)
+        # The command output is always a full archive, as it is uploaded and sent in email
+        with zipfile.ZipFile(zipper.result.file) as zip_file:
+            self.assertEqual(["new.log", "report.html"], sorted(zip_file.namelist()))
+            self.assertEqual(b"changed report", zip_file.read("report.html"))
+
+        zipper = self._run_zipper()
+        self.assertEqual(ArchiveMode.REUSE, zipper.archive_mode)
+
+    def test_read_member_of_changed_archive(self):
+        self._run_zipper()
+        self._write_file("details.log", "changed details")
+        zipper = self._run_zipper()
+        self.assertEqual(ArchiveMode.FULL, zipper.archive_mode)
+        link = os.path.join(self.basedir, f"latest-command-data-zip-{CMD_TYPE}")
+
+        self.assertEqual(b"changed details", ZipMemberReader.read(link, "details.log", 1024))
+        self.assertEqual(b"report", ZipMemberReader.read(link, "report.html", 1024))
+        with self.assertRaises(ValueError):
+            ZipMemberReader.read(link, "missing.html", 1024)
+        with self.assertRaises(ValueError):
+            ZipMemberReader.read(link, "details.log", 5)
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+import unittest
+import zipfile
+
+from cdswjoblauncher.commands.zip_writer import StreamingZipWriter
+
+
+class StreamingZipWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.basedir = self.tmp_dir.name
+        self.session_dir = os.path.join(self.basedir, "session")
+        os.makedirs(os.path.join(self.session_dir, "sub"))
+        self._write_file(os.path.join(self.session_dir, "report.txt"), "report")
+        self._write_file(os.path.join(self.session_dir, "sub", "Test.java"), "class Test {}")
+        self._write_file(os.path.join(self.session_dir, "sub", "data.html"), "<html></html>")
+        self.log_file = os.path.join(self.basedir, "latest-log-test-INFO.log")
+        self._write_file(self.log_file, "log")
+        self.dest_file = os.path.join(self.basedir, "out.zip")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _write_file(path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_write_filters_ignored_filetypes(self):
+        result = StreamingZipWriter(ignore_filetypes=["java"]).write([self.log_file, self.session_dir], self.dest_file)
+
+        with zipfile.ZipFile(self.dest_file) as zip_file:
+            names = sorted(zip_file.namelist())
+            self.assertEqual("<html></html>", zip_file.read("sub/data.html").decode())
+        self.assertEqual(["latest-log-test-INFO.log", "report.txt", "sub/data.html"], names)
+        self.assertEqual(3, result.number_of_files)
+        self.assertEqual(1, result.number_of_ignored_files)
+        self.assertEqual(os.path.getsize(self.dest_file), result.size)
+        self.assertEqual([], [f for f in os.listdir(self.basedir) if f.endswith(".tmp")])
+
+    def test_write_computes_digest_of_written_file(self):
+        result = StreamingZipWriter(digest_algorithm="sha256").write([self.session_dir], self.dest_file)
+
+        with open(self.dest_file, "rb") as f:
+            expected_digest = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(expected_digest, result.digest)
+        self.assertEqual("sha256", result.digest_algorithm)
+
+    def test_failed_write_keeps_existing_dest_file(self):
+        self._write_file(self.dest_file, "previous")
+        missing_file = os.path.join(self.basedir, "missing")
+        writer = StreamingZipWriter()
+        # Simulate a file that is removed while the zip file is being written
+        writer.iterate_input_files = lambda input_files: iter([(missing_file, "missing", False)])
+
+        with self.assertRaises(OSError):
+            writer.write([self.session_dir], self.dest_file)
+        with open(self.dest_file) as f:
+            self.assertEqual("previous", f.read())
+        self.assertEqual([], [f for f in os.listdir(self.basedir) if f.endswith(".tmp")])
+
+    def test_unknown_digest_algorithm(self):
+        with self.assertRaises(ValueError):
+            StreamingZipWriter(digest_algorithm="unknown")